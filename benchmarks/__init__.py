@@ -0,0 +1,10 @@
+"""
+Инструменты для замеров производительности обработки ивентов вне EDMC.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.replay --fixture exploration
+    python -m benchmarks.replay --journal-dir "%USERPROFILE%/Saved Games/Frontier Developments/Elite Dangerous"
+    python -m benchmarks.allocations
+
+Подробности - в `benchmarks/replay.py`.
+"""
@@ -0,0 +1,84 @@
+"""
+Замер памяти и времени на создание объектов, которые обработчик создаёт на каждую запись журнала:
+`Coords` и `JournalEntry`, а также обращения к `JournalEntry.as_dict`.
+
+    python -m benchmarks.allocations [--count 100000]
+
+Не требует ни EDMC, ни дисплея. Для сравнения запустите на двух ревизиях.
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+from .fixtures import CMDR, exploration_session
+
+
+def _journal_entries(count: int) -> list[dict]:
+    entries = [item.entry for item in exploration_session().items if item.kind == "journal"]
+    return (entries * (count // len(entries) + 1))[:count]
+
+
+def _make_entry(JournalEntry, Coords, entry: dict, state):
+    coords = Coords(*entry["StarPos"]) if "StarPos" in entry else Coords(0.0, 0.0, 0.0)
+    kwargs = dict(cmdr=CMDR, is_beta=False, system="Sol", systemAddress=10477373803, station=None, data=entry, coords=coords)
+    # поддерживаем обе версии конструктора, чтобы сравнивать ревизии
+    if "state_getter" in getattr(JournalEntry, "_fields", ()):
+        return JournalEntry(state_getter=state, **kwargs)
+    return JournalEntry(state=state, **kwargs)
+
+
+def measure(count: int) -> dict:
+    from lib.journal import Coords, JournalEntry
+
+    entries = _journal_entries(count)
+    edmc_state = {"Odyssey": True, "Cargo": {}, "StarPos": None}
+    # как и в JournalProcessor: один getter на все записи
+    state = (lambda: edmc_state) if "state_getter" in getattr(JournalEntry, "_fields", ()) else edmc_state
+
+    gc.collect()
+    tracemalloc.start()
+    retained = [_make_entry(JournalEntry, Coords, entry, state) for entry in entries]
+    retained_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sample = retained[0]
+    instance_size = sys.getsizeof(sample) + sys.getsizeof(getattr(sample, "__dict__", None) or ())
+    coords_size = sys.getsizeof(sample.coords) + sys.getsizeof(getattr(sample.coords, "__dict__", None) or ())
+    del retained
+
+    start = time.perf_counter()
+    for entry in entries:
+        _make_entry(JournalEntry, Coords, entry, state)
+    construct_time = time.perf_counter() - start
+
+    sample = _make_entry(JournalEntry, Coords, entries[0], state)
+    start = time.perf_counter()
+    for _ in range(count):
+        sample.as_dict()["data"]
+    as_dict_time = time.perf_counter() - start
+
+    return {
+        "count": count,
+        "bytes_per_entry": retained_bytes / count,
+        "journal_entry_size": instance_size,
+        "coords_size": coords_size,
+        "construct_ns": construct_time / count * 1e9,
+        "as_dict_ns": as_dict_time / count * 1e9,
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.allocations", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--count", type=int, default=100_000, help="number of entries to create")
+    args = parser.parse_args(argv)
+
+    res = measure(args.count)
+    print(f"{res['count']} entries created.")
+    print(f"Retained memory per entry (JournalEntry + Coords): {res['bytes_per_entry']:.0f} B")
+    print(f"sys.getsizeof: JournalEntry {res['journal_entry_size']} B, Coords {res['coords_size']} B (incl. __dict__)")
+    print(f"Construction: {res['construct_ns']:.0f} ns/entry, as_dict()['data']: {res['as_dict_ns']:.0f} ns/call")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
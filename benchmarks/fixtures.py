@@ -0,0 +1,279 @@
+"""
+Канонические игровые сессии для замеров и загрузка реальных логов.
+
+Каждая сессия - это последовательность `ReplayItem`: запись журнала или снимок Status.json.
+Сессии генерируются детерминированно (фиксированный seed), поэтому результаты замеров
+между коммитами сравнимы без хранения мегабайтов логов в репозитории.
+"""
+import json
+import random
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from heapq import merge
+from pathlib import Path
+from typing import Literal
+
+
+CMDR = "Bench Cmdr"
+
+
+@dataclass
+class ReplayItem:
+    kind: Literal["journal", "dashboard"]
+    entry: dict
+
+
+@dataclass
+class Session:
+    name: str
+    items: list[ReplayItem]
+    systems: dict[int, tuple[str, tuple[float, float, float]]] = field(default_factory=dict)
+    """Системы, известные заглушке Спанша: {id: (имя, координаты)}"""
+
+
+class _SessionBuilder:
+    """Вспомогательный класс: ведёт игровые часы и копит записи."""
+
+    def __init__(self, name: str, seed: int):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.clock = datetime(2024, 5, 1, 12, 0, 0, tzinfo=UTC)
+        self.items: list[ReplayItem] = []
+        self.systems: dict[int, tuple[str, tuple[float, float, float]]] = {}
+        self.system: tuple[int, str, tuple[float, float, float]] | None = None
+        self.flags = 1 << 24   # IN_MAIN_SHIP
+        self.flags2 = 0
+
+    def tick(self, seconds: float):
+        self.clock += timedelta(seconds=seconds)
+
+    def event(self, event: str, **fields):
+        entry = {"timestamp": self.clock.strftime("%Y-%m-%dT%H:%M:%SZ"), "event": event}
+        entry.update(fields)
+        self.items.append(ReplayItem("journal", entry))
+        return entry
+
+    def status(self, **fields):
+        entry = {
+            "timestamp": self.clock.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "event": "Status",
+            "Flags": self.flags,
+            "Flags2": self.flags2,
+            "Pips": [4, 4, 4],
+            "FireGroup": 0,
+            "GuiFocus": 0,
+            "Fuel": {"FuelMain": 32.0, "FuelReservoir": 0.63},
+            "Cargo": 0.0,
+            "LegalState": "Clean",
+            "Balance": 123456789,
+        }
+        entry.update(fields)
+        self.items.append(ReplayItem("dashboard", entry))
+
+    def new_system(self, near: tuple[float, float, float] = (0.0, 0.0, 0.0), spread: float = 60.0):
+        sid = self.rng.getrandbits(50)
+        letters = self.rng.choice("ABCDEFGH") + self.rng.choice("ABCDEFGH")
+        # номер системы в имени - по счёту, чтобы имена не повторялись
+        index = len(self.systems)
+        name = f"Bench Sector {letters}-{self.rng.choice('XYZ')} d{index // 31}-{index % 31}"
+        coords = tuple(round((c + self.rng.uniform(-spread, spread)) * 32) / 32 for c in near)
+        self.systems[sid] = (name, coords)  # pyright: ignore[reportArgumentType]
+        return sid, name, coords
+
+    def factions(self) -> list[dict]:
+        return [
+            {
+                "Name": f"Bench Faction {i}",
+                "FactionState": "None",
+                "Government": "Democracy",
+                "Influence": round(self.rng.uniform(0.01, 0.5), 6),
+                "Allegiance": "Independent",
+                "Happiness": "$Faction_HappinessBand2;",
+            }
+            for i in range(self.rng.randint(3, 7))
+        ]
+
+    def startup(self, docked: bool = False):
+        sid, name, coords = self.new_system()
+        self.system = (sid, name, coords)
+        self.event("Fileheader", part=1, language="English/UK", Odyssey=True, gameversion="4.0.0.1900", build="r0 ")
+        self.event("Commander", FID="F0000000", Name=CMDR)
+        self.event("LoadGame", FID="F0000000", Commander=CMDR, Horizons=True, Odyssey=True, Ship="python",
+                   ShipID=1, GameMode="Solo", Credits=123456789, Loan=0)
+        self.event("Missions", Active=[], Failed=[], Complete=[])
+        location = dict(
+            DistFromStarLS=0.0, Docked=docked, Taxi=False, Multicrew=False,
+            StarSystem=name, SystemAddress=sid, StarPos=list(coords),
+            SystemAllegiance="Independent", SystemEconomy="$economy_Industrial;", Population=100000,
+            Body=f"{name} A", BodyID=1, BodyType="Star", Factions=self.factions(),
+        )
+        if docked:
+            location.update(
+                StationName="Bench Port", StationType="Coriolis", MarketID=3200000000,
+                StationFaction={"Name": "Bench Faction 0"}, StationServices=["dock", "commodities"],
+            )
+        self.event("Location", **location)
+        self.event("Music", MusicTrack="NoTrack")
+        self.status()
+
+    def jump(self, spread: float = 60.0, signals: int = 0, bodies: int = 0):
+        assert self.system is not None
+        sid, name, coords = self.new_system(self.system[2], spread)
+        self.event("StartJump", JumpType="Hyperspace", StarSystem=name, SystemAddress=sid, StarClass="K")
+        self.flags |= 1 << 30
+        self.status()
+        self.tick(15)
+        self.event("FSDJump", Taxi=False, Multicrew=False, StarSystem=name, SystemAddress=sid, StarPos=list(coords),
+                   SystemAllegiance="", Population=0, Body=f"{name}", BodyID=0, BodyType="Star",
+                   JumpDist=round(self.rng.uniform(5, spread), 3), FuelUsed=2.1, FuelLevel=29.9,
+                   Factions=self.factions() if self.rng.random() < 0.3 else [])
+        self.flags &= ~(1 << 30)
+        self.system = (sid, name, coords)
+        self.event("Music", MusicTrack="Supercruise")
+        self.status()
+        if bodies:
+            self.event("FSSDiscoveryScan", Progress=0.1, BodyCount=bodies, NonBodyCount=signals, SystemName=name, SystemAddress=sid)
+        for _ in range(signals):
+            self.tick(0.2)
+            is_station = self.rng.random() < 0.2
+            if is_station:
+                self.event("FSSSignalDiscovered", SystemAddress=sid, SignalName="Bench Hub", SignalType="Outpost", IsStation=True)
+            else:
+                self.event("FSSSignalDiscovered", SystemAddress=sid, SignalName="$USS_HighGradeEmissions;", SignalType="USS")
+        for body_id in range(1, bodies + 1):
+            self.tick(3)
+            self.event("Scan", ScanType="Detailed", BodyName=f"{name} {body_id}", BodyID=body_id, StarSystem=name,
+                       SystemAddress=sid, DistanceFromArrivalLS=round(self.rng.uniform(10, 5000), 2),
+                       PlanetClass="Icy body", Atmosphere="", Volcanism="", MassEM=0.01, Radius=1200000.0,
+                       SurfaceGravity=0.5, SurfaceTemperature=60.0, SurfacePressure=0.0, Landable=True,
+                       TerraformState="", WasDiscovered=True, WasMapped=False)
+            if body_id % 4 == 0:
+                self.status()
+        if bodies:
+            self.event("FSSAllBodiesFound", SystemName=name, SystemAddress=sid, Count=bodies)
+
+    def build(self) -> Session:
+        self.event("Shutdown")
+        return Session(self.name, self.items, self.systems)
+
+
+def exobiology_session() -> Session:
+    """Высадка на планету, пешие сканирования органики, частые обновления статуса."""
+    b = _SessionBuilder("exobiology", seed=1)
+    b.startup()
+    b.jump(bodies=12, signals=4)
+    assert b.system is not None
+    sid, name, _ = b.system
+    body = f"{name} 3"
+    b.event("ApproachBody", StarSystem=name, SystemAddress=sid, Body=body, BodyID=3)
+    b.event("Touchdown", PlayerControlled=True, Latitude=12.3, Longitude=45.6, NearestDestination="", StarSystem=name,
+            SystemAddress=sid, Body=body, BodyID=3, OnStation=False, OnPlanet=True)
+    b.flags2 |= 1 | (1 << 4)
+    b.event("Disembark", SRV=False, Taxi=False, Multicrew=False, ID=1, StarSystem=name, SystemAddress=sid, Body=body,
+            BodyID=3, OnStation=False, OnPlanet=True)
+    for species in range(8):
+        genus = f"$Codex_Ent_Bench_{species:02}_Genus_Name;"
+        b.event("CodexEntry", EntryID=2310000 + species, Name=f"$Codex_Ent_Bench_{species:02}_Name;",
+                SubCategory="$Codex_SubCategory_Organic_Structures;", Category="$Codex_Category_Biology;",
+                Region="$Codex_RegionName_18;", System=name, SystemAddress=sid, BodyID=3,
+                Latitude=12.3, Longitude=45.6, IsNewEntry=species % 3 == 0)
+        for scan_type in ("Log", "Sample", "Sample", "Analyse"):
+            for _ in range(30):  # ~ два снимка статуса в секунду, пока игрок бегает между образцами
+                b.tick(0.5)
+                b.status(Latitude=b.rng.uniform(12, 13), Longitude=b.rng.uniform(45, 46), Heading=b.rng.randint(0, 359),
+                         Altitude=0, BodyName=body, PlanetRadius=1200000.0, Oxygen=1.0, Health=1.0, Temperature=180.0,
+                         SelectedWeapon="$humanoid_sampletool_name;", Gravity=0.05)
+            b.event("ScanOrganic", ScanType=scan_type, Genus=genus, Species=f"$Codex_Ent_Bench_{species:02}_Name;",
+                    SystemAddress=sid, Body=3)
+    b.flags2 = 0
+    b.event("Embark", SRV=False, Taxi=False, Multicrew=False, ID=1, StarSystem=name, SystemAddress=sid, Body=body,
+            BodyID=3, OnStation=False, OnPlanet=True)
+    b.event("Liftoff", PlayerControlled=True, StarSystem=name, SystemAddress=sid, Body=body, BodyID=3, OnStation=False, OnPlanet=True)
+    return b.build()
+
+
+def combat_zone_session() -> Session:
+    """Космическая зона конфликта: десятки боевых облигаций и шквал снимков статуса."""
+    b = _SessionBuilder("combat_zone", seed=2)
+    b.startup()
+    b.jump(signals=10)
+    b.event("SupercruiseDestinationDrop", Type="$Warzone_PointRace_High:#index=1;", Threat=4)
+    b.event("Music", MusicTrack="Combat_Dogfight")
+    b.flags |= 1 << 6  # HARDPOINTS_DEPLOYED
+    for kill in range(40):
+        for _ in range(20):
+            b.tick(0.25)
+            b.status(Pips=[b.rng.randint(0, 8), b.rng.randint(0, 8), b.rng.randint(0, 8)])
+        b.event("ShipTargeted", TargetLocked=True, Ship="eagle", ScanStage=3, PilotName="$npc_name_decorate:#name=Bench;",
+                PilotRank="Master", ShieldHealth=0.0, HullHealth=12.5, Faction="Bench Faction 2", LegalStatus="Enemy")
+        b.event("FactionKillBond", Reward=60000 + kill * 10, AwardingFaction="Bench Faction 1", VictimFaction="Bench Faction 2")
+    b.flags &= ~(1 << 6)
+    b.event("Music", MusicTrack="Exploration")
+    b.jump()
+    assert b.system is not None
+    b.event("Docked", StationName="Bench Port", StationType="Coriolis", StarSystem=b.system[1], SystemAddress=b.system[0],
+            MarketID=3200000001, StationFaction={"Name": "Bench Faction 1"}, StationServices=["dock", "commodities"])
+    b.event("RedeemVoucher", Type="CombatBond", Amount=2415600, Faction="Bench Faction 1")
+    return b.build()
+
+
+def carrier_jump_session() -> Session:
+    """Пилот сидит на флитаке, пока тот прыгает по системам."""
+    b = _SessionBuilder("carrier_jump", seed=3)
+    b.startup(docked=True)
+    for _ in range(10):
+        assert b.system is not None
+        sid, name, coords = b.new_system(b.system[2], 500)
+        b.event("CarrierJumpRequest", CarrierType="FleetCarrier", CarrierID=3700000000, SystemName=name, SystemAddress=sid,
+                DepartureTime=b.clock.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        for _ in range(60):
+            b.tick(15)
+            b.status(Flags=1 | (1 << 24))
+        b.event("CarrierJump", Docked=True, StationName="BEN-CH1", StationType="FleetCarrier", MarketID=3700000000,
+                StationFaction={"Name": "FleetCarrier"}, StationServices=["dock", "carriermanagement"],
+                StarSystem=name, SystemAddress=sid, StarPos=list(coords), Body=name, BodyID=0, BodyType="Star",
+                Population=0, Factions=b.factions())
+        b.system = (sid, name, coords)
+        b.event("CarrierStats", CarrierType="FleetCarrier", CarrierID=3700000000, Callsign="BEN-CH1", Name="BENCH",
+                DockingAccess="all", AllowNotorious=False, FuelLevel=800, JumpRangeCurr=500.0, JumpRangeMax=500.0,
+                PendingDecommission=False)
+    return b.build()
+
+
+def exploration_session(jumps: int = 1000) -> Session:
+    """Долгий исследовательский маршрут: прыжки, FSS-сигналы и сканы тел."""
+    b = _SessionBuilder("exploration", seed=4)
+    b.startup()
+    for _ in range(jumps):
+        b.jump(spread=60, signals=b.rng.randint(0, 12), bodies=b.rng.randint(0, 8))
+    return b.build()
+
+
+FIXTURES: dict[str, Callable[[], Session]] = {
+    "exobiology": exobiology_session,
+    "combat_zone": combat_zone_session,
+    "carrier_jump": carrier_jump_session,
+    "exploration": exploration_session,
+}
+
+
+def load_journal_dir(journal_dir: Path, status_file: Path | None = None) -> Session:
+    """
+    Загружает записанные логи: все `Journal.*.log` директории по порядку имён
+    и, опционально, последовательность снимков Status.json (по одному JSON на строку).
+    Снимки вклиниваются между записями журнала по времени.
+    """
+    def read_lines(paths: Iterable[Path], kind: Literal["journal", "dashboard"]) -> Iterator[ReplayItem]:
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield ReplayItem(kind, json.loads(line))
+
+    journals = read_lines(sorted(journal_dir.glob("Journal.*.log")), "journal")
+    if status_file is None:
+        return Session(journal_dir.name, list(journals))
+    statuses = read_lines([status_file], "dashboard")
+    items = list(merge(journals, statuses, key=lambda item: item.entry["timestamp"]))
+    return Session(journal_dir.name, items)
@@ -0,0 +1,265 @@
+"""
+Headless-прогон записанных или сгенерированных логов через обработчик ивентов плагина.
+
+Записи подаются в `PluginContext._event_queue` ровно так же, как это делает load.py,
+и разбираются настоящим `JournalProcessor` со всеми модулями. EDMC и сеть заменены
+заглушками (см. `benchmarks/stubs.py`), пользовательские данные пишутся во временную директорию.
+
+По окончании выводится пропускная способность: общая, по типам ивентов и по хукам модулей.
+
+    python -m benchmarks.replay --fixture exploration
+    python -m benchmarks.replay --journal-dir <dir> [--status <Status.jsonl>] [--json results.json]
+
+Окна не показываются, но tkinter всё равно нужен дисплей - на Linux без X запускайте через `xvfb-run`.
+"""
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tkinter as tk
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from semantic_version import Version
+
+from .fixtures import CMDR, FIXTURES, Session, load_journal_dir
+from .stubs import install_edmc_stubs, install_network_stub
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+MODULE_HOOKS = ("on_journal_entry", "on_dashboard_entry", "on_cmdr_data", "on_chat_message")
+
+
+@dataclass
+class HookStats:
+    calls: int = 0
+    total: float = 0.0  # секунды
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+
+    @property
+    def per_second(self) -> float:
+        return self.calls / self.total if self.total else float("inf")
+
+
+@dataclass
+class ReplayResult:
+    session: str
+    journal_items: int
+    dashboard_items: int
+    wall_time: float
+    per_event: dict[str, HookStats] = field(default_factory=lambda: defaultdict(HookStats))
+    per_module: dict[str, HookStats] = field(default_factory=lambda: defaultdict(HookStats))
+    network_requests: dict[str, int] = field(default_factory=dict)
+    queue_stats: dict = field(default_factory=dict)
+    peak_traced_memory: int | None = None
+
+    @property
+    def events_per_second(self) -> float:
+        return (self.journal_items + self.dashboard_items) / self.wall_time if self.wall_time else float("inf")
+
+
+class _EDMCState:
+    """Минимальная имитация `monitor.state` EDMC - только то, что читает плагин."""
+
+    def __init__(self):
+        self.cmdr: str | None = None
+        self.system: str | None = None
+        self.station: str | None = None
+        self.state: dict = {"Odyssey": True, "Cargo": {}, "SystemName": None, "SystemAddress": None, "StarPos": None}
+
+    def journal_args(self, entry: dict) -> tuple:
+        match entry["event"]:
+            case "Commander": self.cmdr = entry["Name"]
+            case "LoadGame": self.cmdr = entry["Commander"]
+            case "Docked": self.station = entry["StationName"]
+            case "Undocked": self.station = None
+            case "Location" | "FSDJump" | "CarrierJump":
+                self.system = entry["StarSystem"]
+                self.station = entry.get("StationName") if entry.get("Docked") else None
+                self.state.update(SystemName=entry["StarSystem"], SystemAddress=entry["SystemAddress"], StarPos=entry["StarPos"])
+        return (self.cmdr, False, self.system, self.station, entry, self.state)
+
+
+def _timed(func: Callable, stats: dict[str, HookStats], key: Callable[..., str]) -> Callable:
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stats[key(*args)].add(time.perf_counter() - start)
+    return wrapper
+
+
+def _instrument(result: ReplayResult):
+    from core.context import PluginContext
+    from lib.module import ModuleMeta
+
+    processor = PluginContext.journal_processor
+    processor.on_journal_entry = _timed(  # pyright: ignore[reportAttributeAccessIssue]
+        processor.on_journal_entry, result.per_event, lambda cmdr, is_beta, system, station, entry, state: entry["event"]
+    )
+    processor.on_dashboard_entry = _timed(  # pyright: ignore[reportAttributeAccessIssue]
+        processor.on_dashboard_entry, result.per_event, lambda *args: "Status"
+    )
+    processor.on_cmdr_data = _timed(  # pyright: ignore[reportAttributeAccessIssue]
+        processor.on_cmdr_data, result.per_event, lambda *args: "cmdr_data"
+    )
+    for module in ModuleMeta._instances.values():
+        for hook in MODULE_HOOKS:
+            name = f"{module.__class__.__name__}.{hook}"
+            setattr(module, hook, _timed(getattr(module, hook), result.per_module, lambda *args, name=name: name))
+
+
+def _setup_plugin(plugin_dir: Path, root: tk.Tk, log_level: int, debug: bool):
+    """Повторяет то, что делает `load.Updater.__use_local_version`."""
+    config = install_edmc_stubs()
+    config.set("Triumvirate.EnableDebugging", debug)
+
+    from core.context import PluginContext
+    logger = logging.getLogger("EDMarketConnector.Triumvirate.replay")
+    if not logger.hasHandlers():
+        logger.addHandler(logging.StreamHandler())
+    logger.setLevel(log_level)
+    PluginContext.logger = logger
+    PluginContext.plugin_dir = plugin_dir
+    PluginContext.plugin_name = "Triumvirate"
+    PluginContext.plugin_version = Version((REPO_DIR / ".version").read_text().strip())
+    PluginContext.client_version = f"Triumvirate.{PluginContext.plugin_version}"
+    PluginContext.edmc_version = Version("5.13.0")
+    PluginContext._tr_template = lambda x, filepath, lang=None: x
+    # очередь берём настоящую: длинные сессии заодно проверяют её сброс на диск
+    from load import EventQueue
+    PluginContext._event_queue = EventQueue()
+    PluginContext._event_queue.set_spill_path(plugin_dir / "userdata" / EventQueue.SPILL_FILE_NAME)
+
+    import core.plugin_init as plugin_init
+    plugin_init.init_version()
+    plugin_init.plugin_app(root).grid()
+    if not debug:
+        # Debug.setup выставляет уровень по настройке, вернём выбранный пользователем
+        logger.setLevel(log_level)
+    return plugin_init
+
+
+def replay(session: Session, log_level: int = logging.WARNING, debug: bool = False, trace_memory: bool = False) -> ReplayResult:
+    root = tk.Tk()
+    root.withdraw()
+    network = install_network_stub(CMDR, session.systems)
+    tempdir = tempfile.TemporaryDirectory(prefix="triumvirate-replay-")
+    plugin_dir = Path(tempdir.name)
+    (plugin_dir / "userdata").mkdir()
+    shutil.copytree(REPO_DIR / "icons", plugin_dir / "icons")
+
+    plugin_init = _setup_plugin(plugin_dir, root, log_level, debug)
+    from core.context import PluginContext
+
+    result = ReplayResult(
+        session=session.name,
+        journal_items=sum(item.kind == "journal" for item in session.items),
+        dashboard_items=sum(item.kind == "dashboard" for item in session.items),
+        wall_time=0.0,
+    )
+    _instrument(result)
+
+    processor = PluginContext.journal_processor
+    queue = PluginContext._event_queue
+    edmc_state = _EDMCState()
+    if trace_memory:
+        # сильно замедляет прогон, поэтому только по запросу
+        tracemalloc.start()
+    start = time.perf_counter()
+    for item in session.items:
+        if item.kind == "journal":
+            queue.put({"type": "journal_entry", "data": edmc_state.journal_args(item.entry)})
+        else:
+            queue.put({"type": "dashboard_entry", "data": (edmc_state.cmdr, False, item.entry)})
+    processor.set_stop()
+
+    # модули ходят в GUI через after(), поэтому главный поток должен крутить цикл событий
+    def wait_for_processor():
+        if processor.is_alive():
+            root.after(10, wait_for_processor)
+        else:
+            result.wall_time = time.perf_counter() - start
+            if trace_memory:
+                result.peak_traced_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            root.quit()
+    root.after(10, wait_for_processor)
+    root.mainloop()
+
+    stopper = threading.Thread(target=plugin_init.plugin_stop, name="replay.plugin_stop")
+    stopper.start()
+    while stopper.is_alive():
+        root.update()
+        time.sleep(0.01)
+
+    network.uninstall()
+    result.queue_stats = queue.stats()
+    result.network_requests = dict(network.requests_by_host)
+    root.destroy()
+    tempdir.cleanup()
+    return result
+
+
+def format_report(result: ReplayResult) -> str:
+    lines = [
+        f"Session '{result.session}': {result.journal_items} journal entries, {result.dashboard_items} dashboard entries.",
+        f"Processed in {result.wall_time:.3f} s: {result.events_per_second:,.0f} events/s overall.",
+        "",
+        f"{'Event type':<32}{'count':>10}{'total, ms':>14}{'mean, us':>12}{'events/s':>14}",
+    ]
+    for name, stats in sorted(result.per_event.items(), key=lambda kv: -kv[1].total):
+        lines.append(
+            f"{name:<32}{stats.calls:>10}{stats.total * 1000:>14.1f}{stats.total / stats.calls * 1e6:>12.1f}{stats.per_second:>14,.0f}"
+        )
+    lines += ["", f"{'Module hook':<48}{'calls':>10}{'total, ms':>14}{'mean, us':>12}{'calls/s':>14}"]
+    for name, stats in sorted(result.per_module.items(), key=lambda kv: -kv[1].total):
+        lines.append(
+            f"{name:<48}{stats.calls:>10}{stats.total * 1000:>14.1f}{stats.total / stats.calls * 1e6:>12.1f}{stats.per_second:>14,.0f}"
+        )
+    if result.peak_traced_memory is not None:
+        lines += ["", f"Peak traced memory while processing: {result.peak_traced_memory / 2 ** 20:.1f} MiB."]
+    if result.queue_stats:
+        lines += [
+            "",
+            f"Event queue: high-water mark {result.queue_stats['high_water_mark']}, "
+            f"{result.queue_stats['total_spilled']} entries spilled to disk, max lag {result.queue_stats['max_lag']:.3f} s.",
+        ]
+    lines += ["", "Stubbed network requests:"]
+    lines += [f"  {host}: {count}" for host, count in sorted(result.network_requests.items())] or ["  none"]
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description="Replay journal sessions through the plugin.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixture", choices=sorted(FIXTURES), help="canonical generated session")
+    source.add_argument("--journal-dir", type=Path, help="directory with recorded Journal.*.log files")
+    parser.add_argument("--status", type=Path, help="Status.json snapshots, one JSON object per line (with --journal-dir)")
+    parser.add_argument("--json", type=Path, help="also dump raw results to this file")
+    parser.add_argument("--debug", action="store_true", help="enable the plugin's debug logging mode")
+    parser.add_argument("--trace-memory", action="store_true", help="report peak memory allocated while processing (slow)")
+    args = parser.parse_args(argv)
+
+    session = FIXTURES[args.fixture]() if args.fixture else load_journal_dir(args.journal_dir, args.status)
+    result = replay(session, debug=args.debug, trace_memory=args.trace_memory)
+    print(format_report(result))
+    if args.json:
+        result.per_event, result.per_module = dict(result.per_event), dict(result.per_module)
+        data = asdict(result)
+        data["events_per_second"] = result.events_per_second
+        args.json.write_text(json.dumps(data, indent=4), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Заглушки для модулей EDMC и сетевых запросов.
+
+Плагин импортирует `config`, `myNotebook`, `theme`, `l10n` и `ttkHyperlinkLabel`,
+которые существуют только внутри EDMC. `install_edmc_stubs` подкладывает в `sys.modules`
+их минимальные заменители, а `install_network_stub` перехватывает все запросы `requests`
+и отдаёт заранее заготовленные ответы, не выходя в сеть.
+"""
+import io
+import json
+import requests
+import sys
+import threading
+import tkinter as tk
+import types
+import webbrowser
+from collections import Counter
+from collections.abc import Callable
+from tkinter import ttk
+from urllib.parse import urlsplit
+
+
+class _Config:
+    """Заменитель `config.config` - хранит настройки в памяти."""
+    shutting_down = False
+
+    def __init__(self):
+        self._data: dict[str, object] = dict()
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def get_int(self, key, default=0):
+        return int(self._data.get(key, default))  # pyright: ignore[reportArgumentType]
+
+    def get_str(self, key, default=None):
+        return self._data.get(key, default)
+
+    def get_bool(self, key, default=None):
+        return self._data.get(key, default)
+
+    def get_list(self, key, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key, val):
+        self._data[key] = val
+
+    def delete(self, key, suppress=False):
+        self._data.pop(key, None)
+
+
+class _Theme:
+    """Заменитель `theme.theme` - ничего не делает."""
+    THEME_DEFAULT = 0
+    active = THEME_DEFAULT
+
+    def register(self, widget): ...
+    def register_alternate(self, pair, gridopts): ...
+    def button_bind(self, widget, command, image=None): ...
+    def update(self, widget): ...
+    def apply(self, root=None): ...
+
+
+class _Locale:
+    @staticmethod
+    def string_from_number(number, decimals=5):
+        return f"{number:.{decimals}f}"
+
+    @staticmethod
+    def preferred_languages():
+        return ["en"]
+
+
+class _HyperlinkLabel(ttk.Label):
+    def __init__(self, master=None, **kw):
+        self.url = kw.pop("url", None)
+        kw.pop("popup_copy", None)
+        super().__init__(master, **kw)
+
+    def __setitem__(self, key, value):
+        if key == "url":
+            self.url = value
+        else:
+            super().__setitem__(key, value)
+
+
+def install_edmc_stubs() -> _Config:
+    """
+    Регистрирует заглушки модулей EDMC. Вызывать до импорта чего-либо из плагина.
+    Возвращает объект конфигурации, чтобы вызывающий мог выставить нужные ключи.
+    """
+    config = _Config()
+    config_module = types.ModuleType("config")
+    config_module.config = config  # pyright: ignore[reportAttributeAccessIssue]
+    config_module.appname = "EDMarketConnector"  # pyright: ignore[reportAttributeAccessIssue]
+    config_module.appversion = lambda: "5.13.0"  # pyright: ignore[reportAttributeAccessIssue]
+
+    nb_module = types.ModuleType("myNotebook")
+    nb_module.Frame = tk.Frame  # pyright: ignore[reportAttributeAccessIssue]
+    nb_module.Label = tk.Label  # pyright: ignore[reportAttributeAccessIssue]
+    nb_module.Button = tk.Button  # pyright: ignore[reportAttributeAccessIssue]
+    nb_module.Checkbutton = tk.Checkbutton  # pyright: ignore[reportAttributeAccessIssue]
+    nb_module.EntryMenu = tk.Entry  # pyright: ignore[reportAttributeAccessIssue]
+
+    theme_module = types.ModuleType("theme")
+    theme_module.theme = _Theme()  # pyright: ignore[reportAttributeAccessIssue]
+
+    l10n_module = types.ModuleType("l10n")
+    l10n_module.Locale = _Locale  # pyright: ignore[reportAttributeAccessIssue]
+
+    hyperlink_module = types.ModuleType("ttkHyperlinkLabel")
+    hyperlink_module.HyperlinkLabel = _HyperlinkLabel  # pyright: ignore[reportAttributeAccessIssue]
+
+    for module in (config_module, nb_module, theme_module, l10n_module, hyperlink_module):
+        sys.modules[module.__name__] = module
+    return config
+
+
+class FakeNetwork:
+    """
+    Подменяет `requests.Session.request`: ответ выбирается по первому совпавшему правилу
+    (подстрока URL -> функция, возвращающая тело ответа), иначе отдаётся пустой JSON.
+    Считает количество запросов к каждому хосту.
+    """
+    def __init__(self):
+        self.requests_by_host: Counter[str] = Counter()
+        self._rules: list[tuple[str, Callable[[str, dict], str]]] = []
+        self._lock = threading.Lock()
+        self._original_request = None
+
+    def route(self, url_part: str, responder: Callable[[str, dict], str]):
+        self._rules.append((url_part, responder))
+
+    def install(self):
+        self._original_request = requests.Session.request
+        fake = self
+
+        def request(session, method, url, params=None, *args, **kwargs):
+            return fake._respond(method, url, params or {})
+
+        requests.Session.request = request  # pyright: ignore[reportAttributeAccessIssue]
+        webbrowser.open = lambda *args, **kwargs: True
+
+    def uninstall(self):
+        if self._original_request is not None:
+            requests.Session.request = self._original_request  # pyright: ignore[reportAttributeAccessIssue]
+            self._original_request = None
+
+    def _respond(self, method: str, url: str, params: dict) -> requests.Response:
+        with self._lock:
+            self.requests_by_host[urlsplit(url).hostname or url] += 1
+        body = "{}"
+        for url_part, responder in self._rules:
+            if url_part in url:
+                body = responder(url, params)
+                break
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = "utf-8"
+        response._content = body.encode("utf-8")
+        response.raw = io.BytesIO(response._content)
+        response.request = requests.Request(method, url, params=params).prepare()
+        return response
+
+
+def install_network_stub(cmdr: str, systems: dict[int, tuple[str, tuple[float, float, float]]]) -> FakeNetwork:
+    """
+    Создаёт и включает `FakeNetwork` с правилами для всех эндпоинтов, к которым обращается плагин.
+
+    :param cmdr: Имя командира - будет "найдено" в таблице сквадронов.
+    :param systems: Известные "Спаншу" системы: {id: (имя, координаты)}.
+    """
+    by_name = {name: (sid, coords) for sid, (name, coords) in systems.items()}
+
+    def spansh_system(url: str, params: dict) -> str:
+        sid = int(url.rstrip("/").rsplit("/", 1)[-1])
+        if sid not in systems:
+            return json.dumps({"error": "Not found"})
+        name, (x, y, z) = systems[sid]
+        return json.dumps({"record": {"id64": sid, "name": name, "x": x, "y": y, "z": z}})
+
+    def spansh_search(url: str, params: dict) -> str:
+        name = params.get("q")
+        if name not in by_name:
+            return json.dumps({"results": []})
+        sid, (x, y, z) = by_name[name]
+        return json.dumps({"results": [{"type": "system", "record": {"id64": sid, "name": name, "x": x, "y": y, "z": z}}]})
+
+    network = FakeNetwork()
+    network.route("spansh.co.uk/api/system/", spansh_system)
+    network.route("spansh.co.uk/api/search", spansh_search)
+    network.route("output=tsv", lambda url, params: f"CMDR\tSquadron\tSQID\n{cmdr}\tSCEC\tSCEC\n")
+    network.route("output=csv", lambda url, params: "")
+    network.route("api.github.com/gists", lambda url, params: json.dumps(
+        {"files": {"canonn_whitelist.json": {"content": "[]"}}}
+    ))
+    network.route("gitlab.com", lambda url, params: "[]")
+    network.route("ipify.org", lambda url, params: "127.0.0.1")
+    network.route("elitebgs.app", lambda url, params: json.dumps({"docs": [{"faction_presence": []}]}))
+    network.route("edsm.net/en/galactic-mapping", lambda url, params: "[]")
+    network.route("getSystemPoi", lambda url, params: json.dumps({"codex": []}))
+    network.install()
+    return network
@@ -1,10 +1,10 @@
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, fields
 from enum import IntEnum, StrEnum
 from pathlib import Path
-from queue import Queue
 from semantic_version import Version
-from typing import TYPE_CHECKING, Protocol
+from typing import TYPE_CHECKING, Any, Protocol
 
 # АХТУНГ: ничто из того, что здесь импортируется, не должно использовать начальные параметры контекста!
 # См. load.py -> Updater.__use_local_version
@@ -15,9 +15,12 @@ from lib.module import get_active_modules
 if TYPE_CHECKING:
     from core.journal_processor import JournalProcessor
     from core.notifier import Notifier
+    from core.outbox import Outbox
+    from core.resolver import Resolver
     from core.sound_player import Player
     from core.systems import SystemsCache
     from lib.module import Module
+    from load import EventQueue
     from modules.bgs import BGS
     from modules.canonn_api import CanonnRealtimeAPI
     from modules.colonisation import DeliveryTracker
@@ -63,12 +66,14 @@ class PluginContext:
 
     # core-объекты - заполняются загрузчиком в load.py
     logger: logging.Logger
-    _event_queue: Queue
+    _event_queue: 'EventQueue'
     _tr_template: TranslateFunc
 
     # core-объекты - создаются в core/plugin_init.py
     journal_processor: 'JournalProcessor'
     notifier: 'Notifier'
+    outbox: 'Outbox'
+    resolver: 'Resolver'
     sound_player: 'Player'
     systems_cache: 'SystemsCache'
 
@@ -122,6 +127,11 @@ class _FlagsBase:
     def update(self, val: int):
         self._raw = val
 
+    def copy(self):
+        obj = self.__class__()
+        obj._raw = self._raw
+        return obj
+
 
 class _Flag:
     def __init__(self, value):
@@ -194,10 +204,26 @@ class Flags2(_FlagsBase):
     NPC_CREW_ACTIVE         = _Flag(1 << 22)
 
 
+# снимок GameState, который видит текущий поток (см. GameState.use_snapshot)
+_snapshot_local = threading.local()
+
+
+class _GameStateMeta(type):
+    def __getattribute__(cls, name: str):
+        snapshot: dict[str, Any] | None = getattr(_snapshot_local, "values", None)
+        if snapshot is not None and name in snapshot:
+            return snapshot[name]
+        return super().__getattribute__(name)
+
+
 @dataclass
-class GameState:
+class GameState(metaclass=_GameStateMeta):
     """
     Хранит текущее состояние игры, включая полную репрезентацию status.json.
+
+    Изменяется только потоком обработчика журнала, включая callback-и фоновых задач, поставленных из него.
+    Модули его не изменяют. При параллельной передаче ивентов (см. `core.dispatch`) модули и callback-и
+    их фоновых задач читают его из снимка, сделанного в момент получения ивента.
     """
     # параметры
     cmdr: str | None            = None
@@ -239,3 +265,25 @@ class GameState:
     # флаги
     flags = Flags()
     flags2 = Flags2()
+
+    @classmethod
+    def snapshot(cls) -> dict[str, Any]:
+        """Копия текущего состояния для `use_snapshot`."""
+        values = {name: getattr(cls, name) for name in _GAME_STATE_FIELDS}
+        values["flags"] = cls.flags.copy()
+        values["flags2"] = cls.flags2.copy()
+        return values
+
+    @staticmethod
+    def use_snapshot(values: dict[str, Any] | None) -> dict[str, Any] | None:
+        """
+        Подменяет значения, которые текущий поток читает из GameState, на *values* (см. `snapshot`).
+        None возвращает чтение актуального состояния. Запись в GameState снимок не затрагивает.
+        Возвращает предыдущий снимок потока, чтобы его можно было восстановить.
+        """
+        previous = getattr(_snapshot_local, "values", None)
+        _snapshot_local.values = values
+        return previous
+
+
+_GAME_STATE_FIELDS = tuple(f.name for f in fields(GameState))
@@ -0,0 +1,39 @@
+"""
+Периодическая сводка о состоянии подсистем плагина в логе (уровень DEBUG): очередь ивентов, кэш систем,
+пул фоновых запросов, outbox и ограничитель запросов. Время работы хуков модулей сюда не входит - см. `core.profiler`.
+"""
+from core.context import PluginContext
+from core.rate_limit import rate_limiter
+from lib.thread import Thread
+
+
+def queue_status() -> str:
+    """Глубина очереди ивентов и задержка их обработки (см. `load.EventQueue`)."""
+    stats = PluginContext._event_queue.stats()
+    return (
+        f"Event queue: depth {stats['depth']} ({stats['spilled']} on disk), high-water mark {stats['high_water_mark']}, "
+        f"lag {stats['last_lag'] * 1000:.1f} ms (max {stats['max_lag'] * 1000:.1f} ms), "
+        f"spilled to disk in total: {stats['total_spilled']}."
+    )
+
+
+def status_report() -> str:
+    return "\n".join((
+        queue_status(),
+        PluginContext.systems_cache.stats_message(),
+        PluginContext.resolver.stats_message(),
+        PluginContext.outbox.stats_message(),
+        rate_limiter.stats_message(),
+    ))
+
+
+class DiagnosticsDumper(Thread):
+    DUMP_INTERVAL = 5 * 60  # s
+
+    def __init__(self):
+        super().__init__(name="Triumvirate diagnostics dumper")
+
+    def do_run(self):
+        while True:
+            self.sleep(self.DUMP_INTERVAL)
+            PluginContext.logger.debug("Plugin status:\n" + status_report())
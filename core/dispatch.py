@@ -0,0 +1,140 @@
+import threading
+import tkinter as tk
+from collections.abc import Callable, Iterable
+from queue import SimpleQueue
+from typing import Any
+
+import myNotebook as nb  # type: ignore
+
+from core.context import GameState, PluginContext
+from core.plugin_config import plugin_config
+from core.profiler import hook_profiler
+from lib.module import Module
+
+
+# isort: off
+import functools
+_translate = functools.partial(PluginContext._tr_template, filepath=__file__)
+# isort: on
+
+
+# (снимок GameState или None - оставить прежний, хук или продолжение из `call_soon`, ивент, аргументы)
+type _Task = tuple[dict[str, Any] | None, str | Callable[..., Any], str, tuple]
+
+
+class _Lane(threading.Thread):
+    """
+    Поток одного модуля: вызывает его хуки строго в порядке поступления ивентов.
+    Как и у обработчика журнала, это обычный threading.Thread, который перед выходом дорабатывает очередь.
+    """
+    def __init__(self, module: Module):
+        super().__init__(name=f"Triumvirate module lane: {type(module).__name__}", daemon=True)
+        self.module = module
+        self.queue: SimpleQueue[_Task | None] = SimpleQueue()
+        self.processed = 0
+
+    def call_soon(self, callback: Callable[..., Any], *args):
+        """
+        Вызывает *callback* в этом потоке после уже переданных модулю ивентов, со снимком `GameState` последнего из них.
+        Так результаты фоновых задач (см. `core.resolver`) применяются без гонок с хуками модуля.
+        """
+        self.queue.put((None, callback, "continuation", args))
+
+    def run(self):
+        while (task := self.queue.get()) is not None:
+            snapshot, hook, event, args = task
+            if snapshot is not None:     # иначе это продолжение из `call_soon`
+                GameState.use_snapshot(snapshot)
+                self.processed += 1
+            try:
+                if callable(hook):
+                    hook(*args)
+                else:
+                    with hook_profiler.measure(self.module, hook, event):
+                        getattr(self.module, hook)(*args)
+            except Exception as e:
+                PluginContext.logger.error(f"Exception in module {self.module} while processing {hook} ({event}).", exc_info=e)
+        GameState.use_snapshot(None)
+
+
+def current_lane() -> _Lane | None:
+    """Поток модуля, в котором выполняется вызывающий код, или None вне `ModuleLanes`."""
+    thread = threading.current_thread()
+    return thread if isinstance(thread, _Lane) else None
+
+
+class ModuleLanes:
+    """
+    Параллельная передача ивентов модулям.
+
+    У каждого модуля своя очередь и свой поток, поэтому медленный модуль задерживает только себя,
+    а порядок ивентов внутри модуля сохраняется. Вместе с ивентом в очередь кладётся снимок `GameState`
+    на момент его обработки обработчиком журнала: модуль видит то же состояние, что и в последовательном режиме,
+    даже если обработчик уже ушёл вперёд.
+    """
+    def __init__(self):
+        self._lanes: dict[Module, _Lane] = dict()
+
+    def submit(self, modules: Iterable[Module], hook: str, event: str, *args):
+        """Ставит вызов `hook(*args)` в очередь каждого включённого модуля из *modules*."""
+        snapshot = None
+        for mod in modules:
+            if not mod.enabled:
+                continue
+            if snapshot is None:
+                snapshot = GameState.snapshot()     # один на всех: модули его не меняют
+            lane = self._lanes.get(mod)
+            if lane is None:
+                lane = self._lanes[mod] = _Lane(mod)
+                lane.start()
+            lane.queue.put((snapshot, hook, event, args))
+
+    def join(self):
+        """Дожидается, пока все модули обработают уже переданные им ивенты, и останавливает потоки."""
+        for lane in self._lanes.values():
+            lane.queue.put(None)
+        for lane in self._lanes.values():
+            lane.join()
+        PluginContext.logger.debug(
+            "Module lanes stopped. Events processed: "
+            + ", ".join(f"{type(mod).__name__} {lane.processed}" for mod, lane in self._lanes.items())
+        )
+        self._lanes.clear()
+
+
+class DispatchMode:
+    """
+    Выбор режима передачи ивентов модулям: последовательно в потоке обработчика журнала
+    (по умолчанию) или параллельно, каждому модулю в своём потоке (см. `ModuleLanes`).
+    Режим выбирается при запуске обработчика, поэтому изменение вступает в силу после перезапуска EDMC.
+    """
+    config_key = "ParallelModuleDispatch"
+
+    def __init__(self):
+        self._var: tk.BooleanVar | None = None
+
+    @property
+    def parallel(self) -> bool:
+        return bool(plugin_config.get_bool(self.config_key))
+
+    def plugin_prefs(self, parent: tk.Misc, row: int):
+        frame = nb.Frame(parent)
+        frame.columnconfigure(0, weight=1)
+        frame.grid(row=row, column=0, sticky="NSEW")
+        self._var = tk.BooleanVar(value=self.parallel)
+        nb.Checkbutton(frame, text=_translate("Pass events to modules in parallel (requires restart)"), variable=self._var).grid(
+            row=0, column=0, sticky="NW"
+        )
+        return frame
+
+    def prefs_changed(self):
+        if self._var is None:
+            return
+        parallel = self._var.get()
+        if parallel != self.parallel:
+            plugin_config.set(self.config_key, parallel)
+            PluginContext.logger.debug(f"Parallel module dispatch {'enabled' if parallel else 'disabled'}, restart required.")
+        self._var = None
+
+
+dispatch_mode = DispatchMode()
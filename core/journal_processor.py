@@ -1,8 +1,20 @@
-from queue import Empty, Queue
+import functools
+import json
+from collections.abc import Callable
+from pathlib import Path
+from queue import Empty, SimpleQueue
 from threading import Event, Thread
+from typing import Any
+
+from config import config as edmc_config  # type: ignore
 
 from core.context import GameState, PluginContext
+from core.dispatch import ModuleLanes, dispatch_mode
+from core.profiler import hook_profiler
+from core.systems import SystemData
+from lib import events
 from lib.journal import Coords, JournalEntry
+from lib.module import get_event_index
 from modules import legacy
 
 
@@ -12,29 +24,58 @@ from modules import legacy
 class JournalProcessor(Thread):
     def __init__(self):
         super().__init__(name="Triumvirate journal entry processor")
-        self.queue: Queue[dict] = PluginContext._event_queue
+        self.queue = PluginContext._event_queue
         self._startup = True
         self._stop = Event()  # флаг остановки потока
+        # все модули к этому моменту уже созданы (см. plugin_init.plugin_app)
+        self._event_index = get_event_index()
+        # запись, вынутая из очереди при схлопывании снимков статуса; обрабатывается следующей
+        self._pending_entry: dict | None = None
+        self.dashboard_entries_skipped = 0
+        # результаты фоновых задач (см. core.resolver), применяемые в этом потоке
+        self._continuations: SimpleQueue[tuple[Callable, tuple]] = SimpleQueue()
+        self._resolving_sids: set[int] = set()
+        # None - модули вызываются последовательно в этом же потоке
+        self._lanes: ModuleLanes | None = ModuleLanes() if dispatch_mode.parallel else None
+        PluginContext.logger.debug(f"Module dispatch mode: {'parallel' if self._lanes is not None else 'serial'}.")
 
 
     def set_stop(self):
         self._stop.set()
 
 
+    def call_soon(self, callback: Callable[..., Any], *args):
+        """
+        Вызывает *callback* в потоке обработчика перед обработкой следующей записи.
+        Потокобезопасно; используется для применения результатов фоновых задач.
+        """
+        self._continuations.put((callback, args))
+        # будим обработчик, если он ждёт новых записей
+        self.queue.put({"type": "continuation", "data": ()})
+
+
     def run(self):
-        while not (self._stop.is_set() and self.queue.empty()):  # мы хотим обработать очередь ивентов до конца перед выходом
-            try:
-                entry = self.queue.get(timeout=1)
-            except Empty:
-                continue
+        # мы хотим обработать очередь ивентов до конца перед выходом
+        while not (self._stop.is_set() and self.queue.empty() and self._pending_entry is None and self._continuations.empty()):
+            self._run_continuations()
+            if self._pending_entry is not None:
+                entry, self._pending_entry = self._pending_entry, None
+            else:
+                try:
+                    entry = self.queue.get(timeout=1)
+                except Empty:
+                    continue
             try:
                 match entry["type"]:
                     case "journal_entry":
                         self.on_journal_entry(*entry["data"])
                     case "dashboard_entry":
+                        entry = self._skip_superseded_dashboard_entries(entry)
                         self.on_dashboard_entry(*entry["data"])
                     case "cmdr_data":
                         self.on_cmdr_data(*entry["data"])
+                    case "continuation":
+                        pass    # уже выполнено в _run_continuations
                     case _:
                         raise ValueError("unknown entry type")
             except Exception as e:
@@ -50,14 +91,51 @@ class JournalProcessor(Thread):
                     timeout=0
                 )
 
+        if self._lanes is not None:
+            self._lanes.join()
+
         # log on exit
-        PluginContext.logger.debug("Journal processor stopped.")
+        stats = self.queue.stats()
+        PluginContext.logger.debug(
+            f"Journal processor stopped. Superseded dashboard entries skipped: {self.dashboard_entries_skipped}. "
+            f"Queue high-water mark: {stats['high_water_mark']}, max lag: {stats['max_lag']:.2f} s, "
+            f"spilled to disk: {stats['total_spilled']}."
+        )
+
+
+    def _run_continuations(self):
+        while not self._continuations.empty():
+            callback, args = self._continuations.get()
+            try:
+                callback(*args)
+            except Exception as e:
+                PluginContext.logger.error(f"Exception in continuation {callback!r}.", exc_info=e)
+
+
+    def _skip_superseded_dashboard_entries(self, entry: dict) -> dict:
+        """
+        Status.json каждый раз содержит полный снимок состояния, поэтому из идущих подряд
+        обновлений достаточно применить последнее. Вынимает из очереди все снимки, следующие
+        за *entry*, и возвращает самый свежий из них. Первая же запись другого типа
+        откладывается и будет обработана следующей, так что порядок журнала не нарушается.
+        """
+        while True:
+            try:
+                next_entry = self.queue.get_nowait()
+            except Empty:
+                return entry
+            if next_entry["type"] != "dashboard_entry":
+                self._pending_entry = next_entry
+                return entry
+            entry = next_entry
+            self.dashboard_entries_skipped += 1
 
 
     def on_journal_entry(self, cmdr: str | None, is_beta: bool, system: str | None, station: str | None, entry: dict, state: dict):
         GameState.game_in_beta = is_beta
         GameState.station = station
         GameState.odyssey = state["Odyssey"]
+        record = self._decode(entry)
 
         # ПРОВЕРКА КОМАНДИРА
         new_cmdr = GameState.cmdr
@@ -74,51 +152,64 @@ class JournalProcessor(Thread):
                 GameState.cmdr, GameState.squadron, GameState.legacy_sqid = None, None, None
             else:
                 GameState.cmdr = new_cmdr
+                # до получения ответа сквадрон неизвестен, а не остаётся от прошлого командира
+                GameState.squadron, GameState.legacy_sqid = None, None
                 PluginContext.logger.debug(f"New CMDR: {GameState.cmdr}. Fetching the squadron.")
-                GameState.squadron, GameState.legacy_sqid = legacy.fetch_squadron()
-                PluginContext.logger.debug(f"Squadron set to {GameState.squadron}, SQID set to {GameState.legacy_sqid}.")
+                PluginContext.resolver.submit(
+                    legacy.fetch_squadron, new_cmdr, callback=functools.partial(self._set_squadron, new_cmdr)
+                )
+
+        # ПРОВЕРКА СКВАДРОНА
+        # сообщает о смене сквадрона модуль SquadronTracker, но GameState меняем здесь
+        if entry["event"] in ("SquadronStartup", "JoinedSquadron", "SquadronCreated"):
+            GameState.squadron = entry["SquadronName"].upper()
+            PluginContext.logger.debug(f"Squadron set to {GameState.squadron} by {entry['event']}.")
+        elif entry["event"] in ("KickedFromSquadron", "LeftSquadron", "DisbandedSquadron"):
+            GameState.squadron, GameState.legacy_sqid = None, None
+            PluginContext.logger.debug(f"Squadron and SQID are reset to None by {entry['event']}.")
 
         # РЕПОРТ ВЕРСИИ ПЛАГИНА ПРИ ЗАПУСКЕ
         if self._startup and GameState.cmdr is not None:
             PluginContext.logger.debug("Reporting the plugin version.")
-            legacy.report_version()
+            PluginContext.resolver.submit(legacy.report_version, GameState.cmdr)
             self._startup = False
 
         # ПРОВЕРКА ЛОКАЦИИ
         # Комплексная тема, тут может быть несколько сценариев.
         # 1) Обычный вход в игру или прыжок
-        if entry["event"] in ("Location", "FSDJump", "CarrierJump"):
-            PluginContext.systems_cache.cache_system(entry)
-            GameState.system = entry["StarSystem"]
-            GameState.system_address = entry["SystemAddress"]
-            GameState.system_coords = Coords(*entry["StarPos"])
+        if entry["event"] in ("FSDJump", "Location", "CarrierJump"):
+            if isinstance(record, (events.FSDJump, events.Location)):
+                system, sid, coords = record.star_system, record.system_address, record.star_pos
+            else:
+                # ивент не разобрался (например, нет StarPos) - берём, что есть, чтобы не застрять в старой системе
+                system, sid, pos = entry.get("StarSystem"), entry.get("SystemAddress"), entry.get("StarPos")
+                coords = Coords(*pos) if isinstance(pos, list) and len(pos) == 3 else None
+            if None not in (sid, system, coords):
+                PluginContext.systems_cache.cache_system(sid, system, coords)   # pyright: ignore[reportArgumentType]
+            GameState.system = system
+            GameState.system_address = sid
+            GameState.system_coords = coords
             GameState.pending_jump_system = None
             GameState.pending_jump_system_id = None
             PluginContext.logger.debug(
                 f"Event {entry['event']} detected. Location change: "
                 f"system {GameState.system} (id {GameState.system_address}), coords {GameState.system_coords}."
             )
+            if coords is None and sid is not None:
+                self._resolve_system(sid, expected_address=sid)
 
         # 2) Игрок запустил плагин после входа в игру, и у нас ничего нет. Придётся полагаться на данные EDMC
         elif entry["event"] == "StartUp":
             PluginContext.logger.debug("Seems like the game is already running. Using EDMC's location data.")
             GameState.system = state.get("SystemName")
             GameState.system_address = state.get("SystemAddress")
-            GameState.system_coords = (
-                Coords(*state["StarPos"])
-                if "StarPos" in state and state["StarPos"] is not None
-                else PluginContext.systems_cache.get_system_coords(GameState.system_address) if GameState.system_address is not None
-                else None
-            )
-            if GameState.system_coords is None:
-                PluginContext.logger.debug(
-                    "EDMC didn't provide us with the system coordinates, also failed to fetch them from system address "
-                    f"({GameState.system_address}). Showing user warning."
-                )
-                PluginContext.systems_cache.show_coords_warning()
+            GameState.system_coords = Coords(*state["StarPos"]) if state.get("StarPos") is not None else None
             PluginContext.logger.debug(
                 f"Location change: system {GameState.system} (id {GameState.system_address}), coords {GameState.system_coords}."
             )
+            if GameState.system_coords is None and GameState.system_address is not None:
+                PluginContext.logger.debug("EDMC didn't provide us with the system coordinates, resolving them from system address.")
+                self._resolve_system(GameState.system_address, expected_address=GameState.system_address)
 
         # 3) Готовящийся прыжок - мы всё ещё в старой системе
         elif entry["event"] == "StartJump" and entry["JumpType"] == "Hyperspace":
@@ -129,17 +220,17 @@ class JournalProcessor(Thread):
             )
 
         # 4) Прыжок совершён, но FSD/CarrierJump ещё не было, а данные из новой системы уже пошли
-        elif entry["event"] == "FSSSignalDiscovered" and entry["SystemAddress"] != GameState.system_address:
+        elif isinstance(record, events.FSSSignalDiscovered) and record.system_address != GameState.system_address:
             PluginContext.logger.debug("Detected SystemAddress mismatch in FSSSignalDiscovered event.")
-            system_id: int = entry["SystemAddress"]
+            system_id: int = record.system_address
             if system_id == GameState.pending_jump_system_id:
                 GameState.system = GameState.pending_jump_system
                 GameState.system_address = GameState.pending_jump_system_id
-                GameState.system_coords = PluginContext.systems_cache.get_system_coords(system_id)
+                GameState.system_coords = None
                 PluginContext.logger.debug(
-                    f"New id ({system_id}) corresponds with the pending jump. Current system set to {GameState.system}, "
-                    f"coords = {GameState.system_coords}."
+                    f"New id ({system_id}) corresponds with the pending jump. Current system set to {GameState.system}."
                 )
+                self._resolve_system(system_id, expected_address=system_id)
                 # pending-и сохраним до ивента прыжка, там сбросим
             else:
                 if GameState.system_address is None and GameState.pending_jump_system_id is None:
@@ -151,27 +242,15 @@ class JournalProcessor(Thread):
                         f"Unexpected misjump: new system id ({system_id}) doesn't match the pending one "
                         f"({GameState.pending_jump_system_id})."
                     )
-                new_system = PluginContext.systems_cache.get_system_name(system_id)
-                new_coords = PluginContext.systems_cache.get_system_coords(system_id)
-                if None not in (new_system, new_coords):
-                    GameState.system = new_system
-                    GameState.system_address = system_id
-                    GameState.system_coords = new_coords
-                    PluginContext.logger.debug(f"System changed to {new_system}, coords: {new_coords}.")
-                else:
-                    # в кэше данных не нашлось, вытянуть с интернетов тоже не вышло
-                    PluginContext.logger.warning("No info on the new system id found. Keeping the old system for now.")
+                # систему сменим, только когда узнаем о ней всё; до тех пор остаёмся в старой
+                self._resolve_system(system_id, expected_address=GameState.system_address)
 
         # 5) Вход в игру рядом с поселением. ApproachSettlement опережает в логах Location и даже FSSSignalDiscovered
         elif entry["event"] == "ApproachSettlement" and GameState.system_address is None:
             sid: int = entry["SystemAddress"]
             GameState.system_address = sid
-            GameState.system = PluginContext.systems_cache.get_system_name(sid)
-            GameState.system_coords = PluginContext.systems_cache.get_system_coords(sid)
-            PluginContext.logger.debug(
-                "Detected ApproachSettlement on game startup. "
-                f"Got system id {sid}, fetched system name {GameState.system}, fetched coords {GameState.system_coords}."
-            )
+            PluginContext.logger.debug(f"Detected ApproachSettlement on game startup. Got system id {sid}.")
+            self._resolve_system(sid, expected_address=sid)
 
         # 6) Ещё неизвестные нам случаи, тут только логировать
         elif (
@@ -184,12 +263,13 @@ class JournalProcessor(Thread):
                 f"event {entry['event']}, current {GameState.system_address}, got {entry['SystemAddress']}."
             )
 
-        if GameState.system_coords is None and not PluginContext.systems_cache.coords_warning_shown():
-            PluginContext.logger.debug("System coordinates unknown, showing user warning.")
-            PluginContext.systems_cache.show_coords_warning()
-        elif GameState.system_coords is not None and PluginContext.systems_cache.coords_warning_shown():
-            PluginContext.logger.debug("Hiding unknown coordinates warning.")
-            PluginContext.systems_cache.hide_coords_warning()
+        self._update_coords_warning()
+        self._harvest_systems(entry, state)
+
+        # ПРОЛОЖЕННЫЙ МАРШРУТ
+        # Координаты всех систем маршрута известны заранее - кладём их в кэш, чтобы по прибытии не ходить в сеть.
+        if entry["event"] == "NavRoute":
+            self._cache_route(entry)
 
         # ПЕРЕДАЧА ДАННЫХ МОДУЛЯМ
         # Как видно, после перехода на GameState - JournalEntry как таковой стал не нужен.
@@ -202,25 +282,141 @@ class JournalProcessor(Thread):
             station=GameState.station,
             data=entry,
             state=state,
-            coords=GameState.system_coords
+            coords=GameState.system_coords,
+            record=record
         )
 
-        if entry["event"] in ('SendText', 'RecieveText'):
+        if self._lanes is not None:
+            if entry["event"] in ('SendText', 'RecieveText'):
+                self._lanes.submit(PluginContext.active_modules, "on_chat_message", entry["event"], journal_entry)
+            else:
+                self._lanes.submit(self._event_index[entry["event"]], "on_journal_entry", entry["event"], journal_entry)
+        elif entry["event"] in ('SendText', 'RecieveText'):
             for mod in PluginContext.active_modules:
                 try:
-                    mod.on_chat_message(journal_entry)
+                    with hook_profiler.measure(mod, "on_chat_message", entry["event"]):
+                        mod.on_chat_message(journal_entry)
                 except Exception as e:
                     PluginContext.logger.error(f"Exception in module {mod} while processing a chat message.", exc_info=e)
                     # TODO: убрать после тестирования 1.12.0
                     PluginContext.notifier.display("Ошибка при обработке логов. Пожалуйста, сообщите @elcy.", 0)
         else:
-            for mod in PluginContext.active_modules:
+            # передаём запись только модулям, подписанным на этот ивент (см. Module.events)
+            for mod in self._event_index[entry["event"]]:
+                if not mod.enabled:
+                    continue
                 try:
-                    mod.on_journal_entry(journal_entry)
+                    with hook_profiler.measure(mod, "on_journal_entry", entry["event"]):
+                        mod.on_journal_entry(journal_entry)
                 except Exception as e:
                     PluginContext.logger.error(f"Exception in module {mod} while processing a journal entry.", exc_info=e)
 
 
+    def _resolve_system(self, sid: int, expected_address: int | None):
+        """
+        Узнаёт имя и координаты системы *sid*, не дожидаясь сети. Результат применяется к `GameState`,
+        только если текущая система за это время не сменилась (`GameState.system_address == expected_address`).
+        Если система есть в кэше, это происходит сразу же, ещё до передачи записи модулям.
+        """
+        if sid in self._resolving_sids:
+            return      # уже запрошено, например, предыдущим FSSSignalDiscovered
+
+        def apply(data: SystemData | None):
+            self._resolving_sids.discard(sid)
+            if GameState.system_address != expected_address:
+                PluginContext.logger.debug(f"Location changed while resolving sid {sid}, discarding the result.")
+                return
+            if data is None:
+                # в кэше данных не нашлось, вытянуть с интернетов тоже не вышло
+                PluginContext.logger.warning(f"No info on the system id {sid} found. Keeping the current location data for now.")
+                return
+            GameState.system = data.name
+            GameState.system_address = sid
+            GameState.system_coords = data.coords
+            PluginContext.logger.debug(f"System resolved: {data.name} (id {sid}), coords: {data.coords}.")
+            self._update_coords_warning()
+
+        self._resolving_sids.add(sid)
+        PluginContext.systems_cache.resolve_system(sid, apply)
+
+
+    def _harvest_systems(self, entry: dict, state: dict):
+        """
+        Попутно собирает в кэш систем всё, что известно о системах целиком (id, имя и координаты):
+        из самой записи и из state EDMC, где всегда лежит текущая система.
+        Пары id-имя без координат (FSDTarget, CarrierJumpRequest, Scan и т.п.) тоже сохраняются:
+        по имени такую систему можно найти в источниках, которые не ищут по id.
+        """
+        event = entry["event"]
+        if event not in ("FSDJump", "Location", "CarrierJump"):   # эти уже сохранены выше
+            # имя системы в FSDTarget лежит в Name, в CarrierJumpRequest - в SystemName
+            name = entry.get("Name") if event == "FSDTarget" else entry.get("StarSystem") or entry.get("SystemName")
+            if None not in (sid := entry.get("SystemAddress"), name):
+                coords = Coords(*pos) if (pos := entry.get("StarPos")) is not None else None
+                PluginContext.systems_cache.harvest(sid, name, coords)   # pyright: ignore[reportArgumentType]
+        if None not in (sid := state.get("SystemAddress"), name := state.get("SystemName"), pos := state.get("StarPos")):
+            PluginContext.systems_cache.harvest(sid, name, Coords(*pos))   # pyright: ignore[reportArgumentType]
+
+
+    def _cache_route(self, entry: dict):
+        """
+        Сохраняет в кэш систем все системы маршрута из ивента NavRoute. EDMC обычно сам добавляет
+        в ивент содержимое NavRoute.json (поле Route); если его нет, файл читается из папки журналов.
+        """
+        route: list[dict] | None = entry.get("Route")
+        if route is None:
+            path = Path(edmc_config.get_str("journaldir") or edmc_config.default_journal_dir) / "NavRoute.json"
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    route = json.load(f).get("Route")
+            except (OSError, json.JSONDecodeError) as e:
+                PluginContext.logger.warning(f"Couldn't read the plotted route from {path}.", exc_info=e)
+                return
+        if not route:
+            return
+        try:
+            systems = [SystemData(item["SystemAddress"], item["StarSystem"], Coords(*item["StarPos"])) for item in route]
+        except (KeyError, TypeError) as e:
+            PluginContext.logger.warning("Unexpected NavRoute format, the route is not cached.", exc_info=e)
+            return
+        PluginContext.systems_cache.cache_systems(systems)
+        PluginContext.logger.debug(f"Plotted route of {len(systems)} systems cached.")
+
+
+    def _decode(self, entry: dict) -> events.JournalEvent | None:
+        """Разбирает частые ивенты в типизированные записи один раз для всех модулей."""
+        try:
+            return events.decode(entry)
+        except (KeyError, TypeError, ValueError) as e:
+            PluginContext.logger.warning(f"Couldn't decode the {entry['event']} event, passing it as is.", exc_info=e)
+            return None
+
+
+    def _update_coords_warning(self):
+        if GameState.system_coords is None and not PluginContext.systems_cache.coords_warning_shown():
+            PluginContext.logger.debug("System coordinates unknown, showing user warning.")
+            PluginContext.systems_cache.show_coords_warning()
+        elif GameState.system_coords is not None and PluginContext.systems_cache.coords_warning_shown():
+            PluginContext.logger.debug("Hiding unknown coordinates warning.")
+            PluginContext.systems_cache.hide_coords_warning()
+
+
+    def _set_squadron(self, cmdr: str, squadron_data: tuple[str | None, str | None] | None):
+        if GameState.cmdr != cmdr:
+            PluginContext.logger.debug(f"CMDR changed while fetching the squadron of {cmdr}, discarding the result.")
+            return
+        if squadron_data is None:
+            PluginContext.logger.debug(f"Squadron list is unavailable, keeping the squadron of {cmdr} as is.")
+            return
+        squadron, GameState.legacy_sqid = squadron_data
+        if GameState.legacy_sqid is not None:
+            PluginContext.patrol_module.sqid = GameState.legacy_sqid
+        # ответ приходит позже SquadronStartup, а журнал знает сквадрон точнее нашей таблицы
+        if GameState.squadron is None:
+            GameState.squadron = squadron
+        PluginContext.logger.debug(f"Squadron set to {GameState.squadron}, SQID set to {GameState.legacy_sqid}.")
+
+
     def on_dashboard_entry(self, cmdr: str | None, is_beta: bool, entry: dict):
         GameState.game_in_beta = is_beta
 
@@ -250,11 +446,19 @@ class JournalProcessor(Thread):
         if (flags2 := entry.get("Flags2")) is not None:
             GameState.flags2.update(flags2)
 
+        if self._lanes is not None:
+            self._lanes.submit(PluginContext.active_modules, "on_dashboard_entry", "Status", cmdr, is_beta, entry)
+            return
         for mod in PluginContext.active_modules:
-            mod.on_dashboard_entry(cmdr, is_beta, entry)
+            with hook_profiler.measure(mod, "on_dashboard_entry", "Status"):
+                mod.on_dashboard_entry(cmdr, is_beta, entry)
 
 
     def on_cmdr_data(self, data: dict, is_beta: bool):
         GameState.game_in_beta = is_beta
+        if self._lanes is not None:
+            self._lanes.submit(PluginContext.active_modules, "on_cmdr_data", "CAPI", data, is_beta)
+            return
         for mod in PluginContext.active_modules:
-            mod.on_cmdr_data(data, is_beta)
+            with hook_profiler.measure(mod, "on_cmdr_data", "CAPI"):
+                mod.on_cmdr_data(data, is_beta)
@@ -1,4 +1,6 @@
+import threading
 import tkinter as tk
+from contextlib import contextmanager
 from PIL import Image, ImageTk
 from semantic_version import Version
 
@@ -88,6 +90,7 @@ class Notifier(tk.Frame):
         _Message._set_images()
         self.gridrow = row
         self._pool: list[_Message] = list()
+        self._muted = threading.local()
 
 
     def display(self, text: str, timeout: int = 60):
@@ -99,9 +102,22 @@ class Notifier(tk.Frame):
         *timeout* - промежуток времени, спустя который уведомление автоматически скроется.
         Можно задать 0, тогда оно будет висеть, пока пользователь сам его не закроет.
         """
+        if getattr(self._muted, "active", False):
+            PluginContext.logger.debug(f"Notification suppressed: {text!r}.")
+            return
         self.after(0, self.__display, text, timeout)
 
 
+    @contextmanager
+    def muted(self):
+        """Уведомления, выводимые текущим потоком внутри блока, только пишутся в лог."""
+        self._muted.active = True
+        try:
+            yield
+        finally:
+            self._muted.active = False
+
+
     def clear(self):
         """Очищает фрейм, удаляя все уведомления."""
         self.after(0, self.__clear)
@@ -0,0 +1,376 @@
+"""
+Надёжная отправка отчётов (Google-формы, Canonn): очередь исходящих в userdata/outbox.db и постоянный пул воркеров.
+
+Отчёт сначала записывается в БД и только потом отправляется, поэтому он переживает и закрытие EDMC,
+и пропавшую сеть: неотправленное подхватывается при следующем запуске. Повторы зависят от ответа сервера:
+- 2XX - отчёт доставлен и удаляется из очереди;
+- 408, 5XX и сетевые ошибки - повтор с экспоненциально растущей задержкой (со случайным разбросом);
+- 429 - повтор через `Retry-After` (или `RATE_LIMIT_DELAY`, если сервер его не указал);
+- остальные 4XX - повторять бессмысленно, отчёт помечается неудачным.
+Неудачные отчёты хранятся `FAILED_TTL` вместе с причиной, чтобы их можно было разобрать.
+Отчёты, отправленные с ключом `dedup_key`, проверяются на повторы: если за последние `DEDUP_WINDOW` секунд
+на тот же адрес уже ставился в очередь точно такой же отчёт с тем же ключом (например, после перезахода в игру
+или повторного Location те же данные приходят снова), он отбрасывается. Ключ описывает, что означает отчёт:
+обычно это его содержание (фракция, система, влияние...), и тогда повтор отбрасывается, даже если пришёл
+с другим ивентом. Если одинаковые отчёты могут быть законными (например, две одинаковые выплаты), ключом
+служит породивший отчёт ивент (см. `event_key`). В сам отчёт ключ не попадает.
+Хэши отчётов хранятся в той же БД и переживают перезапуск.
+Частоту запросов к каждому хосту ограничивает общий `core.rate_limit.rate_limiter`: пока хост приостановлен,
+отчёты для него откладываются, не расходуя попыток.
+"""
+import hashlib
+import json
+import requests
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from threading import Event, Lock
+from typing import Literal
+
+from core.context import PluginContext
+from core.plugin_config import plugin_config
+from core.rate_limit import backoff, rate_limiter, retry_after
+from lib.thread import Thread, ThreadExit
+
+
+type PayloadKind = Literal["form", "json"]
+
+
+def event_key(entry: dict) -> str:
+    """
+    Ключ для `dedup_key`: время и название ивента журнала, из-за которого отправляется отчёт. Для отчётов,
+    одинаковое содержание которых ещё не означает повтор: отбрасывается только тот же ивент, прочитанный снова.
+    """
+    return f"{entry['timestamp']} {entry['event']}"
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created REAL NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        last_error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt)",
+    """
+    CREATE TABLE IF NOT EXISTS report_hashes (
+        url TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        created REAL NOT NULL,
+        PRIMARY KEY (url, hash)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+class _Item:
+    __slots__ = ("id", "url", "kind", "payload", "attempts")
+
+    def __init__(self, id: int, url: str, kind: PayloadKind, payload: str, attempts: int):
+        self.id = id
+        self.url = url
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class _DeliveryWorker(Thread):
+    def __init__(self, outbox: 'Outbox', num: int):
+        super().__init__(name=f"Triumvirate outbox worker {num}")
+        self._outbox = outbox
+
+    def do_run(self):
+        while True:
+            if self.STOP:
+                raise ThreadExit()
+            try:
+                item = self._outbox._claim()
+            except sqlite3.Error as e:
+                PluginContext.logger.error("Outbox: couldn't read the queue.", exc_info=e)
+                item = None
+            if item is None:
+                self._idle()
+                continue
+            try:
+                self._outbox._deliver(item)
+            except ThreadExit:
+                raise
+            except Exception as e:
+                # неожиданная ошибка не должна ни остановить воркер, ни оставить отчёт в статусе 'sending'
+                PluginContext.logger.error(f"Outbox: unexpected error while sending a report to {item.url}.", exc_info=e)
+                self._outbox._recover(item, type(e).__name__)
+
+    def _idle(self):
+        """Ждёт нового отчёта или срока ближайшего повтора, проверяя флаг остановки."""
+        deadline = time.monotonic() + self._outbox._time_to_next()
+        while time.monotonic() < deadline:
+            if self.STOP:
+                raise ThreadExit()
+            if self._outbox._wakeup.wait(self.SLEEP_DURATION):
+                self._outbox._wakeup.clear()
+                return
+
+
+class Outbox:
+    """
+    Очередь исходящих отчётов. Вместо отдельного потока на каждый отчёт:
+    ```
+    PluginContext.outbox.post_form(url, params)     # Google-формы
+    PluginContext.outbox.post_json(url, payload)    # Canonn
+    ```
+    Доставка "хотя бы один раз": отчёт, отправка которого прервалась закрытием EDMC, будет отправлен повторно.
+    """
+    WORKERS = 2
+    MAX_ATTEMPTS = 10
+    RETRY_DELAY = 10            # s, первый повтор; дальше задержка удваивается
+    MAX_RETRY_DELAY = 30 * 60   # s
+    RATE_LIMIT_DELAY = 10 * 60  # s, для 429 без Retry-After
+    RATE_LIMIT_WAIT = 1         # s, дольше воркер не ждёт разрешения `rate_limiter` и откладывает отчёт
+    REQUEST_TIMEOUT = 10        # s
+    POLL_INTERVAL = 5           # s, как часто простаивающие воркеры заглядывают в очередь
+    FAILED_TTL = 7 * 24 * 3600  # s
+    DEDUP_WINDOW = 5 * 60       # s, по умолчанию; можно изменить настройкой `DEDUP_WINDOW_KEY`
+    DEDUP_WINDOW_KEY = "Outbox.DedupWindow"
+
+    def __init__(self, path: Path | None = None):
+        path = path or PluginContext.plugin_dir / "userdata" / "outbox.db"
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._closed = False
+        self._started = time.monotonic()
+        self._sent = 0
+        self._retries = 0
+        self._failed = 0
+        self._duplicates = 0
+        self._dedup_window = plugin_config.get_int(self.DEDUP_WINDOW_KEY) or self.DEDUP_WINDOW
+        self._errors: Counter[str] = Counter()  # причины неудач и повторов за сессию
+        with self._lock:
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            # отправка этих отчётов прервалась закрытием EDMC
+            recovered = self._db.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'").rowcount
+            self._db.execute("DELETE FROM outbox WHERE status = 'failed' AND created < ?", (time.time() - self.FAILED_TTL,))
+            self._db.execute("DELETE FROM report_hashes WHERE created < ?", (time.time() - self._dedup_window,))
+            self._db.commit()
+            pending = self._db.execute("SELECT count(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        if pending:
+            PluginContext.logger.info(f"Outbox: {pending} reports left from the previous session ({recovered} interrupted).")
+        self._workers = [_DeliveryWorker(self, i) for i in range(self.WORKERS)]
+        for worker in self._workers:
+            worker.start()
+
+    def post_form(self, url: str, params: dict, dedup_key: str | None = None):
+        """
+        Отправка полей формы (`application/x-www-form-urlencoded`), как `requests.post(url, params)`.
+        *dedup_key* - не отправлять, если такой же отчёт с тем же ключом уже отправлялся недавно (см. описание модуля).
+        """
+        self._enqueue([(url, "form", params)], dedup_key)
+
+    def post_forms(self, reports: list[tuple[str, dict]], dedup_key: str | None = None):
+        """Как `post_form` для пачки отчётов, но одной записью в БД."""
+        self._enqueue([(url, "form", params) for url, params in reports], dedup_key)
+
+    def post_json(self, url: str, payload: dict, dedup_key: str | None = None):
+        """Отправка *payload* в JSON (`application/json`)."""
+        self._enqueue([(url, "json", payload)], dedup_key)
+
+    def close(self):
+        """Вызывать после остановки воркеров (см. `BasicThread.join_all`). Неотправленное останется в БД."""
+        message = self.stats_message()
+        with self._lock:
+            self._closed = True
+            self._db.close()
+        PluginContext.logger.debug(f"Outbox closed. {message}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._closed:
+                pending = failed = 0
+            else:
+                counts = dict(self._db.execute("SELECT status, count(*) FROM outbox GROUP BY status").fetchall())
+                pending = counts.get("pending", 0) + counts.get("sending", 0)
+                failed = counts.get("failed", 0)
+            minutes = (time.monotonic() - self._started) / 60
+            return {
+                "sent": self._sent,
+                "retries": self._retries,
+                "failed": self._failed,
+                "pending": pending,
+                "failed_stored": failed,
+                "duplicates": self._duplicates,
+                "per_minute": self._sent / minutes if minutes > 0 else 0.0,
+                "errors": self._errors.most_common(3),
+            }
+
+    def stats_message(self) -> str:
+        stats = self.stats()
+        message = (
+            f"Outbox: {stats['sent']} reports sent ({stats['per_minute']:.1f}/min), {stats['retries']} retries, "
+            f"{stats['failed']} failed, {stats['duplicates']} duplicates dropped; "
+            f"{stats['pending']} pending, {stats['failed_stored']} failed kept in the database."
+        )
+        if stats["errors"]:
+            message += " Top errors: " + "; ".join(f"{reason} ({count})" for reason, count in stats["errors"]) + "."
+        return message
+
+
+    def _enqueue(self, reports: list[tuple[str, PayloadKind, dict]], dedup_key: str | None):
+        now = time.time()
+        # значения полей формы requests всё равно приводит к строкам
+        rows = [
+            (url, kind, json.dumps(payload, ensure_ascii=False, default=str if kind == "form" else None), now, now)
+            for url, kind, payload in reports
+        ]
+        with self._lock:
+            if self._closed:
+                PluginContext.logger.error(f"Outbox is closed, {len(rows)} reports dropped: {reports}")
+                return
+            try:
+                if dedup_key is not None:
+                    rows = self._drop_duplicates(rows, dedup_key, now)
+                    if not rows:
+                        self._db.commit()
+                        return
+                self._db.executemany("INSERT INTO outbox (url, kind, payload, created, next_attempt) VALUES (?,?,?,?,?)", rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                PluginContext.logger.error(f"Couldn't save {len(rows)} reports to the outbox: {reports}", exc_info=e)
+                return
+        self._wakeup.set()
+
+    def _drop_duplicates(self, rows: list[tuple], dedup_key: str, now: float) -> list[tuple]:
+        """
+        Убирает из *rows* отчёты, уже ставившиеся в очередь с тем же *dedup_key* за `DEDUP_WINDOW`,
+        и запоминает хэши остальных.
+        """
+        self._db.execute("DELETE FROM report_hashes WHERE created < ?", (now - self._dedup_window,))
+        unique = []
+        for row in rows:
+            url, payload = row[0], row[2]
+            # порядок ключей не важен: хэшируем нормализованный JSON вместе с ключом
+            normalized = json.dumps([dedup_key, json.loads(payload)], sort_keys=True)
+            digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+            if self._db.execute("INSERT OR IGNORE INTO report_hashes VALUES (?,?,?)", (url, digest, now)).rowcount == 0:
+                PluginContext.logger.debug(f"Outbox: dropped a duplicate report to {url}: {payload}")
+                self._duplicates += 1
+                continue
+            unique.append(row)
+        return unique
+
+    def _claim(self) -> _Item | None:
+        """Следующий отчёт, которому пора отправляться; помечается как отправляемый, чтобы его не взял другой воркер."""
+        with self._lock:
+            if self._closed:
+                return None
+            row = self._db.execute(
+                """
+                SELECT id, url, kind, payload, attempts FROM outbox
+                WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 1
+                """,
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+            self._db.commit()
+        return _Item(*row)
+
+    def _time_to_next(self) -> float:
+        with self._lock:
+            if self._closed:
+                return self.POLL_INTERVAL
+            due = self._db.execute("SELECT min(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        if due is None:
+            return self.POLL_INTERVAL
+        return max(0.0, min(due - time.time(), self.POLL_INTERVAL))
+
+    def _deliver(self, item: _Item):
+        if (delay := rate_limiter.acquire(item.url, self.RATE_LIMIT_WAIT)) > 0:
+            # хост приостановлен - не тратим попытку, а откладываем отчёт
+            self._update("UPDATE outbox SET status = 'pending', next_attempt = ? WHERE id = ?", (time.time() + delay, item.id))
+            return
+        attempt = item.attempts + 1
+        try:
+            if item.kind == "form":
+                resp = requests.post(item.url, data=json.loads(item.payload), timeout=self.REQUEST_TIMEOUT)
+            else:
+                resp = requests.post(
+                    item.url,
+                    data=item.payload.encode("utf-8"),
+                    headers={"content-type": "application/json"},
+                    timeout=self.REQUEST_TIMEOUT
+                )
+        except requests.RequestException as e:
+            rate_limiter.report(item.url, None)
+            self._retry(item, attempt, type(e).__name__, self._backoff(attempt))
+            return
+
+        wait = retry_after(resp)
+        rate_limiter.report(item.url, resp.status_code, wait)
+        if resp.ok:
+            self._done(item, attempt)
+        elif resp.status_code == 429:
+            self._retry(item, attempt, "HTTP 429", self.RATE_LIMIT_DELAY if wait is None else wait)
+        elif resp.status_code == 408 or resp.status_code >= 500:
+            self._retry(item, attempt, f"HTTP {resp.status_code}", max(self._backoff(attempt), wait or 0))
+        else:
+            self._fail(item, attempt, f"HTTP {resp.status_code}")
+
+    def _recover(self, item: _Item, reason: str):
+        """Возвращает в очередь отчёт, доставка которого прервалась неожиданной ошибкой; попытка засчитывается."""
+        attempt = item.attempts + 1
+        try:
+            self._retry(item, attempt, reason, self._backoff(attempt))
+        except Exception as e:
+            # отчёт останется в статусе 'sending' и будет отправлен при следующем запуске
+            PluginContext.logger.error(f"Outbox: couldn't return a report to the queue: {item.payload}", exc_info=e)
+
+    def _backoff(self, attempt: int) -> float:
+        return backoff(attempt, self.RETRY_DELAY, self.MAX_RETRY_DELAY)
+
+    def _done(self, item: _Item, attempt: int):
+        PluginContext.logger.debug(f"Outbox: report sent to {item.url} ({attempt} attempts): {item.payload}")
+        self._update("DELETE FROM outbox WHERE id = ?", (item.id,))
+        with self._lock:
+            self._sent += 1
+
+    def _retry(self, item: _Item, attempt: int, reason: str, delay: float):
+        if attempt >= self.MAX_ATTEMPTS:
+            self._fail(item, attempt, reason)
+            return
+        PluginContext.logger.warning(
+            f"Outbox: couldn't send a report to {item.url} ({reason}, {attempt} attempts), retrying in {delay:.0f} s."
+        )
+        self._update(
+            "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+            (attempt, time.time() + delay, reason, item.id)
+        )
+        with self._lock:
+            self._retries += 1
+            self._errors[reason] += 1
+
+    def _fail(self, item: _Item, attempt: int, reason: str):
+        PluginContext.logger.error(f"Outbox: couldn't send a report to {item.url} ({reason}, {attempt} attempts): {item.payload}")
+        self._update(
+            "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+            (attempt, reason, item.id)
+        )
+        with self._lock:
+            self._failed += 1
+            self._errors[reason] += 1
+
+    def _update(self, query: str, params: tuple):
+        with self._lock:
+            if self._closed:
+                return
+            self._db.execute(query, params)
+            self._db.commit()
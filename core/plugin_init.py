@@ -6,8 +6,13 @@ from config import config as edmc_config  # type: ignore
 
 from core.context import PluginContext
 from core.debug import Debug
+from core.diagnostics import DiagnosticsDumper
+from core.dispatch import dispatch_mode
 from core.journal_processor import JournalProcessor
 from core.notifier import Notifier
+from core.outbox import Outbox
+from core.profiler import hook_profiler
+from core.resolver import Resolver
 from core.sound_player import Player
 from core.systems import SystemsCache
 from lib import thread
@@ -44,6 +49,8 @@ def plugin_app(parent: tk.Misc) -> tk.Frame:
     frame = tk.Frame(parent)
     frame.grid_columnconfigure(0, weight=1)
     PluginContext.notifier = Notifier(frame, 4)    # его надо инициализировать первым, но маппить в самый низ
+    PluginContext.resolver = Resolver()
+    PluginContext.outbox = Outbox()
     PluginContext.systems_cache = SystemsCache(frame, 0)
     PluginContext.exp_visualizer = Visualizer(frame, 1)
     PluginContext.patrol_module = PatrolModule(frame, 2)
@@ -60,6 +67,9 @@ def plugin_app(parent: tk.Misc) -> tk.Frame:
     for mod in PluginContext.active_modules:
         mod.on_start(PluginContext.plugin_dir)
 
+    hook_profiler.setup()
+    DiagnosticsDumper().start()
+
     # в последнюю очередь запускаем обработчик событий
     PluginContext.journal_processor = JournalProcessor()
     PluginContext.journal_processor.start()
@@ -84,6 +94,9 @@ def plugin_prefs(parent: tk.Misc, cmdr: str | None, is_beta: bool) -> tk.Frame:
     frame.grid_columnconfigure(0, weight=1)
     Debug.plugin_prefs(frame)
     ttk.Separator(frame, orient="horizontal").grid(row=next(rg), column=0, pady=5, sticky="EW")
+    hook_profiler.plugin_prefs(frame, next(rg))
+    dispatch_mode.plugin_prefs(frame, next(rg))
+    ttk.Separator(frame, orient="horizontal").grid(row=next(rg), column=0, pady=5, sticky="EW")
 
     for mod in PluginContext.active_modules:
         # некоторые модули не имеют настроек, а лишние линии нам не нужны
@@ -102,6 +115,8 @@ def prefs_changed(cmdr: str | None, is_beta: bool):
     EDMC вызывает эту функцию при сохранении настроек пользователем.
     """
     Debug.prefs_changed()
+    hook_profiler.prefs_changed()
+    dispatch_mode.prefs_changed()
     for mod in PluginContext.active_modules:
         mod.on_settings_changed(cmdr, is_beta)
 
@@ -115,6 +130,10 @@ def plugin_stop():
     PluginContext.journal_processor.join()
     for mod in PluginContext.active_modules:
         mod.on_close()
+    PluginContext.resolver.drain()
     PluginContext.logger.debug("Joining threads...")
     thread.BasicThread.join_all()
+    PluginContext.systems_cache.on_close()
+    PluginContext.outbox.close()
+    PluginContext.logger.debug(PluginContext.resolver.stats_message())
     PluginContext.logger.debug("Done, exiting.")
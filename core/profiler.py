@@ -0,0 +1,191 @@
+import tkinter as tk
+from bisect import bisect_left
+from contextlib import nullcontext
+from threading import Lock
+from time import perf_counter
+
+import myNotebook as nb  # type: ignore
+
+from core.context import PluginContext
+from core.plugin_config import plugin_config
+from lib.thread import Thread
+
+
+# isort: off
+import functools
+_translate = functools.partial(PluginContext._tr_template, filepath=__file__)
+# isort: on
+
+
+# верхние границы корзин гистограммы, в секундах: 1 мкс, 2 мкс, 4 мкс ... ~4.2 с
+_BUCKET_BOUNDS = tuple(2 ** i / 1_000_000 for i in range(23))
+
+
+class _HookStats:
+    """Счётчик вызовов и гистограмма задержек одного хука."""
+    __slots__ = ("calls", "total", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(_BUCKET_BOUNDS) + 1)     # последняя - всё, что дольше 4 секунд
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[bisect_left(_BUCKET_BOUNDS, elapsed)] += 1
+
+    def merge(self, other: '_HookStats'):
+        self.calls += other.calls
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+
+    def percentile(self, q: float) -> float:
+        """Оценка сверху: граница корзины, в которую попадает q-й перцентиль."""
+        threshold = q * self.calls
+        cumulative = 0
+        for i, count in enumerate(self.buckets):
+            cumulative += count
+            if cumulative >= threshold:
+                return min(_BUCKET_BOUNDS[i], self.max) if i < len(_BUCKET_BOUNDS) else self.max
+        return self.max
+
+
+class _Measurement:
+    __slots__ = ("_profiler", "_key", "_start")
+
+    def __init__(self, profiler: 'HookProfiler', key: tuple[str, str, str]):
+        self._profiler = profiler
+        self._key = key
+
+    def __enter__(self):
+        self._start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._profiler._record(self._key, perf_counter() - self._start)
+
+
+class _SummaryDumper(Thread):
+    DUMP_INTERVAL = 5 * 60  # s
+
+    def __init__(self, profiler: 'HookProfiler'):
+        super().__init__(name="Triumvirate hook profiler summary dumper")
+        self._profiler = profiler
+
+    def do_run(self):
+        while True:
+            self.sleep(self.DUMP_INTERVAL)
+            if self._profiler.enabled and self._profiler.has_data():
+                PluginContext.logger.debug("Module hooks latency summary:\n" + self._profiler.summary())
+
+
+class HookProfiler:
+    """
+    Опциональный замер времени выполнения хуков модулей и субмодулей БГС.
+
+    Использование:
+    ```
+    with hook_profiler.measure(module, "on_journal_entry", event):
+        module.on_journal_entry(entry)
+    ```
+    Пока профилировщик выключен, `measure` возвращает пустой контекстный менеджер.
+    """
+    config_key = "EnableHookProfiler"
+    SUMMARY_ROWS = 15
+    _NULL_CONTEXT = nullcontext()
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = Lock()
+        self._stats: dict[tuple[str, str, str], _HookStats] = dict()    # {(модуль, хук, ивент): статистика}
+        self._dumper: _SummaryDumper | None = None
+        self._var: tk.BooleanVar | None = None
+        self._text: tk.Text | None = None
+
+    def setup(self):
+        self.enabled = bool(plugin_config.get_bool(self.config_key))
+        self._dumper = _SummaryDumper(self)
+        self._dumper.start()
+        PluginContext.logger.debug(f"Hook profiler is {'enabled' if self.enabled else 'disabled'}.")
+
+    def measure(self, owner: object, hook: str, event: str):
+        if not self.enabled:
+            return self._NULL_CONTEXT
+        return _Measurement(self, (type(owner).__qualname__, hook, event))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def has_data(self) -> bool:
+        return bool(self._stats)
+
+    def summary(self) -> str:
+        """Таблица самых затратных хуков модулей и самых затратных пар "модуль - ивент"."""
+        by_hook: dict[str, _HookStats] = dict()
+        by_event: dict[str, _HookStats] = dict()
+        with self._lock:
+            for (owner, hook, event), stats in self._stats.items():
+                by_hook.setdefault(f"{owner}.{hook}", _HookStats()).merge(stats)
+                by_event.setdefault(f"{owner} / {event}", _HookStats()).merge(stats)
+
+        def table(title: str, rows: dict[str, _HookStats]) -> list[str]:
+            lines = [f"{title:<48}{'calls':>9}{'p50, ms':>10}{'p95, ms':>10}{'max, ms':>10}{'total, s':>10}"]
+            for name, stats in sorted(rows.items(), key=lambda kv: -kv[1].total)[:self.SUMMARY_ROWS]:
+                lines.append(
+                    f"{name[:47]:<48}{stats.calls:>9}{stats.percentile(0.5) * 1000:>10.2f}"
+                    f"{stats.percentile(0.95) * 1000:>10.2f}{stats.max * 1000:>10.2f}{stats.total:>10.2f}"
+                )
+            return lines
+
+        return "\n".join(table("Module hook", by_hook) + [""] + table("Module / event", by_event))
+
+    def _record(self, key: tuple[str, str, str], elapsed: float):
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _HookStats()
+            stats.add(elapsed)
+
+    def plugin_prefs(self, parent: tk.Misc, row: int):
+        frame = nb.Frame(parent)
+        frame.columnconfigure(0, weight=1)
+        frame.grid(row=row, column=0, sticky="NSEW")
+        self._var = tk.BooleanVar(value=self.enabled)
+        nb.Checkbutton(frame, text=_translate("Measure modules' event processing time"), variable=self._var).grid(
+            row=0, column=0, sticky="NW"
+        )
+        nb.Button(frame, text=_translate("Reset"), command=self.__on_reset).grid(row=0, column=1, sticky="NE")
+        self._text = tk.Text(frame, height=self.SUMMARY_ROWS + 2, wrap="none", font="TkFixedFont")
+        self._text.grid(row=1, column=0, columnspan=2, sticky="NSEW")
+        self.__update_text()
+        return frame
+
+    def prefs_changed(self):
+        if self._var is None:
+            return
+        self.enabled = self._var.get()
+        plugin_config.set(self.config_key, self.enabled)
+        PluginContext.logger.debug(f"Hook profiler is {'enabled' if self.enabled else 'disabled'}.")
+        self._var, self._text = None, None
+
+    def __on_reset(self):
+        self.reset()
+        self.__update_text()
+
+    def __update_text(self):
+        if self._text is None:
+            return
+        text = self.summary() if self.has_data() else _translate("<HOOK_PROFILER_NO_DATA>")
+        self._text.configure(state="normal")
+        self._text.delete("1.0", "end")
+        self._text.insert("1.0", text)
+        self._text.configure(state="disabled")
+
+
+hook_profiler = HookProfiler()
@@ -0,0 +1,196 @@
+"""
+Общее для всего плагина ограничение запросов к внешним сервисам, по хостам.
+
+- token bucket: не больше `rate` запросов в секунду с запасом в `burst` запросов (см. `LIMITS`);
+- `Retry-After` из ответа 429/503 приостанавливает все запросы к хосту до указанного времени;
+- circuit breaker: после `FAILURE_THRESHOLD` ошибок подряд хост считается недоступным, и запросы к нему
+  не отправляются в течение паузы, растущей экспоненциально (со случайным разбросом) с каждым новым отключением.
+  После паузы пропускается один пробный запрос: если он успешен, хост снова доступен, иначе пауза удваивается.
+
+Использование:
+```
+resp = limited_get(url, params=params)  # как requests.get, но через `rate_limiter`; пока хост на паузе - `RateLimited`
+```
+или вручную, если запрос нужно отложить, а не ждать (см. `core.outbox`):
+```
+delay = rate_limiter.reserve(url)   # 0 - можно отправлять, иначе - через сколько секунд попробовать снова
+...
+rate_limiter.report(url, resp.status_code, retry_after(resp))   # или report(url, None) при сетевой ошибке
+```
+"""
+import random
+import requests
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from core.context import PluginContext
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка перед попыткой *attempt* + 1 со случайным разбросом в пределах второй половины."""
+    delay = min(base * 2 ** (attempt - 1), cap)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after(resp: requests.Response) -> float | None:
+    """Значение заголовка `Retry-After` в секундах: он бывает и числом, и HTTP-датой."""
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_failure(status: int | None) -> bool:
+    """Ответ, говорящий о проблемах на стороне хоста (None - сетевая ошибка)."""
+    return status is None or status in (408, 429) or status >= 500
+
+
+class _Host:
+    __slots__ = ("rate", "burst", "tokens", "updated", "paused_until", "failures", "opened", "probing", "requests", "rejected")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0     # Retry-After или отключение circuit breaker'ом
+        self.failures = 0           # подряд
+        self.opened = 0             # отключений подряд, для роста паузы
+        self.probing = 0.0          # время отправки пробного запроса, 0 - не отправлялся
+        self.requests = 0
+        self.rejected = 0
+
+
+class RateLimiter:
+    DEFAULT_LIMIT = (2.0, 5)    # запросов в секунду, запас
+    LIMITS = {
+        "docs.google.com": (1.0, 5),
+        "us-central1-canonn-api-236217.cloudfunctions.net": (2.0, 10),
+        "europe-west1-canonn-api-236217.cloudfunctions.net": (2.0, 10),
+        "spansh.co.uk": (2.0, 4),
+        "www.edsm.net": (1.0, 3),
+    }
+    FAILURE_THRESHOLD = 5
+    OPEN_DELAY = 30             # s, первая пауза после отключения хоста
+    MAX_OPEN_DELAY = 10 * 60    # s
+    PROBE_TIMEOUT = 60          # s, после этого пробный запрос без ответа считается потерянным
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _Host] = dict()
+
+    def reserve(self, url: str) -> float:
+        """Берёт разрешение на запрос к хосту *url*. 0 - можно отправлять, иначе - через сколько секунд попробовать снова."""
+        now = time.monotonic()
+        with self._lock:
+            host = self._host(url)
+            if host.paused_until > now:
+                host.rejected += 1
+                return host.paused_until - now
+            # после паузы пропускаем один пробный запрос, остальные ждут его результата
+            if host.opened and host.probing and now - host.probing < self.PROBE_TIMEOUT:
+                host.rejected += 1
+                return 1.0
+            host.tokens = min(host.burst, host.tokens + (now - host.updated) * host.rate)
+            host.updated = now
+            if host.tokens < 1:
+                host.rejected += 1
+                return (1 - host.tokens) / host.rate
+            host.tokens -= 1
+            host.requests += 1
+            if host.opened:
+                host.probing = now
+            return 0.0
+
+    def acquire(self, url: str, max_wait: float) -> float:
+        """
+        Как `reserve`, но дожидается разрешения, если его можно получить не позже чем через *max_wait* секунд.
+        Иначе сразу возвращает, через сколько секунд попробовать снова.
+        """
+        deadline = time.monotonic() + max_wait
+        while (delay := self.reserve(url)) > 0:
+            if time.monotonic() + delay > deadline:
+                return delay
+            time.sleep(delay)
+        return 0.0
+
+    def report(self, url: str, status: int | None, retry_after: float | None = None):
+        """Результат запроса: HTTP-код ответа или None при сетевой ошибке; *retry_after* - из заголовка ответа."""
+        now = time.monotonic()
+        name = urlsplit(url).hostname or url
+        with self._lock:
+            host = self._host(url)
+            if retry_after is not None and status in (429, 503):
+                host.paused_until = max(host.paused_until, now + retry_after)
+            if not is_failure(status):
+                if host.opened:
+                    PluginContext.logger.info(f"Rate limiter: {name} is available again.")
+                host.failures = host.opened = 0
+                host.probing = 0.0
+                return
+            host.failures += 1
+            if host.opened or host.failures >= self.FAILURE_THRESHOLD:
+                host.opened += 1
+                host.failures = 0
+                host.probing = 0.0
+                delay = backoff(host.opened, self.OPEN_DELAY, self.MAX_OPEN_DELAY)
+                host.paused_until = max(host.paused_until, now + delay)
+                PluginContext.logger.warning(f"Rate limiter: {name} keeps failing, pausing requests to it for {delay:.0f} s.")
+
+    def stats_message(self) -> str:
+        now = time.monotonic()
+        parts = []
+        with self._lock:
+            for name, host in sorted(self._hosts.items()):
+                state = f", paused for {host.paused_until - now:.0f} s" if host.paused_until > now else ""
+                parts.append(f"{name} {host.requests} requests, {host.rejected} delayed{state}")
+        return "Rate limiter: " + ("; ".join(parts) if parts else "no requests") + "."
+
+    def _host(self, url: str) -> _Host:
+        name = urlsplit(url).hostname or url
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(*self.LIMITS.get(name, self.DEFAULT_LIMIT))
+        return host
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimited(requests.RequestException):
+    """Запрос не отправлен: хост приостановлен `rate_limiter`-ом."""
+
+
+LIMITED_WAIT = 5        # s, по умолчанию дольше `limited_request` не ждёт разрешения
+LIMITED_TIMEOUT = 10    # s, таймаут запроса, если он не указан
+
+
+def limited_request(method: str, url: str, max_wait: float = LIMITED_WAIT, **kwargs) -> requests.Response:
+    """
+    `requests.request` через `rate_limiter`: ждёт разрешения не дольше *max_wait* секунд (иначе бросает `RateLimited`)
+    и сообщает ему результат запроса. Ошибки те же, что у `requests`, поэтому `except requests.RequestException`
+    вызывающего кода ловит и отказ ограничителя.
+    """
+    if (delay := rate_limiter.acquire(url, max_wait)) > 0:
+        raise RateLimited(f"requests to {urlsplit(url).hostname} are paused for {delay:.0f} s")
+    kwargs.setdefault("timeout", LIMITED_TIMEOUT)
+    try:
+        resp = requests.request(method, url, **kwargs)
+    except requests.RequestException:
+        rate_limiter.report(url, None)
+        raise
+    rate_limiter.report(url, resp.status_code, retry_after(resp))
+    return resp
+
+
+def limited_get(url: str, max_wait: float = LIMITED_WAIT, **kwargs) -> requests.Response:
+    return limited_request("GET", url, max_wait, **kwargs)
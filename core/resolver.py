@@ -0,0 +1,137 @@
+import time
+from collections.abc import Callable
+from queue import Empty, Queue
+from threading import Lock
+from typing import Any
+
+from core.context import PluginContext
+from core.dispatch import _Lane, current_lane
+from lib.thread import Thread, ThreadExit
+
+
+class _Task:
+    __slots__ = ("func", "args", "kwargs", "callback", "lane", "submitted")
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, callback: Callable[[Any], Any] | None, lane: _Lane | None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.lane = lane
+        self.submitted = time.monotonic()
+
+
+class _Worker(Thread):
+    def __init__(self, resolver: 'Resolver', num: int):
+        super().__init__(name=f"Triumvirate resolver worker {num}")
+        self._resolver = resolver
+
+    def do_run(self):
+        tasks = self._resolver._tasks
+        while True:
+            try:
+                task = tasks.get(timeout=self.SLEEP_DURATION)
+            except Empty:
+                if self.STOP:
+                    raise ThreadExit()
+                continue
+            if self.STOP:
+                tasks.put(task)     # отдадим обратно, пусть остальные воркеры тоже увидят STOP
+                tasks.task_done()
+                raise ThreadExit()
+            try:
+                self._resolver._run(task)
+            finally:
+                tasks.task_done()
+
+
+class Resolver:
+    """
+    Общий ограниченный пул для фоновых сетевых запросов - и тех, что раньше делались прямо в потоке
+    обработчика журнала, и разовых (fire-and-forget), для которых раньше запускался отдельный поток.
+
+    Задача выполняется в одном из `WORKERS` воркеров, а её результат передаётся в *callback*, который вызывается
+    в том потоке, откуда задача была поставлена: в потоке обработчика журнала (см. `JournalProcessor.call_soon`)
+    или, при параллельной передаче ивентов, в потоке модуля (см. `core.dispatch.ModuleLanes`). Так callback
+    не выполняется одновременно с хуками своего модуля, а обработка ивентов не ждёт ответа от сервера.
+
+    Учтите, что к моменту вызова *callback* игра могла уйти вперёд: проверяйте, актуален ли ещё результат.
+    """
+    WORKERS = 4
+    DRAIN_TIMEOUT = 5   # s, сколько `plugin_stop` ждёт выполнения оставшихся задач
+
+    def __init__(self):
+        self._tasks: Queue[_Task] = Queue()
+        self._stats_lock = Lock()
+        self._high_water_mark = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_wait = 0.0
+        self._workers = [_Worker(self, i) for i in range(self.WORKERS)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, func: Callable, *args, callback: Callable[[Any], Any] | None = None, **kwargs):
+        """
+        Ставит вызов `func(*args, **kwargs)` в очередь на фоновое выполнение.
+        Если *func* бросит исключение, *callback* вызван не будет.
+        """
+        self._tasks.put(_Task(func, args, kwargs, callback, current_lane()))
+        depth = self._tasks.qsize()
+        with self._stats_lock:
+            if depth > self._high_water_mark:
+                self._high_water_mark = depth
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт, пока воркеры выполнят уже поставленные задачи, но не дольше *timeout* (по умолчанию `DRAIN_TIMEOUT`).
+        Вызывается при закрытии до остановки потоков. Возвращает False, если задачи остались.
+        """
+        deadline = time.monotonic() + (self.DRAIN_TIMEOUT if timeout is None else timeout)
+        with self._tasks.all_tasks_done:
+            while self._tasks.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    PluginContext.logger.warning(
+                        f"Resolver: {self._tasks.unfinished_tasks} background tasks left unfinished on shutdown."
+                    )
+                    return False
+                self._tasks.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "depth": self._tasks.qsize(),
+                "high_water_mark": self._high_water_mark,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_wait": self._max_wait,
+            }
+
+    def stats_message(self) -> str:
+        stats = self.stats()
+        return (
+            f"Resolver: queue depth {stats['depth']}, high-water mark {stats['high_water_mark']}, "
+            f"{stats['completed']} tasks completed, {stats['failed']} failed, max wait {stats['max_wait'] * 1000:.1f} ms."
+        )
+
+    def _run(self, task: _Task):
+        wait = time.monotonic() - task.submitted
+        with self._stats_lock:
+            self._max_wait = max(self._max_wait, wait)
+        try:
+            result = task.func(*task.args, **task.kwargs)
+        except Exception as e:
+            PluginContext.logger.error(f"Exception in background task {task.func.__qualname__}.", exc_info=e)
+            with self._stats_lock:
+                self._failed += 1
+            return
+        with self._stats_lock:
+            self._completed += 1
+        if task.callback is None:
+            return
+        if task.lane is not None:
+            task.lane.call_soon(task.callback, result)
+        else:
+            PluginContext.journal_processor.call_soon(task.callback, result)
@@ -0,0 +1,287 @@
+"""
+Внешние источники данных о системах для `core.systems.SystemsCache`: Spansh и EDSM.
+
+`ProviderChain` выбирает самый быстрый из исправных источников по скользящему среднему (EWMA) времени ответа.
+Если ответ задерживается дольше порога, параллельно отправляется запрос к следующему источнику,
+и используется первый полученный ответ. Источник, не ответивший несколько раз подряд, на время выключается.
+"""
+import requests
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any
+
+from core.context import PluginContext
+from core.rate_limit import limited_get
+from core.settings import edsm_url
+from lib.journal import Coords
+
+
+# (sid, имя, координаты)
+type SystemRecord = tuple[int, str, Coords]
+# ответ на поиск по имени: одна система, несколько систем с таким именем или ничего
+type NameResult = SystemRecord | list[SystemRecord] | None
+
+
+class ProviderError(Exception):
+    """Источник не смог ответить (сеть, таймаут, неожиданный ответ). В отличие от None - "система не найдена"."""
+
+
+class SystemProvider:
+    name: str
+    timeout: float = 8          # s
+    rate_limit_wait: float = 2  # s, дольше разрешения `rate_limiter` не ждём и считаем источник недоступным
+    supports_ids: bool = True
+
+    def system_by_id(self, sid: int) -> SystemRecord | None:
+        raise NotImplementedError
+
+    def system_by_name(self, name: str) -> NameResult:
+        raise NotImplementedError
+
+    def _get(self, url: str, params: dict | None = None):
+        """JSON ответа; None, если источнику такой объект неизвестен (404)."""
+        try:
+            resp = limited_get(url, self.rate_limit_wait, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ProviderError(f"{self.name}: {e}") from e
+        if resp.status_code == 404:
+            return None
+        try:
+            resp.raise_for_status()
+            return resp.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ProviderError(f"{self.name}: {e}") from e
+
+
+class SpanshProvider(SystemProvider):
+    name = "Spansh"
+
+    def system_by_id(self, sid: int) -> SystemRecord | None:
+        resp = self._get(f"https://spansh.co.uk/api/system/{sid}")
+        if resp is None:
+            return None
+        data: dict | None = resp.get("record")
+        if data is None:
+            PluginContext.logger.warning(f"Spansh data for sid {sid} doesn't contain the `record` field.")
+            return None
+
+        name = data.get("name")
+        x, y, z = data.get("x"), data.get("y"), data.get("z")
+        if None in (name, x, y, z):
+            PluginContext.logger.warning(
+                f"Spansh data for sid {sid} is inconsistent. "
+                f"Reported name: {name}, reported coords: [{x}, {y}, {z}]."
+            )
+            return None
+        return sid, name, Coords(x, y, z)  # pyright: ignore[reportReturnType, reportArgumentType]
+
+    def system_by_name(self, name: str) -> NameResult:
+        results: list[dict] = (self._get("https://spansh.co.uk/api/search", {"q": name}) or {}).get("results", [])
+        systems = []
+        for result in results:
+            record: dict | None = result.get("record")
+            if record is None:
+                continue
+            found_name: str = record.get("name", "")
+            if result.get("type") == "system" and found_name.lower() == name.lower():
+                sid = record.get("id64")
+                x, y, z = record.get("x"), record.get("y"), record.get("z")
+                if None in (sid, x, y, z):
+                    PluginContext.logger.warning(
+                        f"Spansh data for system {name} is inconsistent. "
+                        f"Reported sid: {sid}, reported coords: [{x}, {y}, {z}]."
+                    )
+                    continue
+                systems.append((sid, found_name, Coords(x, y, z)))
+        return _name_result(self.name, name, systems)
+
+
+class EDSMProvider(SystemProvider):
+    """EDSM ищет только по имени: id64 в его API поиска систем не поддерживается."""
+    name = "EDSM"
+    supports_ids = False
+
+    def system_by_name(self, name: str) -> NameResult:
+        data = self._get(f"{edsm_url}/api-v1/system", {"systemName": name, "showId": 1, "showCoords": 1})
+        # ненайденную систему EDSM возвращает пустым списком
+        if not isinstance(data, dict):
+            return _name_result(self.name, name, [])
+        sid, coords = data.get("id64"), data.get("coords") or {}
+        x, y, z = coords.get("x"), coords.get("y"), coords.get("z")
+        if None in (sid, x, y, z):
+            PluginContext.logger.warning(
+                f"EDSM data for system {name} is inconsistent. Reported sid: {sid}, reported coords: [{x}, {y}, {z}]."
+            )
+            return None
+        return _name_result(self.name, name, [(sid, data.get("name", name), Coords(x, y, z))])
+
+
+def _name_result(provider: str, name: str, systems: list[SystemRecord]) -> NameResult:
+    match len(systems):
+        case 0:
+            PluginContext.logger.debug(f"No results found for system name {name} on {provider}.")
+            return None
+        case 1:
+            return systems[0]
+        case _:
+            PluginContext.logger.debug(f"Multiple results ({len(systems)}) found for system name {name} on {provider}.")
+            return systems
+
+
+class _Health:
+    __slots__ = ("latency", "failures", "down_until", "requests", "errors")
+
+    def __init__(self):
+        self.latency: float | None = None   # EWMA, s
+        self.failures = 0                   # подряд
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+
+class ProviderChain:
+    """
+    Запросы к нескольким источникам с учётом их скорости и исправности.
+
+    - источники упорядочиваются по EWMA времени ответа; ещё не опрошенные считаются такими же быстрыми, как самый
+      медленный из известных, а при равенстве сохраняется порядок из конструктора;
+    - если первый источник не ответил за `HEDGE_FACTOR` его обычных времён ответа (но не меньше `HEDGE_MIN_DELAY`),
+      запрос дублируется следующему, и побеждает первый ответ;
+    - при ошибке источника или если он не знает объект, запрос сразу передаётся следующему;
+    - если не ответил ни один источник, бросается `ProviderError`, а не возвращается None ("не найдено");
+    - после `MAX_FAILURES` ошибок подряд источник выключается на `COOLDOWN` секунд.
+      Если выключены все, опрашиваются все - лучше попытаться, чем сразу сдаться.
+    """
+    EWMA_ALPHA = 0.3
+    HEDGE_MIN_DELAY = 1.5   # s
+    HEDGE_FACTOR = 3        # порог дублирования - во столько раз дольше обычного ответа источника
+    MAX_FAILURES = 3
+    COOLDOWN = 120          # s
+
+    def __init__(self, providers: list[SystemProvider], workers: int = 4):
+        self.providers = providers
+        self._health = {provider: _Health() for provider in providers}
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Triumvirate systems provider")
+
+    def system_by_id(self, sid: int) -> SystemRecord | None:
+        providers = [provider for provider in self.providers if provider.supports_ids]
+        return self._call(providers, "system_by_id", sid, f"sid {sid}")
+
+    def system_by_name(self, name: str) -> NameResult:
+        return self._call(self.providers, "system_by_name", name, name)
+
+    def submit(self, func: Callable[..., Any], *args) -> Future:
+        """
+        Выполняет *func* в пуле цепочки - для параллельных запросов к ней (см. `SystemsCache._fetch_many`).
+        *func* может сама обращаться к цепочке, но таких задач одновременно должно быть меньше `workers`,
+        иначе самим запросам не хватит потоков.
+        """
+        return self._executor.submit(func, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats_message(self) -> str:
+        parts = []
+        now = time.monotonic()
+        with self._lock:
+            for provider, health in self._health.items():
+                latency = f"{health.latency * 1000:.0f} ms" if health.latency is not None else "n/a"
+                state = ", down" if health.down_until > now else ""
+                parts.append(f"{provider.name} {latency} ({health.requests} requests, {health.errors} errors{state})")
+        return "System providers: " + "; ".join(parts) + "."
+
+
+    def _ordered(self, providers: list[SystemProvider]) -> list[SystemProvider]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [p for p in providers if self._health[p].down_until <= now] or list(providers)
+            known = [self._health[p].latency for p in healthy if self._health[p].latency is not None]
+            default = max(known, default=0.0)
+            return sorted(healthy, key=lambda p: lat if (lat := self._health[p].latency) is not None else default)
+
+    def _hedge_delay(self, provider: SystemProvider) -> float:
+        latency = self._health[provider].latency
+        delay = self.HEDGE_MIN_DELAY if latency is None else max(self.HEDGE_MIN_DELAY, latency * self.HEDGE_FACTOR)
+        return min(delay, provider.timeout)
+
+    def _call(self, providers: list[SystemProvider], method: str, key, description: str):
+        """
+        Результат первого источника, который нашёл объект; None, если все ответившие его не нашли.
+        Если не ответил ни один источник, бросает `ProviderError`: "не найдено" и "не удалось узнать" - разные вещи.
+        """
+        queue = self._ordered(providers)
+        running: dict[Future, SystemProvider] = dict()
+        answered = False
+        while queue or running:
+            if not running:
+                provider = queue.pop(0)
+                running[self._executor.submit(self._timed, provider, method, key)] = provider
+            # ждём ответа не дольше порога дублирования самого "молодого" запроса
+            delay = self._hedge_delay(list(running.values())[-1]) if queue else None
+            done, _ = wait(running, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                provider = queue.pop(0)
+                PluginContext.logger.debug(f"No answer for {description} yet, hedging the request to {provider.name}.")
+                running[self._executor.submit(self._timed, provider, method, key)] = provider
+                continue
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    result = future.result()
+                except ProviderError as e:
+                    PluginContext.logger.warning(f"Couldn't fetch system data for {description} from {provider.name}: {e}")
+                    continue
+                answered = True
+                if result is None:
+                    continue    # этот источник не знает объект, но следующий может знать
+                # уже отправленные запросы дорабатывают, их время ответа запишет `_timed`, но сам ответ не нужен
+                for other in running:
+                    other.cancel()
+                return result
+        if answered:
+            return None
+        PluginContext.logger.error(f"Couldn't fetch system data for {description}: no provider answered.")
+        raise ProviderError(f"no provider answered for {description}")
+
+    def _timed(self, provider: SystemProvider, method: str, key):
+        start = time.monotonic()
+        try:
+            result = getattr(provider, method)(key)
+        except ProviderError:
+            self._record(provider, None)
+            raise
+        except Exception as e:
+            self._record(provider, None)
+            raise ProviderError(f"unexpected error: {e!r}") from e
+        self._record(provider, time.monotonic() - start)
+        return result
+
+    def _record(self, provider: SystemProvider, elapsed: float | None):
+        with self._lock:
+            health = self._health[provider]
+            health.requests += 1
+            if elapsed is None:
+                health.errors += 1
+                health.failures += 1
+                if health.failures >= self.MAX_FAILURES:
+                    health.down_until = time.monotonic() + self.COOLDOWN
+                    health.failures = 0
+                    PluginContext.logger.warning(
+                        f"System provider {provider.name} disabled for {self.COOLDOWN} s after repeated errors."
+                    )
+                return
+            health.failures = 0
+            health.down_until = 0.0
+        self._update_latency(provider, elapsed)
+
+    def _update_latency(self, provider: SystemProvider, elapsed: float):
+        with self._lock:
+            health = self._health[provider]
+            if health.latency is None:
+                health.latency = elapsed
+            else:
+                health.latency += self.EWMA_ALPHA * (elapsed - health.latency)
@@ -1,10 +1,20 @@
-import requests
 import sqlite3
+import time
 import tkinter as tk
+from collections import OrderedDict
+from collections.abc import Callable, Collection, Hashable, Iterable
+from concurrent.futures import Future
 from dataclasses import dataclass
+from pathlib import Path
+from threading import BoundedSemaphore, Event, Lock
+from typing import Any
 
 from core.context import PluginContext
+from core.system_providers import EDSMProvider, ProviderChain, ProviderError, SpanshProvider
+from lib import systems_db
 from lib.journal import Coords
+from lib.migrations import Migrations
+from lib.thread import Thread, ThreadExit
 
 
 # функция перевода
@@ -15,33 +25,253 @@ _translate = functools.partial(PluginContext._tr_template, filepath=__file__)
 
 
 @dataclass
-class _SystemData:
+class SystemData:
     sid: int
     name: str
     coords: Coords
 
 
+class _MemoryTier:
+    """
+    LRU-кэш в памяти перед cache.db для самых востребованных систем (текущая, маршрут, системы БГС),
+    а также негативный кэш: ключи, по которым Spansh ничего не нашёл, не запрашиваются повторно до истечения TTL.
+    Ключи - sid (int) или имя системы (str). Потокобезопасен: используется и обработчиком журнала, и воркерами.
+    """
+    def __init__(self, capacity: int, negative_ttl: float):
+        self.capacity = capacity
+        self.negative_ttl = negative_ttl
+        self._lock = Lock()
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._negative: dict[Hashable, float] = dict()      # {ключ: время истечения}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._negative.pop(key, None)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Проверка без учёта в статистике и без обновления порядка LRU."""
+        with self._lock:
+            return key in self._entries
+
+    def invalidate(self, key: Hashable):
+        """Забывает и сохранённое значение, и отметку о том, что по ключу ничего не нашлось."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._negative.pop(key, None)
+
+    def is_negative(self, key: Hashable) -> bool:
+        """True, если по ключу недавно ничего не нашлось, и запрашивать его снова пока не стоит."""
+        with self._lock:
+            expires = self._negative.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._negative[key]
+                return False
+            self.negative_hits += 1
+            return True
+
+    def put_negative(self, key: Hashable):
+        with self._lock:
+            self._negative[key] = time.monotonic() + self.negative_ttl
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "negative_size": len(self._negative),
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+            }
+
+
+class _SingleFlight:
+    """
+    Объединение одновременных запросов: пока по ключу выполняется загрузка, остальные желающие
+    не запускают свою, а ждут её и получают тот же результат.
+    """
+    class _Call:
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = Event()
+            self.result: Any = None
+            self.error: BaseException | None = None
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[Hashable, _SingleFlight._Call] = dict()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args) -> Any:
+        """
+        Вызывает `func(*args)`, если по *key* сейчас ничего не загружается, иначе дожидается идущего вызова.
+        Если *func* бросит исключение, его получат и вызвавший её, и ожидавшие.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _MigrationThread(Thread):
+    """
+    Фоновая миграция БД *path* (см. `lib.migrations`) через отдельное соединение. Останавливается вместе
+    с остальными потоками плагина; недоделанное продолжится при следующем запуске.
+    По окончании вызывает *on_done* с тем же соединением (в потоке миграции).
+    """
+    PAUSE = 0.05    # s между порциями, чтобы не задерживать запись в БД из основного соединения
+
+    def __init__(self, path: Path, migrations: Migrations, on_done: Callable[[sqlite3.Connection], Any] | None = None):
+        super().__init__(name=f"Triumvirate migration: {path.name}")
+        self.path = path
+        self.migrations = migrations
+        self.on_done = on_done
+
+    def do_run(self):
+        db = sqlite3.connect(self.path)
+        start = time.perf_counter()
+        name = self.migrations.name
+        PluginContext.logger.info(
+            f"{name}: migrating from schema version {self.migrations.version(db)} to {self.migrations.latest} in the background."
+        )
+        try:
+            while not self.migrations.step(db):
+                if self.STOP:
+                    PluginContext.logger.info(f"{name}: migration interrupted, will continue on the next launch.")
+                    raise ThreadExit()
+                time.sleep(self.PAUSE)
+            PluginContext.logger.info(f"{name}: migration done in {time.perf_counter() - start:.1f} s.")
+            if self.on_done is not None:
+                self.on_done(db)
+        except sqlite3.Error as e:
+            PluginContext.logger.error(f"{name}: migration failed, will retry on the next launch.", exc_info=e)
+        finally:
+            db.close()
+
+
 class SystemsCache(tk.Frame):
+    MEMORY_CAPACITY = 2048  # систем в LRU
+    NEGATIVE_TTL = 30 * 60  # s
+    FETCH_CONCURRENCY = 2   # одновременных запросов к источникам; меньше потоков `ProviderChain`
+    SELECT_CHUNK = 500      # ключей в одном `IN (...)`
+    HARVEST_BATCH = 100     # систем, собранных `harvest`, на одну запись в БД
+    HARVEST_MAX_DELAY = 10  # s, дольше собранное не копится
+    NEAREST_START_RADIUS = 20       # ly, начальный радиус поиска в `nearest`
+    NEAREST_MAX_RADIUS = 70_000     # ly, больше галактики
+
     def __init__(self, master: tk.Misc, row: int):
         super().__init__(master)
         self._row = row
         self._mapped = False    # вместо winfo_mapped, чтобы без задержек между потоками
         self._message = tk.Label(self, text=_translate("<SYSTEMS_MODULE_NO_COORDS_WARNING>"))
         self._message.pack(side="left")
-        self._cache = sqlite3.connect(PluginContext.plugin_dir / "userdata" / "cache.db", check_same_thread=False)
-        self._cache.execute("CREATE TABLE IF NOT EXISTS systems (id INTEGER PRIMARY KEY, name TEXT, x REAL, y REAL, z REAL)")
-        self._cache.execute("CREATE INDEX IF NOT EXISTS idx_systems_name ON systems(name)")
-        self._cache.commit()
+        db_path = PluginContext.plugin_dir / "userdata" / "cache.db"
+        self._cache = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_lock = Lock()
+        # новая БД создаётся сразу в последней версии, а старую не мигрируем здесь, чтобы не задерживать запуск
+        systems_db.create_schema(self._cache)
+        self._spatial_index = False
+        self._names_ready = False   # таблица `system_names`, см. `lib.systems_db`
+        if systems_db.MIGRATIONS.pending(self._cache):
+            # до конца миграции кэш работает со старой схемой, а пространственные запросы - перебором
+            _MigrationThread(db_path, systems_db.MIGRATIONS, self._on_migrated).start()
+        else:
+            self._on_migrated(self._cache)
+        self._aliases = systems_db.load_aliases(self._cache)
+        self._memory = _MemoryTier(self.MEMORY_CAPACITY, self.NEGATIVE_TTL)
+        self._flights = _SingleFlight()
+        self._fetch_slots = BoundedSemaphore(self.FETCH_CONCURRENCY)
+        self._providers = ProviderChain([SpanshProvider(), EDSMProvider()])
+        self._harvest_lock = Lock()
+        self._harvested: dict[int, SystemData] = dict()     # ещё не записанные в БД
+        self._harvested_names: dict[int, str] = dict()      # то же, но без координат
+        self._names: dict[int, str] = dict()                # все собранные за сессию без координат
+        self._harvest_started = 0.0
+
+    def _on_migrated(self, db: sqlite3.Connection):
+        self._names_ready = systems_db.has_system_names(db)
+        self._spatial_index = systems_db.has_spatial_index(db)
+        if not self._spatial_index:
+            PluginContext.logger.warning("SQLite doesn't support R*Tree, spatial queries will scan the whole systems cache.")
 
     def on_close(self):
+        self._flush_harvested()
+        self._providers.close()
+        PluginContext.logger.debug(f"Systems cache closed. {self.stats_message()}")
         self._cache.close()
 
 
-    def cache_system(self, entry: dict):
-        sid = entry["SystemAddress"]
-        name = entry["StarSystem"]
-        coords = Coords(*entry["StarPos"])
-        self._db_add_system(_SystemData(sid, name, coords))
+    def cache_system(self, sid: int, name: str, coords: Coords):
+        self._db_add_system(SystemData(sid, name, coords))
+
+    def cache_systems(self, systems: Iterable[SystemData]):
+        """Сохраняет сразу несколько систем одной транзакцией (например, весь проложенный маршрут)."""
+        self._db_add_systems(list(systems))
+
+    def harvest(self, sid: int, name: str, coords: Coords | None):
+        """
+        Как `cache_system`, но для попутно собранных данных (см. `JournalProcessor._harvest_systems`):
+        одна и та же система приходит много раз подряд, поэтому уже известные пропускаются,
+        а новые сразу доступны через кэш в памяти, но записываются в БД пачками.
+        Система без координат (*coords* - None) сохраняется только в `system_names`: по имени её можно
+        найти в источниках, которые не ищут по id (см. `_fetch_system_by_id`).
+        """
+        if sid in self._memory:
+            return
+        if coords is None and (not self._names_ready or self._names.get(sid) == name):
+            return
+        now = time.monotonic()
+        with self._harvest_lock:
+            if not self._harvested and not self._harvested_names:
+                self._harvest_started = now
+            if coords is None:
+                self._harvested_names[sid] = self._names[sid] = name
+            else:
+                self._harvested[sid] = SystemData(sid, name, coords)
+            pending = len(self._harvested) + len(self._harvested_names)
+            due = pending >= self.HARVEST_BATCH or now - self._harvest_started >= self.HARVEST_MAX_DELAY
+        if coords is not None:
+            self._memory.put(sid, SystemData(sid, name, coords))
+            self._memory.invalidate(self._key(name))
+        if due:
+            self._flush_harvested()
 
     def get_system_coords(self, system: str | int) -> Coords | None:
         data = self._get_system_by_id(system) if isinstance(system, int) else self._get_system_by_name(system)
@@ -55,6 +285,107 @@ class SystemsCache(tk.Frame):
         data = self._get_system_by_name(system_name)
         return data.sid if data else None
 
+    def get_many_names(self, sids: Iterable[int]) -> dict[int, str]:
+        """
+        Пакетный вариант `get_system_name`: имена систем по sid одним запросом к БД,
+        недостающие запрашиваются у Spansh параллельно. Ненайденных sid в результате нет.
+        """
+        return {sid: data.name for sid, data in self._get_many_by_id(set(sids)).items()}
+
+    def get_many_coords(self, systems: Iterable[str | int]) -> dict[str | int, Coords]:
+        """
+        Пакетный вариант `get_system_coords` для смеси имён и sid. Ключи результата - те же, что и в *systems*;
+        ненайденных и неоднозначных имён в нём нет.
+        """
+        systems = set(systems)
+        sids = {system for system in systems if isinstance(system, int)}
+        names = {system for system in systems if isinstance(system, str)}
+        result: dict[str | int, Coords] = {sid: data.coords for sid, data in self._get_many_by_id(sids).items()}
+        result.update((name, data.coords) for name, data in self._get_many_by_name(names).items())
+        return result
+
+    def resolve_system(self, system: str | int, callback: Callable[[SystemData | None], Any]):
+        """
+        Неблокирующий вариант `get_system_*` для потока обработчика журнала.
+        Если система есть в кэше, *callback* вызывается сразу же; иначе она запрашивается у Spansh в фоне,
+        и *callback* будет вызван позже в потоке обработчика (см. `core.resolver.Resolver`).
+        """
+        if isinstance(system, int):
+            if (data := self._db_select_by_id(system)) is not None:
+                callback(data)
+                return
+            if self._memory.is_negative(system):
+                PluginContext.logger.debug(f"Sid {system} was recently not found, skipping remote fetching.")
+                callback(None)
+                return
+            PluginContext.logger.debug(f"No cached data for sid {system}, scheduling remote fetching.")
+            PluginContext.resolver.submit(self._get_system_by_id, system, callback=callback)
+            return
+
+        system = self._canonical_name(system)
+        match self._db_select_by_name(system):
+            case [data]:
+                callback(data)
+            case [] if self._memory.is_negative(self._key(system)):
+                PluginContext.logger.debug(f"System {system} was recently not found, skipping remote fetching.")
+                callback(None)
+            case []:
+                PluginContext.logger.debug(f"No cached data for system {system}, scheduling remote fetching.")
+                PluginContext.resolver.submit(self._get_system_by_name, system, callback=callback)
+            case rows:
+                PluginContext.logger.debug(
+                    f"System name {system} is ambigious: ({len(rows)} matches). "
+                    "Unable to determine the desired one, system ID is required."
+                )
+                callback(None)
+
+    def resolve_systems(self, sids: Collection[int], callback: Callable[[dict[int, SystemData]], Any]):
+        """
+        Неблокирующий вариант `get_many_names` для потока обработчика журнала: *callback* получает
+        {sid: SystemData} для всех найденных систем. Как и в `resolve_system`, если всё есть в кэше,
+        *callback* вызывается сразу, иначе - позже в потоке обработчика.
+        """
+        found = self._db_select_many_by_id(sids)
+        if all(sid in found or self._memory.is_negative(sid) for sid in sids):
+            callback(found)
+            return
+        PluginContext.logger.debug(f"No cached data for {len(set(sids) - found.keys())} sids, scheduling remote fetching.")
+        PluginContext.resolver.submit(self._get_many_by_id, set(sids), callback=callback)
+
+    def systems_within(self, coords: Coords, radius: float) -> list[SystemData]:
+        """Системы из кэша не дальше *radius* ly от *coords*, от ближайшей к дальней."""
+        self._flush_harvested()
+        x, y, z = coords
+        if self._spatial_index:
+            cur = self._cache.execute(
+                """
+                SELECT systems.* FROM systems_rtree JOIN systems ON systems.id = systems_rtree.id
+                WHERE min_x <= ? AND max_x >= ? AND min_y <= ? AND max_y >= ? AND min_z <= ? AND max_z >= ?
+                """,
+                (x + radius, x - radius, y + radius, y - radius, z + radius, z - radius)
+            )
+        else:
+            cur = self._cache.execute(
+                "SELECT * FROM systems WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ? AND z BETWEEN ? AND ?",
+                (x - radius, x + radius, y - radius, y + radius, z - radius, z + radius)
+            )
+        # индекс отбирает куб, а нам нужен шар
+        radius_sq = radius * radius
+        found = [SystemData(row[0], row[1], Coords(row[2], row[3], row[4])) for row in cur.fetchall()]
+        found = [data for data in found if data.coords.distance_sq_to(coords) <= radius_sq]
+        found.sort(key=lambda data: data.coords.distance_sq_to(coords))
+        return found
+
+    def nearest(self, coords: Coords, k: int = 1) -> list[SystemData]:
+        """До *k* ближайших к *coords* систем из кэша, от ближайшей к дальней."""
+        radius = self.NEAREST_START_RADIUS
+        while True:
+            found = self.systems_within(coords, radius)
+            # всё, что ближе radius, уже найдено, так что первые k - точно ближайшие
+            if len(found) >= k or radius >= self.NEAREST_MAX_RADIUS:
+                return found[:k]
+            radius *= 4
+
     def show_coords_warning(self):
         def inner(self: SystemsCache):
             self.grid(column=0, row=self._row, sticky="NSWE")
@@ -68,123 +399,348 @@ class SystemsCache(tk.Frame):
     def coords_warning_shown(self) -> bool:
         return self._mapped
 
-
-    def _db_add_system(self, data: _SystemData):
-        cur = self._cache.execute(
-            "INSERT OR IGNORE INTO systems VALUES (?,?,?,?,?)",
-            (data.sid, data.name, data.coords.x, data.coords.y, data.coords.z)
+    def stats(self) -> dict[str, int]:
+        """
+        Счётчики кэша в памяти: размер, попадания, промахи (ушедшие в cache.db) и попадания в негативный кэш,
+        а также число запросов к Spansh, присоединившихся к уже идущему.
+        """
+        return self._memory.stats() | {"coalesced": self._flights.coalesced}
+
+    def stats_message(self) -> str:
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+        return (
+            f"Systems cache: {stats['size']} systems in memory, hit rate {hit_rate:.1f}% "
+            f"({stats['hits']} hits, {stats['misses']} misses), "
+            f"{stats['negative_hits']} negative hits ({stats['negative_size']} unknown keys), "
+            f"{stats['coalesced']} coalesced fetches. "
+            + self._providers.stats_message()
         )
-        self._cache.commit()
-        if cur.rowcount == 1:
+
+
+    def _canonical_name(self, name: str) -> str:
+        """Текущее имя системы, если *name* - её известное прежнее имя (см. `lib.systems_db.KNOWN_ALIASES`)."""
+        return self._aliases.get(name.lower(), name)
+
+    @staticmethod
+    def _key[K: (str, int)](system: K) -> K:
+        """
+        Ключ системы в кэше в памяти, негативном кэше и `_SingleFlight`: sid как есть, имя - в нижнем регистре,
+        как и сравнивает имена индекс `idx_systems_name_nocase`.
+        """
+        return system.lower() if isinstance(system, str) else system    # pyright: ignore[reportReturnType]
+
+    def _flush_harvested(self):
+        """Записывает в БД собранное `harvest`. Вызывается и перед чтением из БД, чтобы не разойтись с памятью."""
+        if not self._harvested and not self._harvested_names:
+            return
+        with self._harvest_lock:
+            systems = list(self._harvested.values())
+            names = list(self._harvested_names.items())
+            self._harvested.clear()
+            self._harvested_names.clear()
+        if systems:
+            self._db_add_systems(systems)
+        if names:
+            with self._write_lock:
+                self._cache.executemany("INSERT OR REPLACE INTO system_names VALUES (?,?)", names)
+                self._cache.commit()
+
+    def _known_name(self, sid: int) -> str | None:
+        """Имя системы без координат, собранное `harvest` в этой или прошлых сессиях."""
+        if (name := self._names.get(sid)) is not None:
+            return name
+        if not self._names_ready:
+            return None
+        row = self._cache.execute("SELECT name FROM system_names WHERE id = ?", (sid,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _db_add_system(self, data: SystemData):
+        self._db_add_systems([data])
+
+    def _db_add_systems(self, systems: list[SystemData]):
+        """Сохраняет системы одной транзакцией."""
+        added = []
+        with self._write_lock:
+            for data in systems:
+                # rowcount для вставки в представление (см. `lib.systems_db`) всегда 0, поэтому считаем по total_changes
+                changes = self._cache.total_changes
+                self._cache.execute(
+                    "INSERT OR IGNORE INTO systems VALUES (?,?,?,?,?)",
+                    (data.sid, data.name, data.coords.x, data.coords.y, data.coords.z)
+                )
+                if self._cache.total_changes > changes:
+                    added.append(data)
+            self._cache.commit()
+        for data in added:
             PluginContext.logger.debug(f"New cached system: {data.name} (id {data.sid}), coords: {data.coords}.")
+            self._memory.put(data.sid, data)
+            # список систем с этим именем изменился, перечитаем его из БД при следующем обращении
+            self._memory.invalidate(self._key(data.name))
 
 
-    def _get_system_by_id(self, sid: int) -> _SystemData | None:
+    def _db_select_by_id(self, sid: int) -> SystemData | None:
+        if (data := self._memory.get(sid)) is not None:
+            return data
+        self._flush_harvested()
         cur = self._cache.execute("SELECT * FROM systems WHERE id = ?", (sid,))
         res = cur.fetchone()
-        if res is not None:
-            name = res[1]
-            coords = Coords(res[2], res[3], res[4])
-            return _SystemData(sid, name, coords)
+        if res is None:
+            return None
+        data = SystemData(sid, res[1], Coords(res[2], res[3], res[4]))
+        self._memory.put(sid, data)
+        return data
+
+    def _db_select_many_by_id(self, sids: Iterable[int]) -> dict[int, SystemData]:
+        found: dict[int, SystemData] = dict()
+        missing = []
+        for sid in sids:
+            if (data := self._memory.get(sid)) is not None:
+                found[sid] = data
+            else:
+                missing.append(sid)
+        if missing:
+            self._flush_harvested()
+        for i in range(0, len(missing), self.SELECT_CHUNK):
+            chunk = missing[i:i + self.SELECT_CHUNK]
+            cur = self._cache.execute(f"SELECT * FROM systems WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            for row in cur.fetchall():
+                data = found[row[0]] = SystemData(row[0], row[1], Coords(row[2], row[3], row[4]))
+                self._memory.put(data.sid, data)
+        return found
+
+    def _db_select_many_by_name(self, names: Iterable[str]) -> dict[str, list[SystemData]]:
+        """Ключи результата - имена в нижнем регистре (см. `_key`)."""
+        found: dict[str, list[SystemData]] = dict()
+        missing = []
+        for name in names:
+            if (systems := self._memory.get(self._key(name))) is not None:
+                found[self._key(name)] = list(systems)
+            else:
+                missing.append(name)
+        if missing:
+            self._flush_harvested()
+        wanted = {self._key(name) for name in missing}
+        for i in range(0, len(missing), self.SELECT_CHUNK):
+            chunk = missing[i:i + self.SELECT_CHUNK]
+            cur = self._cache.execute(
+                f"SELECT * FROM systems WHERE name COLLATE NOCASE IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for row in cur.fetchall():
+                if (key := self._key(row[1])) in wanted:
+                    found.setdefault(key, []).append(SystemData(row[0], row[1], Coords(row[2], row[3], row[4])))
+        for key in wanted:
+            if key in found:
+                self._memory.put(key, tuple(found[key]))
+        return found
+
+    def _db_select_by_name(self, name: str) -> list[SystemData]:
+        key = self._key(name)
+        if (systems := self._memory.get(key)) is not None:
+            return list(systems)
+        self._flush_harvested()
+        cur = self._cache.execute("SELECT * FROM systems WHERE name = ? COLLATE NOCASE", (name,))
+        systems = [SystemData(row[0], row[1], Coords(row[2], row[3], row[4])) for row in cur.fetchall()]
+        if systems:
+            self._memory.put(key, tuple(systems))
+        return systems
+
+
+    def _get_system_by_id(self, sid: int) -> SystemData | None:
+        if (data := self._db_select_by_id(sid)) is not None:
+            return data
+
+        if self._memory.is_negative(sid):
+            return None
+        try:
+            # слот занимаем до single-flight: тогда тот, кого ждут остальные, всегда уже может делать запрос
+            with self._fetch_slots:
+                return self._flights.do(sid, self._load_system_by_id, sid)
+        except ProviderError:
+            return None     # не запоминаем как ненайденную: источники просто не ответили
+
+
+    def _load_system_by_id(self, sid: int) -> SystemData | None:
+        """Бросает `ProviderError`, если ни один источник не ответил."""
+        # пока мы ждали своей очереди, система могла загрузиться в другом потоке
+        if (data := self._db_select_by_id(sid)) is not None:
+            return data
+        if self._memory.is_negative(sid):
+            return None
 
         PluginContext.logger.debug(f"No cached data for sid {sid}, attempting remote fetching.")
         system_data = self._fetch_system_by_id(sid)
         if system_data:
             self._db_add_system(system_data)
         else:
-            PluginContext.logger.debug(f"Couldn't fetch system data for sid {sid}.")
+            PluginContext.logger.debug(f"System with sid {sid} not found.")
+            self._memory.put_negative(sid)
         return system_data
 
 
-    def _get_system_by_name(self, name: str) -> _SystemData | None:
-        cur = self._cache.execute("SELECT * FROM systems WHERE name = ?", (name,))
-        res = cur.fetchall()
+    def _get_system_by_name(self, name: str) -> SystemData | None:
+        name = self._canonical_name(name)
+        res = self._db_select_by_name(name)
         if len(res) == 1:
-            sid = res[0][0]
-            coords = Coords(res[0][2], res[0][3], res[0][4])
-            return _SystemData(sid, name, coords)
+            return res[0]
         if len(res) > 1:
             PluginContext.logger.debug(
                 f"System name {name} is ambigious: ({len(res)} matches). Unable to determine the desired one, system ID is required."
             )
             return None
+        if self._memory.is_negative(self._key(name)):
+            return None
+        # результат может прийти и из пакетного запроса (`_get_many_by_name`), там неоднозначное имя - список систем
+        try:
+            with self._fetch_slots:
+                data = self._flights.do(self._key(name), self._load_system_by_name, name)
+        except ProviderError:
+            return None
+        return data if isinstance(data, SystemData) else None
+
+
+    def _load_system_by_name(self, name: str) -> SystemData | list[SystemData] | None:
+        """Бросает `ProviderError`, если ни один источник не ответил."""
+        res = self._db_select_by_name(name)
+        if res:
+            return res[0] if len(res) == 1 else res
+        if self._memory.is_negative(self._key(name)):
+            return None
 
         PluginContext.logger.debug(f"No cached data for system {name}, attempting remote fetching.")
         data = self._fetch_system_by_name(name)
         if data is None:
-            PluginContext.logger.debug(f"Couldn't fetch system data for {name}.")
+            PluginContext.logger.debug(f"System {name} not found.")
+            self._memory.put_negative(self._key(name))
             return None
-        if isinstance(data, _SystemData):
+        if isinstance(data, SystemData):
             self._db_add_system(data)
             return data
 
-        # data: list[_SystemData]
-        for system_data in data:
-            self._db_add_system(system_data)
+        # data: list[SystemData]
+        self._db_add_systems(data)
         PluginContext.logger.debug(
-            f"System name {name} is ambigious: ({len(res)} matches). Unable to determine the desired one, system ID is required."
+            f"System name {name} is ambigious: ({len(data)} matches). Unable to determine the desired one, system ID is required."
         )
-        return None
-
-
-    def _fetch_system_by_id(self, system_id: int) -> _SystemData | None:
-        url = f"https://spansh.co.uk/api/system/{system_id}"
-        try:
-            resp = requests.get(url)
-            resp.raise_for_status()
-        except requests.RequestException as e:
-            PluginContext.logger.error(f"Couldn't fetch system data for sid {system_id} from Spansh:", exc_info=e)
-            return None
-
-        data: dict | None = resp.json().get("record")
-        if data is None:
-            PluginContext.logger.warning(f"Spansh data for sid {system_id} doesn't contain the `record` field.")
-            return None
-
-        name = data.get("name")
-        x, y, z = data.get("x"), data.get("y"), data.get("z")
-        if None in (name, x, y, z):
-            PluginContext.logger.warning(
-                f"Spansh data for sid {system_id} is inconsistent. "
-                f"Reported name: {name}, reported coords: [{x}, {y}, {z}]."
-            )
-            return None
-        return _SystemData(system_id, name, Coords(x, y, z))  # pyright: ignore[reportArgumentType]
-
-
-    def _fetch_system_by_name(self, system_name: str) -> _SystemData | list[_SystemData] | None:
-        url = "https://spansh.co.uk/api/search"
-        params = {"q": system_name}
-        try:
-            resp = requests.get(url, params=params)
-            resp.raise_for_status()
-        except requests.RequestException as e:
-            PluginContext.logger.error(f"Couldn't fetch system data for {system_name} from Spansh:", exc_info=e)
-            return None
-
-        results: list[dict] = resp.json().get("results", [])
-        systems = []
-        for result in results:
-            record: dict | None = result.get("record")
-            if record is None:
+        return data
+
+
+    def _get_many_by_id(self, sids: Collection[int]) -> dict[int, SystemData]:
+        found = self._db_select_many_by_id(sids)
+        missing = [sid for sid in sids if sid not in found and not self._memory.is_negative(sid)]
+        if not missing:
+            return found
+
+        PluginContext.logger.debug(f"No cached data for {len(missing)} sids, attempting remote fetching.")
+        fetched = []
+        results = self._fetch_many(missing, self._fetch_system_by_id)
+        if len(results) < len(missing):
+            PluginContext.logger.debug(f"No provider answered for {len(missing) - len(results)} sids.")
+        for sid, data in results.items():
+            if data is None:
+                PluginContext.logger.debug(f"System with sid {sid} not found.")
+                self._memory.put_negative(sid)
+            else:
+                found[sid] = data
+                fetched.append(data)
+        self._db_add_systems(fetched)
+        return found
+
+
+    def _get_many_by_name(self, names: Collection[str]) -> dict[str, SystemData]:
+        """
+        Как `_get_many_by_id`, но неоднозначные имена в результат не попадают.
+        Ключи результата - имена в том виде, в каком они переданы.
+        """
+        requested: dict[str, list[str]] = dict()    # {ключ: переданные имена}
+        queries: dict[str, str] = dict()            # {ключ: имя для запроса}
+        for name in names:
+            canonical = self._canonical_name(name)
+            requested.setdefault(self._key(canonical), []).append(name)
+            queries.setdefault(self._key(canonical), canonical)
+
+        found = self._db_select_many_by_name(queries.values())
+        missing = [query for key, query in queries.items() if key not in found and not self._memory.is_negative(key)]
+        fetched = []
+        if missing:
+            PluginContext.logger.debug(f"No cached data for {len(missing)} systems, attempting remote fetching.")
+        results = self._fetch_many(missing, self._fetch_system_by_name)
+        if len(results) < len(missing):
+            PluginContext.logger.debug(f"No provider answered for {len(missing) - len(results)} systems.")
+        for query, data in results.items():
+            if data is None:
+                PluginContext.logger.debug(f"System {query} not found.")
+                self._memory.put_negative(self._key(query))
                 continue
-            if result.get("type") == "system" and record.get("name") == system_name:
-                sid = record.get("id64")
-                x, y, z = record.get("x"), record.get("y"), record.get("z")
-                if None in (sid, x, y, z):
-                    PluginContext.logger.warning(
-                        f"Spansh data for system {system_name} is inconsistent. "
-                        f"Reported sid: {sid}, reported coords: [{x}, {y}, {z}]."
-                    )
-                    continue
-                systems.append(_SystemData(sid, system_name, Coords(x, y, z)))
-
-        match len(systems):
-            case 0:
-                PluginContext.logger.debug(f"No results found for system name {system_name} on Spansh.")
+            systems = [data] if isinstance(data, SystemData) else data
+            found[self._key(query)] = systems
+            fetched.extend(systems)
+        self._db_add_systems(fetched)
+
+        result = dict()
+        for key, systems in found.items():
+            if len(systems) == 1:
+                result.update((name, systems[0]) for name in requested[key])
+            else:
+                PluginContext.logger.debug(f"System name {queries[key]} is ambigious: ({len(systems)} matches), skipped.")
+        return result
+
+
+    def _fetch_many[K: Hashable, T](self, keys: list[K], fetch: Callable[[K], T]) -> dict[K, T]:
+        """
+        Параллельно запрашивает у источников данные по *keys* в пуле `ProviderChain`. Одновременных запросов -
+        не больше `FETCH_CONCURRENCY` (слоты `_fetch_slots` общие с одиночными запросами), а ключи, которые
+        уже запрашиваются в другом потоке, не запрашиваются повторно.
+        Ключей, по которым не ответил ни один источник, в результате нет.
+        """
+        def fetch_one(key: K) -> tuple[K, T] | None:
+            try:
+                return key, self._flights.do(self._key(key), fetch, key)
+            except ProviderError:
                 return None
-            case 1:
-                return systems[0]
-            case _:
-                PluginContext.logger.debug(f"Multiple results ({len(systems)}) found for system name {system_name} on Spansh.")
-                return systems
+
+        def release(_: Future):
+            self._fetch_slots.release()
+
+        futures: list[Future] = []
+        for key in keys:
+            # слот занимаем здесь, а не в пуле: задачи, ждущие слота, заняли бы потоки, нужные самим запросам
+            self._fetch_slots.acquire()
+            try:
+                future = self._providers.submit(fetch_one, key)
+            except RuntimeError:    # пул уже остановлен - закрываемся
+                self._fetch_slots.release()
+                break
+            future.add_done_callback(release)
+            futures.append(future)
+        return dict(res for future in futures if not future.cancelled() and (res := future.result()) is not None)
+
+
+    def _fetch_system_by_id(self, system_id: int) -> SystemData | None:
+        """
+        None - источники не знают такой системы; `ProviderError` - ни один источник не ответил.
+        Вызывающий должен занимать слот `_fetch_slots`.
+        """
+        error: ProviderError | None = None
+        try:
+            record = self._providers.system_by_id(system_id)
+        except ProviderError as e:
+            record, error = None, e
+        if record is None and (name := self._known_name(system_id)) is not None:
+            # источники, ищущие по id, систему не дали, но её имя мы видели в журнале - спросим остальных по имени
+            PluginContext.logger.debug(f"Looking up sid {system_id} by its journal name {name}.")
+            result = self._providers.system_by_name(name)
+            candidates = result if isinstance(result, list) else [result] if result is not None else []
+            record = next((r for r in candidates if r[0] == system_id), None)
+            error = None
+        if error is not None:
+            raise error
+        return SystemData(*record) if record is not None else None
+
+
+    def _fetch_system_by_name(self, system_name: str) -> SystemData | list[SystemData] | None:
+        result = self._providers.system_by_name(system_name)
+        if isinstance(result, list):
+            return [SystemData(*record) for record in result]
+        return SystemData(*result) if result is not None else None
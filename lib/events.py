@@ -0,0 +1,163 @@
+"""
+Типизированные записи для самых частых и "тяжёлых" ивентов журнала.
+
+`JournalProcessor` разбирает каждую такую запись ровно один раз (см. `decode`) и передаёт результат модулям
+в `JournalEntry.record`, а субмодулям БГС - вторым аргументом `on_journal_entry`. Время ивента уже
+переведено в `datetime`, так что модулям больше не нужно звать `datetime.fromisoformat` самостоятельно.
+
+Исходный словарь всегда доступен в поле `raw` - для редких полей, которые здесь не вынесены.
+"""
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+
+from lib.journal import Coords
+
+
+class FSDJump(NamedTuple):
+    timestamp: datetime
+    star_system: str
+    system_address: int
+    star_pos: Coords
+    factions: list[dict]
+    raw: dict
+
+
+class Location(NamedTuple):
+    """Также используется для CarrierJump, у которого та же структура."""
+    timestamp: datetime
+    star_system: str
+    system_address: int
+    star_pos: Coords
+    factions: list[dict]
+    docked: bool
+    station_name: str | None
+    station_faction: str | None
+    raw: dict
+
+
+class Scan(NamedTuple):
+    timestamp: datetime
+    body_name: str
+    body_id: int | None
+    star_system: str | None
+    system_address: int | None
+    star_type: str | None
+    raw: dict
+
+
+class FSSSignalDiscovered(NamedTuple):
+    timestamp: datetime
+    system_address: int
+    signal_name: str
+    signal_type: str | None
+    is_station: bool
+    raw: dict
+
+
+class MissionCompleted(NamedTuple):
+    timestamp: datetime
+    mission_id: int
+    name: str
+    faction: str | None
+    faction_effects: list[dict]
+    raw: dict
+
+
+class FactionKillBond(NamedTuple):
+    timestamp: datetime
+    reward: int
+    awarding_faction: str
+    victim_faction: str
+    raw: dict
+
+
+class Docked(NamedTuple):
+    timestamp: datetime
+    station_name: str
+    station_type: str | None
+    star_system: str
+    system_address: int | None
+    market_id: int | None
+    station_faction: str | None
+    raw: dict
+
+
+class Music(NamedTuple):
+    timestamp: datetime
+    music_track: str
+    raw: dict
+
+
+type JournalEvent = FSDJump | Location | Scan | FSSSignalDiscovered | MissionCompleted | FactionKillBond | Docked | Music
+
+
+def _fsd_jump(e: dict) -> FSDJump:
+    return FSDJump(
+        datetime.fromisoformat(e["timestamp"]), e["StarSystem"], e["SystemAddress"], Coords(*e["StarPos"]),
+        e.get("Factions", []), e
+    )
+
+
+def _location(e: dict) -> Location:
+    return Location(
+        datetime.fromisoformat(e["timestamp"]), e["StarSystem"], e["SystemAddress"], Coords(*e["StarPos"]),
+        e.get("Factions", []), e.get("Docked", False), e.get("StationName"), e.get("StationFaction", {}).get("Name"), e
+    )
+
+
+def _scan(e: dict) -> Scan:
+    return Scan(
+        datetime.fromisoformat(e["timestamp"]), e["BodyName"], e.get("BodyID"), e.get("StarSystem"), e.get("SystemAddress"),
+        e.get("StarType"), e
+    )
+
+
+def _fss_signal(e: dict) -> FSSSignalDiscovered:
+    return FSSSignalDiscovered(
+        datetime.fromisoformat(e["timestamp"]), e["SystemAddress"], e.get("SignalName", ""), e.get("SignalType"),
+        e.get("IsStation", False), e
+    )
+
+
+def _mission_completed(e: dict) -> MissionCompleted:
+    return MissionCompleted(
+        datetime.fromisoformat(e["timestamp"]), e["MissionID"], e["Name"], e.get("Faction"), e.get("FactionEffects", []), e
+    )
+
+
+def _kill_bond(e: dict) -> FactionKillBond:
+    return FactionKillBond(datetime.fromisoformat(e["timestamp"]), e["Reward"], e["AwardingFaction"], e["VictimFaction"], e)
+
+
+def _docked(e: dict) -> Docked:
+    return Docked(
+        datetime.fromisoformat(e["timestamp"]), e["StationName"], e.get("StationType"), e["StarSystem"], e.get("SystemAddress"),
+        e.get("MarketID"), e.get("StationFaction", {}).get("Name"), e
+    )
+
+
+def _music(e: dict) -> Music:
+    return Music(datetime.fromisoformat(e["timestamp"]), e["MusicTrack"], e)
+
+
+_DECODERS: dict[str, Callable[[dict], JournalEvent]] = {
+    "FSDJump": _fsd_jump,
+    "Location": _location,
+    "CarrierJump": _location,
+    "Scan": _scan,
+    "FSSSignalDiscovered": _fss_signal,
+    "MissionCompleted": _mission_completed,
+    "FactionKillBond": _kill_bond,
+    "Docked": _docked,
+    "Music": _music,
+}
+
+
+def decode(entry: dict) -> JournalEvent | None:
+    """
+    Возвращает типизированную запись для поддерживаемых ивентов и None для всех остальных.
+    Бросает KeyError/ValueError/TypeError, если в записи нет обязательных полей.
+    """
+    decoder = _DECODERS.get(entry["event"])
+    return decoder(entry) if decoder is not None else None
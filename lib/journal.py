@@ -1,51 +1,92 @@
-class Coords:
-    def __init__(self, x: float, y: float, z: float):
-        self.x = x
-        self.y = y
-        self.z = z
+import math
+from collections.abc import Iterator, Mapping
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, NamedTuple
 
-    def __iter__(self):
-        yield self.x
-        yield self.y
-        yield self.z
+
+if TYPE_CHECKING:
+    from lib.events import JournalEvent
+
+
+class Coords(NamedTuple):
+    """
+    Координаты системы. Неизменяемый кортеж без `__dict__`: распаковывается как `x, y, z = coords`
+    и поддерживает сложение/вычитание векторов и умножение на число.
+    """
+    x: float
+    y: float
+    z: float
+
+    def __add__(self, other: 'Coords') -> 'Coords':    # pyright: ignore[reportIncompatibleMethodOverride]
+        return Coords(self.x + other[0], self.y + other[1], self.z + other[2])
+
+    def __sub__(self, other: 'Coords') -> 'Coords':
+        return Coords(self.x - other[0], self.y - other[1], self.z - other[2])
+
+    def __mul__(self, k: float) -> 'Coords':           # pyright: ignore[reportIncompatibleMethodOverride]
+        return Coords(self.x * k, self.y * k, self.z * k)
+
+    __rmul__ = __mul__
+
+    def distance_to(self, other: 'Coords | tuple[float, float, float]') -> float:
+        return math.dist(self, other)
+
+    def distance_sq_to(self, other: 'Coords | tuple[float, float, float]') -> float:
+        """Квадрат расстояния - для сравнений, где корень не нужен."""
+        dx, dy, dz = self.x - other[0], self.y - other[1], self.z - other[2]
+        return dx * dx + dy * dy + dz * dz
 
     def __str__(self):
         return '[' + ', '.join(map(str, self)) + ']'
 
 
-class JournalEntry:
-    def __init__(
-        self,
-        cmdr: str | None,
-        is_beta: bool,
-        system: str | None,
-        systemAddress: int | None,
-        station: str | None,
-        data: dict,
-        state: dict,
-        coords: Coords | None,
-    ):
-        self.cmdr = cmdr
-        self.is_beta = is_beta
-        self.system = system
-        self.systemAddress = systemAddress
-        self.station = station
-        self.data = data
-        self.state = state
-        self.coords = coords
-
-    def as_dict(self):
-        return {
-            "cmdr": self.cmdr,
-            "is_beta": self.is_beta,
-            "system": self.system,
-            "systemAddress": self.systemAddress,
-            "station": self.station,
-            "data": self.data,
-            "state": self.state,
-            "coords": {
-                "x": self.coords.x,
-                "y": self.coords.y,
-                "z": self.coords.z,
-            } if self.coords is not None else None,
-        }
+class JournalEntry(NamedTuple):
+    """
+    Запись журнала вместе с контекстом, в котором она была получена.
+
+    `state` - ссылка на словарь состояния EDMC, пришедший вместе с записью, без копирования.
+    EDMC передаёт плагинам отдельную копию состояния с каждой записью, поэтому ссылка остаётся состоянием
+    на момент этой записи, даже если модуль обрабатывает её позже (см. `core.dispatch`).
+
+    Для частых ивентов в `record` лежит уже разобранная типизированная запись (см. `lib.events`).
+    """
+    cmdr: str | None
+    is_beta: bool
+    system: str | None
+    systemAddress: int | None
+    station: str | None
+    data: dict
+    state: dict
+    coords: Coords | None
+    record: 'JournalEvent | None' = None
+
+    @property
+    def timestamp(self) -> datetime:
+        """Время ивента; для записей с `record` уже разобрано заранее."""
+        return self.record.timestamp if self.record is not None else datetime.fromisoformat(self.data["timestamp"])
+
+    def as_dict(self) -> Mapping[str, Any]:
+        """Словарное представление записи без копирования данных."""
+        return _JournalEntryView(self)
+
+
+class _JournalEntryView(Mapping):
+    __slots__ = ("_entry",)
+    _KEYS = ("cmdr", "is_beta", "system", "systemAddress", "station", "data", "state", "coords", "record")
+
+    def __init__(self, entry: JournalEntry):
+        self._entry = entry
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        value = getattr(self._entry, key)
+        if key == "coords" and value is not None:
+            return value._asdict()
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
@@ -0,0 +1,53 @@
+"""
+Версионирование схем SQLite-файлов плагина.
+
+Версия схемы хранится в самом файле (`PRAGMA user_version`). Миграция - функция, которая переводит БД
+с версии N на N+1. Она вызывается многократно, пока не вернёт True, и за один вызов делает ограниченный
+объём работы в собственной транзакции. Поэтому большие БД можно мигрировать в фоне (см. `core.systems.SystemsCache`),
+не блокируя запуск, а прерванная миграция продолжится при следующем запуске с того же места.
+Прогресс миграция определяет по самой БД, её вызовы должны быть идемпотентны.
+
+Модуль не зависит от EDMC: миграции выполняет и `lib.systems_dump`, запускаемый отдельно от плагина.
+"""
+import sqlite3
+from collections.abc import Callable
+
+
+type Migration = Callable[[sqlite3.Connection], bool]
+
+
+class Migrations:
+    def __init__(self, name: str, migrations: list[Migration]):
+        """*migrations[i]* переводит БД с версии i на i+1."""
+        self.name = name
+        self.migrations = migrations
+
+    @property
+    def latest(self) -> int:
+        return len(self.migrations)
+
+    @staticmethod
+    def version(db: sqlite3.Connection) -> int:
+        return db.execute("PRAGMA user_version").fetchone()[0]
+
+    @staticmethod
+    def set_version(db: sqlite3.Connection, version: int):
+        db.execute(f"PRAGMA user_version = {int(version)}")
+        db.commit()
+
+    def pending(self, db: sqlite3.Connection) -> bool:
+        return self.version(db) < self.latest
+
+    def step(self, db: sqlite3.Connection) -> bool:
+        """Выполняет одну порцию работы. Возвращает True, если БД уже в актуальной версии."""
+        version = self.version(db)
+        if version >= self.latest:
+            return True
+        if self.migrations[version](db):
+            self.set_version(db, version + 1)
+        return False
+
+    def run(self, db: sqlite3.Connection):
+        """Выполняет все миграции сразу, в текущем потоке."""
+        while not self.step(db):
+            pass
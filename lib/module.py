@@ -1,5 +1,7 @@
 import tkinter as tk
 from abc import ABC, ABCMeta, abstractmethod
+from collections.abc import Iterable
+from typing import Any
 
 from lib.journal import JournalEntry
 
@@ -35,6 +37,11 @@ class Module(ABC, metaclass=ModuleMeta):
     """
 
     enabled: bool
+    events: frozenset[str] | None = None
+    """
+    Названия ивентов, которые нужно передавать в `on_journal_entry`.
+    None - модуль получает все записи из логов (см. `EventIndex`).
+    """
 
     def on_start(self, plugin_dir: str):
         """
@@ -96,3 +103,31 @@ def get_active_modules() -> list[Module]:
 
 def list_active_modules_names() -> list[str]:
     return [instance.__class__.__name__ for instance in ModuleMeta._instances.values() if instance.enabled]
+
+
+class EventIndex:
+    """
+    Индекс "ивент -> подписанные на него обработчики".
+
+    Обработчиком может быть любой объект с атрибутом `events` (см. `Module.events`):
+    None означает подписку на все ивенты. Списки подписчиков строятся лениво,
+    при первой встрече ивента, и сохраняют исходный порядок обработчиков.
+    """
+    def __init__(self, handlers: Iterable[Any]):
+        self._handlers = tuple(handlers)
+        self._index: dict[str, tuple[Any, ...]] = dict()
+
+    def __getitem__(self, event: str) -> tuple[Any, ...]:
+        subscribers = self._index.get(event)
+        if subscribers is None:
+            subscribers = tuple(h for h in self._handlers if h.events is None or event in h.events)
+            self._index[event] = subscribers
+        return subscribers
+
+
+def get_event_index() -> EventIndex:
+    """
+    Возвращает индекс подписок всех созданных модулей.
+    Модули, отключённые в процессе работы, остаются в индексе - проверяйте `enabled` при вызове.
+    """
+    return EventIndex(ModuleMeta._instances.values())
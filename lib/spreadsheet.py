@@ -1,8 +1,8 @@
 import csv
-import requests
 from contextlib import closing
 
 from core.debug import debug
+from core.rate_limit import limited_get
 
 
 class BytesDecoder:
@@ -23,7 +23,7 @@ class Spreadsheet:
         self.data = None
 
     def download(self):
-        with closing(requests.get(self.url, stream=True)) as resp:
+        with closing(limited_get(self.url, stream=True)) as resp:
             if not resp.ok:
                 debug("Original URL: {}", self.url)
                 debug("Spreadsheets response: {}:\n{}", resp, resp.text)
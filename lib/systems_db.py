@@ -0,0 +1,273 @@
+"""
+Схема кэша систем (userdata/cache.db): общая для `core.systems.SystemsCache` и `lib.systems_dump`.
+
+- `systems_packed` - sid, имя и координаты. Координаты хранятся как целые числа в единицах сетки игры
+  (1/32 ly, см. `GRID`): так они занимают до 3 байт вместо 8 и не теряют точности;
+- `systems` - представление поверх `systems_packed` с координатами в ly. Вся работа с кэшем идёт через него,
+  вставка в него тоже поддерживается. Для массовой загрузки пишите напрямую в `systems_packed` (см. `pack`);
+- `idx_systems_name_nocase` - поиск по имени без учёта регистра (`WHERE name = ? COLLATE NOCASE`);
+- `system_aliases` - прежние и неофициальные имена систем (см. `KNOWN_ALIASES`), тоже без учёта регистра;
+- `system_names` - системы, о которых известны только id и имя (без координат), например из FSDTarget и Scan.
+  По имени можно найти систему в источниках, которые не ищут по id (см. `core.systems.SystemsCache.harvest`);
+- `systems_rtree` - пространственный индекс (R*Tree) для запросов "системы в радиусе" и "ближайшие системы".
+  Синхронизируется с `systems_packed` триггерами. Если SQLite собран без R*Tree, индекса нет, а запросы
+  выполняются перебором таблицы (см. `has_spatial_index`).
+
+До версии 1 (см. `MIGRATIONS`) `systems` было обычной таблицей с координатами в REAL. Пока идёт миграция,
+кэш работает со старой таблицей через то же имя и те же столбцы. Индекс без учёта регистра, псевдонимы, R*Tree
+и `system_names` появились в версиях 2-5; новая БД создаётся сразу со всем этим.
+"""
+import sqlite3
+
+from lib.migrations import Migrations
+
+
+GRID = 32   # единиц сетки в 1 ly
+MIGRATION_BATCH = 50_000
+
+# прежнее имя -> текущее, под которым система известна Spansh
+KNOWN_ALIASES = {
+    "Pleiades Sector IR-W d1-55": "Delphi",
+}
+
+_CREATE_PACKED = """
+    CREATE TABLE IF NOT EXISTS systems_packed (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        x INTEGER NOT NULL,
+        y INTEGER NOT NULL,
+        z INTEGER NOT NULL
+    )
+"""
+_CREATE_VIEW = (
+    f"""
+    CREATE VIEW systems (id, name, x, y, z) AS
+        SELECT id, name, x * 1.0 / {GRID}, y * 1.0 / {GRID}, z * 1.0 / {GRID} FROM systems_packed
+    """,
+    f"""
+    CREATE TRIGGER systems_insert INSTEAD OF INSERT ON systems BEGIN
+        INSERT OR IGNORE INTO systems_packed
+        VALUES (new.id, new.name, round(new.x * {GRID}), round(new.y * {GRID}), round(new.z * {GRID}));
+    END
+    """,
+)
+_CREATE_NAMES = "CREATE TABLE IF NOT EXISTS system_names (id INTEGER PRIMARY KEY, name TEXT NOT NULL)"
+_CREATE_RTREE = "CREATE VIRTUAL TABLE systems_rtree USING rtree(id, min_x, max_x, min_y, max_y, min_z, max_z)"
+
+
+def _rtree_triggers(db: sqlite3.Connection) -> tuple[str, str]:
+    if _is_packed(db):
+        table, coords = "systems_packed", (f"new.{c} * 1.0 / {GRID}" for c in "xyz")
+    else:
+        table, coords = "systems", (f"new.{c}" for c in "xyz")
+    x, y, z = coords
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS systems_rtree_insert AFTER INSERT ON {table} BEGIN
+            INSERT OR REPLACE INTO systems_rtree VALUES (new.id, {x}, {x}, {y}, {y}, {z}, {z});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS systems_rtree_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM systems_rtree WHERE id = old.id;
+        END
+        """,
+    )
+
+
+def _is_packed(db: sqlite3.Connection) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems' AND type = 'view'").fetchone() is not None
+
+
+def pack(sid: int, name: str, x: float, y: float, z: float) -> tuple[int, str, int, int, int]:
+    """Строка для `systems_packed`."""
+    return sid, name, round(x * GRID), round(y * GRID), round(z * GRID)
+
+
+def create_schema(db: sqlite3.Connection):
+    """
+    Создаёт схему новой БД сразу в последней версии. Существующую БД не трогает: её обновляет `MIGRATIONS`
+    (в плагине - в фоне, см. `core.systems._MigrationThread`), потому что на большом кэше это долго.
+    """
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems'").fetchone() is not None:
+        return
+    db.execute(_CREATE_PACKED)
+    for statement in _CREATE_VIEW:
+        db.execute(statement)
+    create_name_index(db)
+    _create_aliases(db)
+    create_spatial_index(db)
+    db.execute(_CREATE_NAMES)
+    db.commit()
+    MIGRATIONS.set_version(db, MIGRATIONS.latest)
+
+
+def create_name_index(db: sqlite3.Connection):
+    table = "systems_packed" if _is_packed(db) else "systems"
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_systems_name_nocase ON {table}(name COLLATE NOCASE)")
+
+
+def drop_name_index(db: sqlite3.Connection):
+    db.execute("DROP INDEX IF EXISTS idx_systems_name_nocase")
+
+
+def _create_aliases(db: sqlite3.Connection):
+    db.execute("CREATE TABLE IF NOT EXISTS system_aliases (alias TEXT PRIMARY KEY COLLATE NOCASE, name TEXT NOT NULL)")
+    db.executemany("INSERT OR IGNORE INTO system_aliases VALUES (?,?)", KNOWN_ALIASES.items())
+
+
+def load_aliases(db: sqlite3.Connection) -> dict[str, str]:
+    """Псевдонимы систем: {псевдоним в нижнем регистре: имя}. Пока таблицы нет (см. `MIGRATIONS`) - `KNOWN_ALIASES`."""
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'system_aliases'").fetchone() is None:
+        return {alias.lower(): name for alias, name in KNOWN_ALIASES.items()}
+    return {alias.lower(): name for alias, name in db.execute("SELECT alias, name FROM system_aliases")}
+
+
+def has_system_names(db: sqlite3.Connection) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'system_names'").fetchone() is not None
+
+
+def has_spatial_index(db: sqlite3.Connection) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems_rtree'").fetchone() is not None
+
+
+def create_spatial_index(db: sqlite3.Connection) -> bool:
+    """
+    Создаёт R*Tree и его триггеры, если их ещё нет, и заполняет его уже сохранёнными системами.
+    Возвращает False, если SQLite не поддерживает R*Tree.
+    """
+    if not has_spatial_index(db):
+        try:
+            db.execute(_CREATE_RTREE)
+        except sqlite3.OperationalError:
+            return False
+        db.execute("INSERT INTO systems_rtree SELECT id, x, x, y, y, z, z FROM systems")
+    for trigger in _rtree_triggers(db):
+        db.execute(trigger)
+    return True
+
+
+def suspend_spatial_index(db: sqlite3.Connection):
+    """
+    Для массовой загрузки: отключает построчное обновление R*Tree.
+    После загрузки обязательно вызовите `resume_spatial_index`.
+    """
+    db.execute("DROP TRIGGER IF EXISTS systems_rtree_insert")
+
+
+def resume_spatial_index(db: sqlite3.Connection):
+    """Добавляет в R*Tree системы, загруженные после `suspend_spatial_index`, и возвращает триггеры."""
+    if has_spatial_index(db):
+        db.execute(
+            "INSERT INTO systems_rtree SELECT id, x, x, y, y, z, z FROM systems WHERE id NOT IN (SELECT id FROM systems_rtree)"
+        )
+    create_spatial_index(db)
+
+
+def _migrate_to_packed(db: sqlite3.Connection) -> bool:
+    """
+    0 -> 1: координаты в REAL -> целые в единицах сетки (`systems_packed` и представление `systems`).
+    Строки копируются пачками по возрастанию id; пока копирование идёт, старая таблица продолжает работать.
+    Последний шаг одной транзакцией докопирует то, что добавилось за это время, и заменит таблицу представлением.
+    """
+    if _is_packed(db):
+        return True     # БД создана уже в новой схеме
+    db.execute(_CREATE_PACKED)
+    last_id = db.execute("SELECT max(id) FROM systems_packed").fetchone()[0]
+    cur = db.execute(
+        f"""
+        INSERT OR IGNORE INTO systems_packed
+        SELECT id, name, round(x * {GRID}), round(y * {GRID}), round(z * {GRID}) FROM systems
+        WHERE id > ? ORDER BY id LIMIT ?
+        """,
+        (last_id if last_id is not None else -1, MIGRATION_BATCH)
+    )
+    db.commit()
+    if cur.rowcount == MIGRATION_BATCH:     # иначе старая таблица скопирована до конца
+        return False
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute(
+            f"""
+            INSERT OR IGNORE INTO systems_packed
+            SELECT id, name, round(x * {GRID}), round(y * {GRID}), round(z * {GRID}) FROM systems
+            WHERE id NOT IN (SELECT id FROM systems_packed)
+            """
+        )
+        db.execute("DROP TABLE systems")    # вместе с индексом по имени и триггерами R*Tree
+        for statement in _CREATE_VIEW:
+            db.execute(statement)
+        create_name_index(db)
+        if has_spatial_index(db):
+            for trigger in _rtree_triggers(db):
+                db.execute(trigger)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return True
+
+
+def _migrate_name_index(db: sqlite3.Connection) -> bool:
+    """1 -> 2: индекс по имени без учёта регистра вместо обычного."""
+    db.execute("DROP INDEX IF EXISTS idx_systems_name")
+    create_name_index(db)
+    db.commit()
+    return True
+
+
+def _migrate_aliases(db: sqlite3.Connection) -> bool:
+    """2 -> 3: таблица псевдонимов систем."""
+    _create_aliases(db)
+    db.commit()
+    return True
+
+
+def _migrate_spatial_index(db: sqlite3.Connection) -> bool:
+    """
+    3 -> 4: R*Tree. Заполняется пачками по возрастанию id, как `_migrate_to_packed`; последний шаг одной транзакцией
+    добавит системы, сохранённые за это время, и создаст триггеры. Если SQLite собран без R*Tree, индекса не будет.
+    """
+    if not has_spatial_index(db):
+        try:
+            db.execute(_CREATE_RTREE)
+        except sqlite3.OperationalError:
+            return True
+        db.commit()
+    elif db.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems_rtree_insert'").fetchone() is not None:
+        return True     # индекс уже создан и заполнен
+    last_id = db.execute("SELECT max(id) FROM systems_rtree").fetchone()[0]
+    cur = db.execute(
+        "INSERT INTO systems_rtree SELECT id, x, x, y, y, z, z FROM systems WHERE id > ? ORDER BY id LIMIT ?",
+        (last_id if last_id is not None else -1, MIGRATION_BATCH)
+    )
+    db.commit()
+    if cur.rowcount == MIGRATION_BATCH:
+        return False
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute(
+            "INSERT INTO systems_rtree SELECT id, x, x, y, y, z, z FROM systems WHERE id NOT IN (SELECT id FROM systems_rtree)"
+        )
+        for trigger in _rtree_triggers(db):
+            db.execute(trigger)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return True
+
+
+def _migrate_system_names(db: sqlite3.Connection) -> bool:
+    """4 -> 5: таблица систем без координат."""
+    db.execute(_CREATE_NAMES)
+    db.commit()
+    return True
+
+
+MIGRATIONS = Migrations(
+    "cache.db",
+    [_migrate_to_packed, _migrate_name_index, _migrate_aliases, _migrate_spatial_index, _migrate_system_names]
+)
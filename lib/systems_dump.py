@@ -0,0 +1,152 @@
+"""
+Массовое заполнение кэша систем (userdata/cache.db, см. `core.systems.SystemsCache`) из дампа систем.
+
+Поддерживаются выгрузки Spansh и EDSM с координатами ("systems with coordinates") и обрезанные
+региональные выборки из них: gzip (или обычный файл), по одной системе в JSON на строку. Строки-скобки
+массива и запятые в конце строк пропускаются, так что подходят и дампы в виде одного JSON-массива.
+
+    python -m lib.systems_dump systemsWithCoordinates.json.gz [--db userdata/cache.db]
+    python -m lib.systems_dump galaxy.json.gz --within 0 0 0 300 --within -9530 -910 19808 1500
+
+Прерванную загрузку можно продолжить, запустив команду повторно с тем же файлом: прогресс сохраняется
+в самой БД после каждой пачки. Запускайте при закрытом EDMC.
+"""
+import argparse
+import gzip
+import json
+import math
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+from lib import systems_db
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "userdata" / "cache.db"
+BATCH_SIZE = 50_000
+
+type Region = tuple[float, float, float, float]     # x, y, z, радиус
+
+
+def _open(path: Path) -> IO[str]:
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rt", encoding="utf-8") if gzipped else open(path, "r", encoding="utf-8")
+
+
+def _parse(line: str) -> tuple[int, str, float, float, float] | None:
+    """Строка дампа -> (sid, имя, x, y, z). None - строка не описывает систему с координатами."""
+    line = line.strip().rstrip(",")
+    if not line or line in ("[", "]"):
+        return None
+    try:
+        data = json.loads(line)
+        coords = data.get("coords", data)
+        return int(data["id64"]), data["name"], float(coords["x"]), float(coords["y"]), float(coords["z"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _in_regions(row: tuple[int, str, float, float, float], regions: list[Region]) -> bool:
+    return any(math.dist(row[2:], region[:3]) <= region[3] for region in regions)
+
+
+class _Seeder:
+    def __init__(self, db: sqlite3.Connection, dump_path: Path, regions: list[Region]):
+        self.db = db
+        self.dump_path = dump_path
+        self.regions = regions
+        self.source = f"{dump_path.resolve()}:{dump_path.stat().st_size}"   # тот же файл - можно продолжить
+        self.lines_done = 0
+        self.inserted = 0
+        self.skipped = 0
+
+    def prepare(self):
+        systems_db.create_schema(self.db)
+        if systems_db.MIGRATIONS.pending(self.db):
+            print("Migrating the cache to the current schema first.", file=sys.stderr)
+            systems_db.MIGRATIONS.run(self.db)
+        self.db.execute("CREATE TABLE IF NOT EXISTS seed_progress (source TEXT PRIMARY KEY, lines INTEGER NOT NULL)")
+        res = self.db.execute("SELECT lines FROM seed_progress WHERE source = ?", (self.source,)).fetchone()
+        self.lines_done = res[0] if res is not None else 0
+        # индексы дешевле построить один раз после загрузки, чем обновлять на каждую вставку
+        systems_db.drop_name_index(self.db)
+        systems_db.suspend_spatial_index(self.db)
+        self.db.execute("PRAGMA synchronous = OFF")     # только для этого соединения
+        self.db.commit()
+
+    def batches(self, f: IO[str]) -> Iterator[tuple[list[tuple[int, str, float, float, float]], bool]]:
+        """Пачки систем из ещё не загруженной части файла; второй элемент - True для последней пачки."""
+        batch = []
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= self.lines_done:
+                continue
+            row = _parse(line)
+            if row is None or (self.regions and not _in_regions(row, self.regions)):
+                self.skipped += 1
+            else:
+                batch.append(row)
+            if line_no % BATCH_SIZE == 0:
+                self.lines_done = line_no
+                yield batch, False
+                batch = []
+        yield batch, True
+
+    def write(self, batch: list[tuple[int, str, float, float, float]], last: bool):
+        cur = self.db.executemany("INSERT OR IGNORE INTO systems_packed VALUES (?,?,?,?,?)", (systems_db.pack(*row) for row in batch))
+        self.inserted += cur.rowcount
+        if last:
+            self.db.execute("DELETE FROM seed_progress WHERE source = ?", (self.source,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO seed_progress VALUES (?,?)", (self.source, self.lines_done))
+        self.db.commit()
+
+    def finish(self):
+        systems_db.create_name_index(self.db)
+        systems_db.resume_spatial_index(self.db)
+        self.db.commit()
+
+
+def seed(db_path: Path, dump_path: Path, regions: list[Region] | None = None, progress: IO[str] | None = None) -> dict:
+    """
+    Загружает системы из *dump_path* в кэш *db_path*. Уже известные системы не перезаписываются.
+    *regions* - необязательный список сфер (x, y, z, радиус): тогда загружаются только системы внутри них.
+    Возвращает статистику загрузки.
+    """
+    start = time.perf_counter()
+    db = sqlite3.connect(db_path)
+    seeder = _Seeder(db, dump_path, regions or [])
+    try:
+        seeder.prepare()
+        if seeder.lines_done and progress is not None:
+            print(f"Resuming after line {seeder.lines_done}.", file=progress)
+        with _open(dump_path) as f:
+            for batch, last in seeder.batches(f):
+                seeder.write(batch, last)
+                if progress is not None and not last:
+                    print(f"{seeder.lines_done} lines read, {seeder.inserted} systems added.", file=progress)
+    finally:
+        seeder.finish()
+        db.close()
+    return {"inserted": seeder.inserted, "skipped": seeder.skipped, "time": time.perf_counter() - start}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m lib.systems_dump", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("dump", type=Path, help="systems dump, JSON lines, optionally gzipped")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="cache database (default: %(default)s)")
+    parser.add_argument(
+        "--within", type=float, nargs=4, action="append", metavar=("X", "Y", "Z", "R"),
+        help="only load systems within R ly of (X, Y, Z); can be repeated"
+    )
+    args = parser.parse_args(argv)
+
+    res = seed(args.db, args.dump, args.within, progress=sys.stderr)
+    print(f"Done in {res['time']:.1f} s: {res['inserted']} systems added, {res['skipped']} lines skipped.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
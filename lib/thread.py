@@ -11,13 +11,17 @@ class BasicThread(threading.Thread):
     дополнительными методами для управления
     пулом потоков и с возможностью их останова.
     """
-    pool = []
+    pool: list['BasicThread'] = []
+    _pool_lock = threading.Lock()
     STOP_ALL = False
     SLEEP_DURATION = 0.25
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        BasicThread.pool.append(self)
+        with BasicThread._pool_lock:
+            # завершившиеся потоки не нужны ни stop_all, ни join_all - не будем копить их всю сессию
+            BasicThread.pool[:] = [x for x in BasicThread.pool if x.ident is None or x.is_alive()]
+            BasicThread.pool.append(self)
         # флаг для сигнализирования потоку, что ему пора бы остановиться
         self.STOP: bool = False
 
@@ -31,7 +35,9 @@ class BasicThread(threading.Thread):
     @classmethod
     def stop_all(cls):
         cls.STOP_ALL = True
-        for thread in cls.pool:
+        with BasicThread._pool_lock:
+            pool = list(cls.pool)
+        for thread in pool:
             thread.STOP = True
 
     @classmethod
@@ -42,7 +48,8 @@ class BasicThread(threading.Thread):
 
     @classmethod
     def list_alive(cls):
-        return [x for x in cls.pool if x.is_alive()]
+        with BasicThread._pool_lock:
+            return [x for x in cls.pool if x.is_alive()]
 
 
 class Thread(BasicThread):
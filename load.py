@@ -14,13 +14,16 @@ import tempfile
 import threading
 import tkinter as tk
 import zipfile
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Mapping
+from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import StrEnum
+from itertools import islice
 from pathlib import Path
-from queue import Queue
+from queue import Empty, Queue
 from semantic_version import Version
-from time import sleep
+from time import monotonic, sleep
 from tkinter import ttk
 
 import myNotebook as nb  # pyright: ignore[reportMissingImports]
@@ -46,6 +49,173 @@ if not logger.hasHandlers():
     logger.addHandler(logger_channel)
 
 
+class EventQueue(Queue):
+    """
+    Очередь ивентов с ограниченным расходом памяти.
+
+    EDMC продолжает присылать ивенты, пока версия плагина ещё не загружена (например, во время скачивания обновления)
+    или когда обработчик не успевает за игрой. Чтобы очередь не росла в памяти бесконечно, при превышении `memory_limit`
+    самые старые записи сбрасываются в файл в userdata (только дозапись) и затем отдаются обратно в исходном порядке:
+    в файле всегда лежит начало очереди, в памяти - её конец.
+
+    Пока путь к файлу не задан (до `plugin_start3`) или сброс приостановлен (см. `suspend_spill`), записи копятся в памяти.
+    """
+    MEMORY_LIMIT = 2000
+    REPLAY_BATCH = 200
+    SPILL_FILE_NAME = "event_queue.spill.jsonl"
+
+    def __init__(self, memory_limit: int = MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        super().__init__()
+
+    def _init(self, maxsize: int):
+        self._memory: deque[tuple[float, dict]] = deque()     # (время постановки в очередь, запись)
+        self._replay: deque[tuple[float, dict]] = deque()     # записи, уже прочитанные из файла
+        self._replay_state: dict | None = None                 # последний прочитанный из файла state EDMC
+        self._spill_lock = threading.Lock()
+        self._spill_offset = 0      # позиция чтения в файле
+        self._spilled = 0           # записей в файле, ещё не отданных обработчику (включая _replay)
+        self.spill_path: Path | None = None
+        # статистика
+        self.high_water_mark = 0
+        self.total_spilled = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def set_spill_path(self, path: Path):
+        with self.mutex:
+            if path.exists() and self._spilled == 0:
+                # остатки от прошлого запуска EDMC: ивенты прошлой сессии применять уже поздно
+                logger.warning(f"Found a stale event queue spill file ({path}), removing.")
+                path.unlink(missing_ok=True)
+            self.spill_path = path
+
+    @contextmanager
+    def suspend_spill(self):
+        """На время замены файлов плагина новые записи копятся в памяти, а файл сброса не трогается."""
+        with self._spill_lock:
+            yield
+
+    def stats(self) -> dict:
+        with self.mutex:
+            return {
+                "depth": self._qsize(),
+                "spilled": self._spilled,
+                "high_water_mark": self.high_water_mark,
+                "total_spilled": self.total_spilled,
+                "last_lag": self.last_lag,
+                "max_lag": self.max_lag,
+            }
+
+    def _qsize(self) -> int:
+        return len(self._memory) + self._spilled
+
+    def _put(self, item: dict):
+        self._memory.append((monotonic(), item))
+        if len(self._memory) > self.memory_limit and self.spill_path is not None:
+            # put вызывается в главном потоке EDMC, так что ждать окончания замены файлов мы не будем
+            if self._spill_lock.acquire(blocking=False):
+                try:
+                    self.__spill()
+                finally:
+                    self._spill_lock.release()
+        depth = self._qsize()
+        if depth > self.high_water_mark:
+            self.high_water_mark = depth
+
+    def _get(self) -> dict:
+        if self._spilled:
+            if not self._replay:
+                self.__load_spilled()
+        if self._replay:
+            enqueued_at, item = self._replay.popleft()
+            self._spilled -= 1
+            if self._spilled == 0:
+                logger.info(f"All spilled event queue entries have been replayed (total spilled: {self.total_spilled}).")
+                self.__reset_spill_file()
+        elif self._memory:
+            enqueued_at, item = self._memory.popleft()
+        else:
+            # файл сброса оказался битым, и отдавать больше нечего
+            raise Empty()
+        self.last_lag = monotonic() - enqueued_at
+        if self.last_lag > self.max_lag:
+            self.max_lag = self.last_lag
+        return item
+
+    def __spill(self):
+        """Сбрасывает в файл старшую половину записей из памяти."""
+        count = len(self._memory) - self.memory_limit // 2
+        if self._spilled == 0:
+            logger.warning(
+                f"Event queue exceeded {self.memory_limit} entries in memory. Spilling the oldest ones to {self.spill_path}."
+            )
+        lines: list[str] = []
+        last_state = None
+        for enqueued_at, item in islice(self._memory, count):
+            data = item["data"]
+            if item["type"] == "journal_entry":
+                # EDMC передаёт с каждой записью свою копию state, но между записями он обычно не меняется -
+                # пишем его, только когда он отличается от предыдущего
+                if data[-1] != last_state:
+                    last_state = data[-1]
+                    lines.append(json.dumps({"state": last_state}, default=self.__json_default))
+                data = data[:-1]
+            lines.append(json.dumps({"t": enqueued_at, "type": item["type"], "data": data}, default=self.__json_default))
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)   # pyright: ignore[reportOptionalMemberAccess]
+            with open(self.spill_path, "a", encoding="utf-8") as f:     # pyright: ignore[reportArgumentType]
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.error("Couldn't spill event queue entries to disk, keeping them in memory.", exc_info=e)
+            return
+        for _ in range(count):
+            self._memory.popleft()
+        self._spilled += count
+        self.total_spilled += count
+
+    def __load_spilled(self):
+        try:
+            with open(self.spill_path, "rb") as f:     # pyright: ignore[reportArgumentType]
+                f.seek(self._spill_offset)
+                while len(self._replay) < self.REPLAY_BATCH and (line := f.readline()):
+                    record = json.loads(line)
+                    if "state" in record:
+                        self._replay_state = record["state"]
+                        continue
+                    data = record["data"]
+                    if record["type"] == "journal_entry":
+                        data.append(self._replay_state)
+                    self._replay.append((record["t"], {"type": record["type"], "data": tuple(data)}))
+                self._spill_offset = f.tell()
+        except (OSError, ValueError) as e:
+            logger.error(f"Couldn't read spilled event queue entries. {self._spilled} entries are lost.", exc_info=e)
+            self.__reset_spill_file()
+            return
+        if not self._replay:
+            logger.error(f"Event queue spill file ended unexpectedly. {self._spilled} entries are lost.")
+            self.__reset_spill_file()
+
+    def __reset_spill_file(self):
+        self._spilled = 0
+        self._spill_offset = 0
+        self._replay.clear()
+        self._replay_state = None
+        try:
+            self.spill_path.unlink(missing_ok=True)    # pyright: ignore[reportOptionalMemberAccess]
+        except OSError as e:
+            logger.error("Couldn't remove the event queue spill file.", exc_info=e)
+
+    @staticmethod
+    def __json_default(obj):
+        # в state EDMC попадаются множества (например, Friends), а данные CAPI приходят в виде UserDict
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        return str(obj)
+
+
 @dataclass
 class BasicContext:
     """
@@ -61,7 +231,7 @@ class BasicContext:
     """
     plugin_name: str = "Triumvirate"
     edmc_version: Version = appversion() if callable(appversion) else Version(appversion)  # pyright: ignore[reportAssignmentType]
-    event_queue: Queue[dict] = Queue()
+    event_queue: EventQueue = EventQueue()
     _shutdown: bool = False
 
     # инициализируется в plugin_start3
@@ -337,17 +507,19 @@ class Updater:
         new_ver_path = next(tempdir.iterdir())  # гитхаб оборачивает файлы в отдельную директорию
         loadpy_was_edited = self.__files_differ(Path(new_ver_path, "load.py"), Path(context.plugin_dir, "load.py"))
 
-        # копируем userdata, чтобы человеки не ругались, что у них миссии между перезапусками трутся
-        logger.info("Copying `userdata`...")
-        try:
-            shutil.copytree(Path(context.plugin_dir, "userdata"), Path(new_ver_path, "userdata"), dirs_exist_ok=True)
-        except FileNotFoundError:
-            logger.warning("Directory `userdata` not found, skipping.")
-
-        # сносим старую версию и копируем на её место новую, удаляем временные файлы
-        logger.info("Replacing plugin files...")
-        shutil.rmtree(context.plugin_dir, ignore_errors=True)
-        shutil.copytree(new_ver_path, context.plugin_dir, dirs_exist_ok=True)
+        # пока мы переносим userdata, очередь ивентов не должна дописывать туда свой файл сброса
+        with context.event_queue.suspend_spill():
+            # копируем userdata, чтобы человеки не ругались, что у них миссии между перезапусками трутся
+            logger.info("Copying `userdata`...")
+            try:
+                shutil.copytree(Path(context.plugin_dir, "userdata"), Path(new_ver_path, "userdata"), dirs_exist_ok=True)
+            except FileNotFoundError:
+                logger.warning("Directory `userdata` not found, skipping.")
+
+            # сносим старую версию и копируем на её место новую, удаляем временные файлы
+            logger.info("Replacing plugin files...")
+            shutil.rmtree(context.plugin_dir, ignore_errors=True)
+            shutil.copytree(new_ver_path, context.plugin_dir, dirs_exist_ok=True)
         shutil.rmtree(tempdir)
 
         # обновляем запись о локальной версии
@@ -561,6 +733,7 @@ def plugin_start3(plugin_dir_str: str) -> str:
     if context.edmc_version < Version("5.11.0"):
         raise EnvironmentError(_translate("This plugin requires EDMC version 5.11.0 or later."))
     context.plugin_dir = Path(plugin_dir_str)
+    context.event_queue.set_spill_path(context.plugin_dir / "userdata" / EventQueue.SPILL_FILE_NAME)
     _Translation.setup()
     _Translation.update_active_language(edmc_config.get_str("language"))
     return context.plugin_name
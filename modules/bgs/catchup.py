@@ -0,0 +1,162 @@
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config import config as edmc_config  # type: ignore
+
+from core.context import GameState, PluginContext
+from core.profiler import hook_profiler
+from lib import events
+from lib.module import EventIndex
+
+
+if TYPE_CHECKING:
+    from .core import BGSCore, BGSReport
+    from .submodule_base import Submodule
+
+
+class JournalCatchup:
+    """
+    Догрузка истории: передаёт субмодулям БГС ивенты из сессий, прошедших без EDMC или без плагина.
+
+    Плагин запоминает время последнего обработанного ивента (водяной знак, хранится в БД модуля).
+    Перед первым живым ивентом БГС журналы игры просматриваются с этого момента, и пропущенные ивенты
+    передаются субмодулям с `catch_up = True`. При этом:
+    - `GameState` в этом потоке подменяется снимком, восстановленным по самим журналам;
+    - уведомления не выводятся, а отчёты копятся и отправляются одной пачкой после догрузки;
+    - строки, время которых не позже водяного знака или не раньше первого живого ивента, не передаются,
+      поэтому одна и та же строка журнала не попадёт в отчёты дважды.
+
+    При самом первом запуске история не догружается: водяной знак просто выставляется на текущий момент.
+    """
+    # ивенты до водяного знака, которые передаются субмодулям для восстановления их состояния, но ничего не отправляют
+    CONTEXT_EVENTS = frozenset({"Docked", "Undocked"})
+
+    def __init__(self, core: 'BGSCore', submodules: list['Submodule']):
+        self._core = core
+        self._index = EventIndex(submodules)
+        self.events = frozenset().union(*(subm.events or () for subm in submodules))
+        self.pending = bool(submodules)
+        self.reports: list['BGSReport'] | None = None     # не None только во время догрузки
+        self._core.database.execute(
+            "CREATE TABLE IF NOT EXISTS journal_watermark (id INTEGER PRIMARY KEY CHECK (id = 0), timestamp TEXT NOT NULL)"
+        )
+        res = self._core.database.execute("SELECT timestamp FROM journal_watermark WHERE id = 0").fetchone()
+        self.watermark: str | None = res[0] if res is not None else None
+
+
+    def advance(self, event: str, timestamp: str):
+        """Сдвигает водяной знак после обработки живого ивента."""
+        if event in self.events and (self.watermark is None or timestamp > self.watermark):
+            self._set_watermark(timestamp)
+
+
+    def _set_watermark(self, timestamp: str):
+        self.watermark = timestamp
+        self._core.database.execute("INSERT OR REPLACE INTO journal_watermark (id, timestamp) VALUES (0, ?)", (timestamp,))
+        self._core.database.commit()
+
+
+    def run(self, until: str):
+        """Догружает ивенты между водяным знаком и *until* (время первого живого ивента)."""
+        self.pending = False
+        if self.watermark is None:
+            PluginContext.logger.debug(f"No journal watermark yet, history catch-up skipped. Watermark set to {until}.")
+            self._set_watermark(until)
+            return
+        journal_dir = Path(edmc_config.get_str("journaldir") or edmc_config.default_journal_dir)
+        PluginContext.logger.info(f"Catching up on journal events from {self.watermark} to {until} in {journal_dir}.")
+
+        self.reports = []
+        processed = 0
+        state = GameState.snapshot()
+        previous_snapshot = GameState.use_snapshot(state)
+        try:
+            with PluginContext.notifier.muted():
+                for entry, record in self._read_journals(journal_dir, until):
+                    self._update_state(state, entry, record)
+                    event = entry["event"]
+                    if entry["timestamp"] <= self.watermark and event not in self.CONTEXT_EVENTS:
+                        continue
+                    for subm in self._index[event]:
+                        try:
+                            with hook_profiler.measure(subm, "on_journal_entry", event):
+                                subm.on_journal_entry(entry, record)
+                        except Exception as e:
+                            PluginContext.logger.error(f"Exception in BGS submodule {subm} while catching up:", exc_info=e)
+                    processed += 1
+        finally:
+            GameState.use_snapshot(previous_snapshot)
+            reports, self.reports = self.reports, None
+
+        PluginContext.logger.info(f"Journal catch-up done: {processed} events processed, {len(reports)} BGS reports collected.")
+        if reports:
+            self._core.filter.process_bgs_reports(reports)
+        self._set_watermark(until)
+
+
+    def _read_journals(self, journal_dir: Path, until: str) -> Iterator[tuple[dict, events.JournalEvent | None]]:
+        """
+        Записи журналов, изменённых после водяного знака, по порядку; только интересные субмодулям
+        и нужные для восстановления `GameState`. Каждый файл - отдельная сессия игры, он читается с начала
+        (с ивента Fileheader), чтобы знать командира и систему.
+        """
+        since = datetime.fromisoformat(self.watermark).timestamp()  # pyright: ignore[reportArgumentType]
+        try:
+            paths = [p for p in journal_dir.glob("Journal.*.log") if p.stat().st_mtime >= since]
+        except OSError as e:
+            PluginContext.logger.error(f"Couldn't list journal files in {journal_dir}.", exc_info=e)
+            return
+        paths.sort(key=lambda p: (p.stat().st_mtime, p.name))
+
+        for path in paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            PluginContext.logger.warning(f"Skipping a malformed line in {path.name}.")
+                            continue
+                        event, timestamp = entry.get("event"), entry.get("timestamp")
+                        if event is None or timestamp is None:
+                            continue
+                        if timestamp >= until:
+                            return      # дальше - то, что придёт (или уже пришло) вживую
+                        if event not in _STATE_EVENTS and event not in self.events:
+                            continue
+                        try:
+                            record = events.decode(entry)
+                        except (KeyError, TypeError, ValueError):
+                            record = None
+                        yield entry, record
+            except OSError as e:
+                PluginContext.logger.error(f"Couldn't read journal file {path.name}.", exc_info=e)
+
+
+    @staticmethod
+    def _update_state(state: dict, entry: dict, record: events.JournalEvent | None):
+        match entry["event"]:
+            case "Fileheader":
+                state.update(cmdr=None, system=None, system_address=None, system_coords=None, station=None)
+            case "Commander":
+                state["cmdr"] = entry.get("Name")
+            case "LoadGame":
+                state["cmdr"] = entry.get("Commander")
+            case "Undocked":
+                state["station"] = None
+        if isinstance(record, (events.FSDJump, events.Location)):
+            state.update(system=record.star_system, system_address=record.system_address, system_coords=record.star_pos)
+            state["station"] = record.station_name if isinstance(record, events.Location) and record.docked else None
+        elif isinstance(record, events.Docked):
+            state["station"] = record.station_name
+
+
+# ивенты, по которым восстанавливается GameState
+_STATE_EVENTS = frozenset({
+    "Fileheader", "Commander", "LoadGame", "Location", "FSDJump", "CarrierJump", "Docked", "Undocked"
+})
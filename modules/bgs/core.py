@@ -8,12 +8,14 @@ from threading import Lock
 from typing import Any
 
 from core.context import PluginContext
+from core.profiler import hook_profiler
+from core.rate_limit import limited_get
 from lib.journal import JournalEntry
-from lib.module import Module
+from lib.module import EventIndex, Module
 from lib.thread import Thread
-from modules.legacy import GoogleReporter
 
 from . import submodule_base
+from .catchup import JournalCatchup
 
 
 # isort: off
@@ -27,7 +29,8 @@ class BGSReport:
     submodule_src: str
     url: str
     params: dict
-    affected_systems: list[str]
+    affected_systems: list[str] | None     # None - отчёт отправляется без проверки систем
+    dedup_key: str | None = None            # см. `Submodule.send_bgs_report`
 
 
 class BgsUiFrame(tk.Frame):
@@ -79,7 +82,7 @@ class FilterUpdater(Thread):
     def fetch(self):
         PluginContext.logger.debug("Starting BGS systems data updating process...")
         try:
-            resp = requests.get(self.FETCH_URL)
+            resp = limited_get(self.FETCH_URL)
             resp.raise_for_status()
         except requests.RequestException as e:
             PluginContext.logger.error("Couldn't fetch the systems list. Exception info:", exc_info=e)
@@ -100,31 +103,55 @@ class Filter:
         self.updater.start()
 
     def process_bgs_report(self, report: BGSReport):
+        if self._accept(report):
+            PluginContext.logger.debug(f"[{report.submodule_src}] Sending a BGS report.")
+            PluginContext.outbox.post_form(report.url, report.params, dedup_key=report.dedup_key)
+
+    def process_bgs_reports(self, reports: list[BGSReport]):
+        """Проверяет пачку отчётов и ставит подходящие в очередь отправки одной записью (см. `Outbox.post_forms`)."""
+        accepted = [report for report in reports if self._accept(report)]
+        if accepted:
+            PluginContext.logger.debug(f"Sending {len(accepted)} BGS reports in bulk.")
+            # ключ повторов общий на пачку, поэтому группируем по нему
+            batches: dict[str | None, list[tuple[str, dict]]] = dict()
+            for report in accepted:
+                batches.setdefault(report.dedup_key, []).append((report.url, report.params))
+            for dedup_key, batch in batches.items():
+                PluginContext.outbox.post_forms(batch, dedup_key=dedup_key)
+
+    def _accept(self, report: BGSReport) -> bool:
+        """
+        Проверяет, затрагивает ли отчёт отслеживаемые системы.
+        Если списка систем ещё нет, откладывает отчёт до его получения и возвращает False.
+        """
+        if report.affected_systems is None:
+            return True
         if not self._tracked_systems:
             PluginContext.logger.debug(
                 f"[{report.submodule_src}] BGS report check cannot be done: no tracked systems data yet. "
                 "Saving the report for a delayed check."
             )
             self.bgs_reports_queue.put(report)
-        else:
-            with self.__threadlock:
-                if not any(s in self._tracked_systems for s in report.affected_systems):
-                    PluginContext.logger.debug(
-                        f"[{report.submodule_src}] None of the provided affected systems "
-                        f"({', '.join(report.affected_systems)}) "
-                        "are tracked, ignoring this BGS report."
-                    )
-                    return
-                PluginContext.logger.debug(f"[{report.submodule_src}] Sending a BGS report.")
-                GoogleReporter(report.url, report.params).start()
+            return False
+        with self.__threadlock:
+            if not any(s in self._tracked_systems for s in report.affected_systems):
+                PluginContext.logger.debug(
+                    f"[{report.submodule_src}] None of the provided affected systems "
+                    f"({', '.join(report.affected_systems)}) "
+                    "are tracked, ignoring this BGS report."
+                )
+                return False
+        return True
 
     def on_data_update(self, systems: list[str]):
         with self.__threadlock:
             self._tracked_systems = set(systems)
         if not self.bgs_reports_queue.empty():
             PluginContext.logger.debug("Processing delayed BGS report checks:")
+            delayed = []
             while not self.bgs_reports_queue.empty():
-                self.process_bgs_report(self.bgs_reports_queue.get())
+                delayed.append(self.bgs_reports_queue.get())
+            self.process_bgs_reports(delayed)
 
 
 class BGSCore(Module):
@@ -140,6 +167,13 @@ class BGSCore(Module):
         self.ui_frame = BgsUiFrame(parent, row, 0)
         submodule_base.init_submodules(self)
         self.submodules = submodule_base.get_submodules()
+        self._event_index = EventIndex(self.submodules)
+        self.catchup = JournalCatchup(self, [subm for subm in self.submodules if subm.catch_up])
+        # сам модуль подписывается на объединение ивентов своих субмодулей
+        if any(subm.events is None for subm in self.submodules):
+            self.events = None
+        else:
+            self.events = frozenset().union(*(subm.events for subm in self.submodules))
         if self.submodules:
             PluginContext.logger.info(
                 f"{len(self.submodules)} submodules initiated: " + ', '.join(s.__class__.__qualname__ for s in self.submodules)
@@ -155,32 +189,49 @@ class BGSCore(Module):
         self.database.close()
 
     def on_journal_entry(self, entry: JournalEntry):
-        for subm in self.submodules:
+        if self.catchup.pending:
+            self.catchup.run(until=entry.data["timestamp"])
+        for subm in self._event_index[entry.data["event"]]:
             try:
-                subm.on_journal_entry(entry.data)
+                with hook_profiler.measure(subm, "on_journal_entry", entry.data["event"]):
+                    subm.on_journal_entry(entry.data, entry.record)
             except Exception as e:
                 PluginContext.logger.error(
                     f"Exception in BGS submodule {subm} while processing a journal entry:",
                     exc_info=e
                 )
+        self.catchup.advance(entry.data["event"], entry.data["timestamp"])
 
     def on_dashboard_entry(self, cmdr: str, is_beta: bool, entry: dict):
         for subm in self.submodules:
             try:
-                subm.on_dashboard_entry()
+                with hook_profiler.measure(subm, "on_dashboard_entry", "Status"):
+                    subm.on_dashboard_entry()
             except Exception as e:
                 PluginContext.logger.error(
                     f"Exception in BGS submodule {subm} while processing a dashboard entry:",
                     exc_info=e
                 )
 
-    def _send_data(self, url: str, params: dict, affected_systems: str | list[str], submodule_src: str):
+    def _send_data(
+        self,
+        url: str,
+        params: dict,
+        affected_systems: str | list[str] | None,
+        dedup_key: str | None = None,
+        *,
+        submodule_src: str
+    ):
         """
         Метод для субмодулей для отправки данных через фильтр.
         Субмодули используют его через обёртку в своём метаклассе; submodule_src задаётся там же
         (см. `SubmoduleMeta.init_submodules`)
+        Во время догрузки истории отчёты копятся и отправляются одной пачкой.
         """
         if isinstance(affected_systems, str):
             affected_systems = [affected_systems]
-        report = BGSReport(submodule_src, url, params, affected_systems)
-        self.filter.process_bgs_report(report)
+        report = BGSReport(submodule_src, url, params, affected_systems, dedup_key)
+        if self.catchup.reports is not None:
+            self.catchup.reports.append(report)
+        else:
+            self.filter.process_bgs_report(report)
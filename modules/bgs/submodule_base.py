@@ -4,6 +4,8 @@ from typing import TYPE_CHECKING, final
 
 
 if TYPE_CHECKING:
+    from lib.events import JournalEvent
+
     from .core import BGSCore
 
 
@@ -37,12 +39,23 @@ class SubmoduleMeta(ABCMeta):
 class Submodule(ABC, metaclass=SubmoduleMeta):
     core: 'BGSCore'
     _ui_row: int
-
-    def on_journal_entry(self, entry: dict):
+    events: frozenset[str] | None = None
+    """
+    Названия ивентов, которые нужно передавать в `on_journal_entry`.
+    None - субмодуль получает все записи из логов.
+    """
+    catch_up: bool = False
+    """
+    True - субмодуль получает и ивенты из сессий, прошедших без плагина (см. `JournalCatchup`).
+    Такой субмодуль не должен трогать UI и обязан отправлять отчёты только через `send_bgs_report`.
+    """
+
+    def on_journal_entry(self, entry: dict, record: 'JournalEvent | None'):
         """
         Вызывается при появлении новой записи в логах.
         В отличие от Module.on_journal_entry, принимает запись "как есть"
         и должен полагаться на данные контекста для получения дополнительной информации.
+        Для частых ивентов *record* содержит уже разобранную запись (см. `lib.events`), иначе None.
         """
 
     def on_dashboard_entry(self):
@@ -58,9 +71,13 @@ class Submodule(ABC, metaclass=SubmoduleMeta):
         """
 
     @final
-    def send_bgs_report(self, url: str, params: dict, affected_systems: str | list[str]):
+    def send_bgs_report(
+        self, url: str, params: dict, affected_systems: str | list[str] | None, dedup_key: str | None = None
+    ):
         """
-        Метод для отправки данных БГС.
+        Метод для отправки данных БГС. Если *affected_systems* - None, отчёт не проверяется фильтром систем.
+        *dedup_key* - что означает отчёт (см. `core.outbox`): такой же отчёт с тем же ключом, например повторённый
+        после перезахода в игру, будет отброшен. Для субмодулей с `catch_up`.
 
         Субмодули **НЕ ДОЛЖНЫ** переопределять этот метод! Он реализован
         на уровне метакласса - см. `SubmoduleMeta.init_submodules`
@@ -6,6 +6,7 @@ from tkinter import ttk
 from typing import TYPE_CHECKING, Any, Literal
 
 from core.context import GameState, PluginContext
+from lib.events import FactionKillBond, JournalEvent, Music
 from modules.bgs.submodule_base import Submodule
 from modules.legacy import URL_GOOGLE
 
@@ -359,6 +360,11 @@ class ConflictInfoFrame(tk.Frame):
 
 
 class CZTracker(Submodule):
+    events = frozenset({
+        "LoadGame", "SupercruiseDestinationDrop", "ApproachSettlement", "DropshipDeploy", "FactionKillBond",
+        "StartJump", "BookDropship", "BookTaxi", "Music", "Shutdown", "Died", "SelfDestruct",
+    })
+
     def __init__(self):
         self.__gui = ConflictInfoFrame(self.core.ui_frame, self._ui_row)
         self.conflict: Conflict | None = None
@@ -366,18 +372,21 @@ class CZTracker(Submodule):
         self._on_foot_died: bool | None = None
 
 
-    def on_journal_entry(self, entry: dict):
+    def on_journal_entry(self, entry: dict, record: JournalEvent | None):
         event = entry["event"]
         match event:
             case "LoadGame": self.gamemode = entry["GameMode"]
             case "SupercruiseDestinationDrop": self.on_supercruise_drop(entry)
             case "ApproachSettlement": self.on_settlement_approached(entry)
             case "DropshipDeploy": self.on_dropship_deploy(entry)
-            case "FactionKillBond": self.on_kill(entry)
+            case "FactionKillBond" if isinstance(record, FactionKillBond): self.on_kill(record)
             case "StartJump": self.end_conflict(entry)
             case "BookDropship" | "BookTaxi": self.on_book_dropship(entry)
-            case "Music": self.on_music_event(entry)
+            case "Music" if isinstance(record, Music): self.on_music_event(record)
             case "Shutdown" | "Died" | "SelfDestruct": self.end_conflict(entry, early=True)
+            # ивент не удалось разобрать (см. `JournalProcessor._decode`)
+            case "FactionKillBond" | "Music":
+                PluginContext.logger.warning(f"[CZTracker] Skipping the undecoded {event} event.")
 
 
     def on_dashboard_entry(self):
@@ -441,12 +450,12 @@ class CZTracker(Submodule):
             self.__gui.conflict_started(self.conflict)
 
 
-    def on_kill(self, entry: dict):
+    def on_kill(self, record: FactionKillBond):
         if self.conflict is None:
             return
-        self.conflict.ally_faction = entry["AwardingFaction"]
-        self.conflict.enemy_faction = entry["VictimFaction"]
-        reward = entry["Reward"]
+        self.conflict.ally_faction = record.awarding_faction
+        self.conflict.enemy_faction = record.victim_faction
+        reward = record.reward
         self.conflict.bonds += reward
         self.conflict.kills += 1
         PluginContext.logger.debug(
@@ -476,17 +485,17 @@ class CZTracker(Submodule):
                 self.end_conflict(entry)
 
 
-    def on_music_event(self, entry: dict):
-        if self.conflict is None or entry["MusicTrack"] != "MainMenu":
+    def on_music_event(self, record: Music):
+        if self.conflict is None or record.music_track != "MainMenu":
             return
         # в космических это досрочный выход
         # в пеших - возможный релог после завершения
         if self.conflict.conflict_type == "Space":
             PluginContext.logger.debug("Detected exiting to main menu, conflict ended prematurely.")
-            self.end_conflict(entry, early=True)
+            self.end_conflict(record.raw, early=True)
         else:
             PluginContext.logger.debug("Detected exiting to main menu, assuming relog. Conflict ended.")
-            self.end_conflict(entry, early=False)
+            self.end_conflict(record.raw, early=False)
 
 
     def end_conflict(self, entry: dict, early: bool = False):
@@ -1,16 +1,20 @@
 from core.context import GameState, PluginContext
+from lib.events import Docked, JournalEvent, Location
 from modules.bgs.submodule_base import Submodule
 from modules.legacy import URL_GOOGLE
 
 
 class ExpDataTracker(Submodule):
+    events = frozenset({"Docked", "Undocked", "Location", "SellExplorationData"})
+    catch_up = True
+
     def __init__(self):
         self.station_owner: str | None = None
 
-    def on_journal_entry(self, entry: dict):
+    def on_journal_entry(self, entry: dict, record: JournalEvent | None):
         event = entry["event"]
-        if event == "Docked" or (event == "Location" and entry["Docked"] is True):
-            self.station_owner = entry["StationFaction"]["Name"]
+        if isinstance(record, Docked) or (isinstance(record, Location) and record.docked):
+            self.station_owner = record.station_faction
             return
         elif event == "Undocked" or (event == "Location" and entry["Docked"] is False):
             self.station_owner = None
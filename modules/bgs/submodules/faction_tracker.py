@@ -7,9 +7,10 @@ from threading import Lock
 from typing import Any, Literal
 
 from core.context import GameState, PluginContext
+from core.rate_limit import limited_get
+from lib.events import FSDJump, JournalEvent, Location
 from lib.thread import Thread
 from modules.bgs.submodule_base import Submodule
-from modules.legacy import GoogleReporter
 
 
 FactionState = Literal['Present', 'Pending retreat', 'Retreated', 'Conflict']
@@ -48,7 +49,7 @@ class FactionDataFetcher(Thread):
     def fetch_data(self):
         PluginContext.logger.debug("Updating BGS factions data...")
         try:
-            resp = requests.get(self.REMOTE_DATA_URL, timeout=15)
+            resp = limited_get(self.REMOTE_DATA_URL, timeout=15)
             resp.raise_for_status()
         except requests.RequestException as e:
             PluginContext.logger.error("Couldn't fetch factions data. Exception info:", exc_info=e)
@@ -70,6 +71,8 @@ class FactionTracker(Submodule):
     Следит за состоянием отслеживаемых фракций в их системах,
     сообщает при обнаружении изменений.
     """
+    events = frozenset({"Location", "FSDJump", "CarrierJump"})
+    catch_up = True
 
     def __init__(self):
         self.data: dict[str, dict[str, FactionSystemData]] = dict()      # {faction: {system: FSD}}
@@ -79,8 +82,8 @@ class FactionTracker(Submodule):
         self._updater.start()
 
 
-    def on_journal_entry(self, entry: dict):
-        if entry["event"] not in ("Location", "FSDJump", "CarrierJump"):
+    def on_journal_entry(self, entry: dict, record: JournalEvent | None):
+        if not isinstance(record, (FSDJump, Location)):
             return
         if not self.data:
             PluginContext.logger.debug(
@@ -184,7 +187,10 @@ class FactionTracker(Submodule):
             "entry.2070019885": new_data.conflict_stake,
             "entry.1471364504": new_data.conflict_stake_enemy
         }
-        GoogleReporter(url, params).start()
+        # отслеживаемые фракции могут оказаться и в системах, которых ещё нет в фильтре;
+        # после перезахода в игру или повторного Location те же данные о фракции придут снова - их отбросит outbox
+        dedup_key = f"faction {new_data.faction} {new_data.system} {new_data.state} {new_data.influence}"
+        self.send_bgs_report(url, params, None, dedup_key)
 
 
     def on_data_update(self, new_data: list[list[str]]):
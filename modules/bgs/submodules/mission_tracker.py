@@ -1,8 +1,11 @@
+import functools
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from enum import StrEnum
 
 from core.context import GameState, PluginContext
+from core.systems import SystemData
+from lib.events import JournalEvent, MissionCompleted
 from modules.bgs.submodule_base import Submodule
 from modules.legacy import URL_GOOGLE
 
@@ -31,6 +34,9 @@ class Mission:
 
 
 class MissionTracker(Submodule):
+    events = frozenset({"Missions", "MissionAccepted", "MissionCompleted", "MissionAbandoned", "MissionFailed"})
+    catch_up = True
+
     def __init__(self):
         self.core.database.execute("""
             CREATE TABLE IF NOT EXISTS missions(
@@ -48,13 +54,16 @@ class MissionTracker(Submodule):
         """)
 
 
-    def on_journal_entry(self, entry):
+    def on_journal_entry(self, entry: dict, record: JournalEvent | None):
         match entry["event"]:
             case "Missions": self.on_missions_event(entry)
             case "MissionAccepted": self.mission_accepted(entry)
-            case "MissionCompleted": self.mission_completed(entry)
+            case "MissionCompleted" if isinstance(record, MissionCompleted): self.mission_completed(record)
             case "MissionAbandoned": self.mission_abandoned(entry)
             case "MissionFailed": self.mission_failed(entry)
+            # ивент не удалось разобрать (см. `JournalProcessor._decode`)
+            case "MissionCompleted":
+                PluginContext.logger.warning(f"[MissionTracker] Skipping the undecoded MissionCompleted event: {entry}")
 
 
     def on_close(self):
@@ -83,15 +92,15 @@ class MissionTracker(Submodule):
         PluginContext.logger.debug(f"Mission {mission_id} accepted and saved to the database.")
 
 
-    def mission_completed(self, entry: dict):
-        mission_id = entry["MissionID"]
+    def mission_completed(self, record: MissionCompleted):
+        mission_id = record.mission_id
         PluginContext.logger.debug(f"Processing completion of mission {mission_id}:")
 
         res = self._select_by_id(mission_id)
         if res is not None:
             mission_obj = Mission(*res)
             mission_obj.status = MissionStatus.COMPLETED
-            mission_obj.timestamp_finished = entry["timestamp"]
+            mission_obj.timestamp_finished = record.raw["timestamp"]
         else:
             PluginContext.logger.warning(f"Mission {mission_id} not found in the database.")
             if GameState.cmdr is None:
@@ -101,15 +110,16 @@ class MissionTracker(Submodule):
                 mission_id=mission_id,
                 cmdr=GameState.cmdr,
                 status=MissionStatus.COMPLETED,
-                mission_type=entry["Name"],
-                timestamp_finished=entry["timestamp"],
+                mission_type=record.name,
+                timestamp_finished=record.raw["timestamp"],
             )
         self._insert_or_update(mission_obj)
 
-        effects: list[dict] = entry.get("FactionEffects", [])
+        effects = record.faction_effects
         if not effects:
             PluginContext.logger.debug(f"Mission {mission_id} doesn't have any faction effects.")
             return
+        changes: list[tuple[str, int, int]] = []     # (фракция, sid, изменение влияния)
         for faction_data in effects:
             faction = faction_data["Faction"]
             inf_data: list[dict] = faction_data.get("Influence", [])
@@ -117,16 +127,27 @@ class MissionTracker(Submodule):
                 PluginContext.logger.warning(f"No influence data for faction {faction}.")
                 continue
             for system_data in inf_data:
-                sid = system_data["SystemAddress"]
-                system = PluginContext.systems_cache.get_system_name(sid)
-                if system is None:
-                    PluginContext.logger.error(f"Couldn't determine system name for affected sid {sid} of faction {faction}.")
-                    continue
                 change = len(system_data["Influence"])
                 if system_data["Trend"] == "DownBad":
                     change *= -1
-                PluginContext.logger.debug(f"Faction {faction} affected in system {system}: influence change {change}.")
-                self._send_data(mission_obj, faction, system, change)
+                changes.append((faction, system_data["SystemAddress"], change))
+        if not changes:
+            return
+        # имена систем может потребоваться запросить у Spansh, поэтому отправка - по готовности
+        PluginContext.systems_cache.resolve_systems(
+            {sid for _, sid, _ in changes}, functools.partial(self._send_influence_changes, mission_obj, changes)
+        )
+
+
+    def _send_influence_changes(self, mission_obj: Mission, changes: list[tuple[str, int, int]], systems: dict[int, SystemData]):
+        for faction, sid, change in changes:
+            system_data = systems.get(sid)
+            if system_data is None:
+                PluginContext.logger.error(f"Couldn't determine system name for affected sid {sid} of faction {faction}.")
+                continue
+            system = system_data.name
+            PluginContext.logger.debug(f"Faction {faction} affected in system {system}: influence change {change}.")
+            self._send_data(mission_obj, faction, system, change)
 
 
     def mission_abandoned(self, entry: dict):
@@ -1,17 +1,22 @@
 from core.context import GameState, PluginContext
+from core.outbox import event_key
+from lib.events import Docked, JournalEvent, Location
 from modules.bgs.submodule_base import Submodule
 from modules.legacy import URL_GOOGLE
 
 
 class VoucherTracker(Submodule):
+    events = frozenset({"Docked", "Undocked", "Location", "RedeemVoucher"})
+    catch_up = True
+
     def __init__(self):
         self.station_owner: str | None = None
         self.redeemed_factions: list[str] = list()
 
-    def on_journal_entry(self, entry: dict):
+    def on_journal_entry(self, entry: dict, record: JournalEvent | None):
         event = entry["event"]
-        if event == "Docked" or (event == "Location" and entry["Docked"] is True):
-            self.station_owner = entry["StationFaction"]["Name"]
+        if isinstance(record, Docked) or (isinstance(record, Location) and record.docked):
+            self.station_owner = record.station_faction
             self.redeemed_factions.clear()
             return
         elif event == "Undocked" or (event == "Location" and entry["Docked"] is False):
@@ -25,6 +30,7 @@ class VoucherTracker(Submodule):
         if self.station_owner == "FleetCarrier" or "BrokerPercentage" in entry:
             return
 
+        # две одинаковые выплаты подряд - обычное дело, поэтому повтором считается только тот же ивент (см. `event_key`)
         url = f'{URL_GOOGLE}/1FAIpQLSenjHASj0A0ransbhwVD0WACeedXOruF1C4ffJa_t5X9KhswQ/formResponse'
         voucher_type = entry["Type"]
         cmdr = GameState.cmdr
@@ -43,7 +49,7 @@ class VoucherTracker(Submodule):
                 "entry.351553038": amount,
                 "usp": "pp_url",
             }
-            self.send_bgs_report(url, params, system)  # pyright: ignore[reportArgumentType]
+            self.send_bgs_report(url, params, system, event_key(entry))  # pyright: ignore[reportArgumentType]
 
         elif voucher_type == "bounty":
             PluginContext.logger.debug("Redeeming bounties:")
@@ -62,4 +68,4 @@ class VoucherTracker(Submodule):
                         "usp": "pp_url",
                     }
                     self.redeemed_factions.append(faction_name)
-                    self.send_bgs_report(url, params, system)  # pyright: ignore[reportArgumentType]
+                    self.send_bgs_report(url, params, system, event_key(entry))  # pyright: ignore[reportArgumentType]
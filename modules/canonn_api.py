@@ -5,43 +5,26 @@ from datetime import datetime, timedelta
 
 from core.context import GameState, PluginContext
 from core.debug import debug, error
+from core.plugin_config import plugin_config
+from core.rate_limit import limited_get
 from core.settings import canonn_cloud_url_europe_west, canonn_cloud_url_us_central
-from lib.journal import JournalEntry
+from core.systems import SystemData
+from lib.events import FSDJump, FSSSignalDiscovered, Music
+from lib.journal import Coords, JournalEntry
 from lib.module import Module
-from lib.thread import BasicThread, Thread
+from lib.thread import Thread
 from lib.timer import Timer
 
 
 _translate = functools.partial(PluginContext._tr_template, filepath=__file__)
 
 
-class CanonnReporter(BasicThread):
-    """Смесь Reporter и Canonn-овского Emitter"""
-    # https://github.com/canonn-science/EDMC-Canonn/blob/05a5d9c4f842ad4fdb52b1a04ffc01ac623eba2b/canonn/emitter.py
-
-    def __init__(self, url: str, payload: dict):
-        super().__init__()
-        self.url = url
-        self.payload = payload
-
-    def run(self):
-        if None in self.payload.values():
-            error("[CanonnReporter] None detected in params! {}", self.payload)
-            return
-        try:
-            res = requests.post(
-                self.url,
-                data=json.dumps(self.payload, ensure_ascii=False).encode('utf-8'),
-                headers={"content-type": "application/json"}
-            )
-            res.raise_for_status()
-        except requests.RequestException as e:
-            PluginContext.logger.error(
-                f"[CanonnReporter] Couldn't send data to Canonn Cloud. Url: {self.url}, payload: {self.payload} Exception info:",
-                exc_info=e
-            )
-        else:
-            debug("[CanonnReporter] Data sent successfully: url {!r}, payload {!r}.", self.url, self.payload)
+def post_to_canonn(url: str, payload: dict):
+    """Ставит *payload* в очередь отправки в Canonn Cloud (см. `core.outbox.Outbox`)."""
+    if None in payload.values():
+        error("[CanonnAPI] None detected in params! {}", payload)
+        return
+    PluginContext.outbox.post_json(url, payload)
 
 
 class HDDetector:
@@ -70,14 +53,15 @@ class HDDetector:
     def journal_entry(self, journal_entry: JournalEntry):
         entry = journal_entry.data
         event = entry["event"]
+        record = journal_entry.record
 
         if event == "StartJump" and entry["JumpType"] == "Hyperspace":
             self.departure_system = journal_entry.system
             self.destination_system_id = entry["SystemAddress"]
             self.departure_timestamp = datetime.fromisoformat(entry["timestamp"])
 
-        elif event == "FSDJump":
-            arrived_to = entry["StarSystem"]
+        elif isinstance(record, FSDJump):
+            arrived_to = record.star_system
             if self.departure_system == arrived_to:
                 # 99%, что проделки таргов, но на всякий случай перепроверим
                 debug("[HDDetector] Detected a misjump.")
@@ -86,22 +70,22 @@ class HDDetector:
                 self.status = self.SAFE
 
         elif (
-            event == "Music"
+            isinstance(record, Music)
             and self.status in (self.MISJUMP, self.THARGOID)
-            and entry.get("MusicTrack") in ("Unknown_Encounter", "Combat_Unknown", "Combat_Dogfight", "Combat_Hunters")
+            and record.music_track in ("Unknown_Encounter", "Combat_Unknown", "Combat_Dogfight", "Combat_Hunters")
         ):
             if self.status < self.THARGOID:
                 debug("[HDDetector] Hyperdiction confirmed.")
             self.status = self.THARGOID
 
-            if entry["MusicTrack"] in ("Unknown_Encounter"):
+            if record.music_track in ("Unknown_Encounter"):
                 # подождём, ожидая агрессии со стороны таргоида
                 debug("[HDDetector] Waiting for the signs of aggression...")
                 if not self._timer:
                     self._timer = Timer(20, lambda: self._reportHD(journal_entry))
                     self._timer.start()
 
-            elif entry["MusicTrack"] in ("Combat_Unknown", "Combat_Dogfight", "Combat_Hunters"):
+            elif record.music_track in ("Combat_Unknown", "Combat_Dogfight", "Combat_Hunters"):
                 debug("[HDDetector] Detected an attack on a player.")
                 self.status = self.HOSTILE
                 if self._timer:
@@ -121,64 +105,139 @@ class HDDetector:
             return
 
         current_coords = GameState.system_coords
-        dest_coords = PluginContext.systems_cache.get_system_coords(self.destination_system_id)
-        dest_name = PluginContext.systems_cache.get_system_name(self.destination_system_id)
-
         if current_coords is None:
             PluginContext.logger.warning("Unable to send hyperdiction report: no current coords.")
-        elif dest_coords is None or dest_name is None:
-            PluginContext.logger.warning("Unable to send hyperdiction report: no target coords or name.")
         else:
-            x, y, z = current_coords
-            dx, dy, dz = dest_coords
-            url = f"{canonn_cloud_url_europe_west}/postHDDetected"
-            params = {
-                "cmdr": journal_entry.cmdr,
-                "system": journal_entry.system,
-                "timestamp": journal_entry.data["timestamp"],
-                "x": x, "y": y, "z": z,
-                "destination": dest_name,
-                "dx": dx, "dy": dy, "dz": dz,
-                "client": PluginContext.client_version,
-                "odyssey": GameState.odyssey,
-                "hostile": (self.status == self.HOSTILE)
-            }
-            CanonnReporter(url, params).start()
+            # данные о системе назначения могут потребовать запроса к Spansh, отправим по готовности
+            PluginContext.systems_cache.resolve_system(
+                self.destination_system_id,
+                functools.partial(self._send_hd_report, journal_entry, current_coords, self.status == self.HOSTILE)
+            )
 
         # сбрасываем состояние до следующего перехвата
         self.status = self.SAFE
 
 
+    def _send_hd_report(self, journal_entry: JournalEntry, current_coords: Coords, hostile: bool, destination: SystemData | None):
+        if destination is None:
+            PluginContext.logger.warning("Unable to send hyperdiction report: no target coords or name.")
+            return
+        x, y, z = current_coords
+        dx, dy, dz = destination.coords
+        url = f"{canonn_cloud_url_europe_west}/postHDDetected"
+        params = {
+            "cmdr": journal_entry.cmdr,
+            "system": journal_entry.system,
+            "timestamp": journal_entry.data["timestamp"],
+            "x": x, "y": y, "z": z,
+            "destination": destination.name,
+            "dx": dx, "dy": dy, "dz": dz,
+            "client": PluginContext.client_version,
+            "odyssey": GameState.odyssey,
+            "hostile": hostile
+        }
+        post_to_canonn(url, params)
+
+
     @classmethod
     def check_last_encounter(cls, journalEntry: JournalEntry):
         entry = journalEntry.data
         if entry.get("TG_ENCOUNTERS", {}).get("TG_ENCOUNTER_TOTAL_LAST_SYSTEM"):
             debug("[HDDetector] Detected {!r} event, sending the last thargoid encounter to Canonn.", entry["event"])
+            # прежние имена систем (например, "Pleiades Sector IR-W d1-55" - Delphi) кэш систем переведёт в текущие
             system = entry.get("TG_ENCOUNTERS", {}).get("TG_ENCOUNTER_TOTAL_LAST_SYSTEM")
-            if system == "Pleiades Sector IR-W d1-55":
-                system = "Delphi"
+            PluginContext.systems_cache.resolve_system(
+                system, functools.partial(cls._send_last_encounter, journalEntry, system)
+            )
 
-            coords = PluginContext.systems_cache.get_system_coords(system)
-            if coords is None:
-                PluginContext.logger.warning(f"Can't report last encounter to Canonn: system coordinates unknown ({system!r})")
-                return
 
-            x, y, z = coords
-            gametime = entry.get("TG_ENCOUNTERS", {}).get("TG_ENCOUNTER_TOTAL_LAST_TIMESTAMP")
-            year, remainder = gametime.split("-", 1)
-            timestamp = "{}-{}".format(str(int(year) - 1286), remainder)
+    @classmethod
+    def _send_last_encounter(cls, journalEntry: JournalEntry, system: str, system_data: SystemData | None):
+        if system_data is None:
+            PluginContext.logger.warning(f"Can't report last encounter to Canonn: system coordinates unknown ({system!r})")
+            return
+
+        system = system_data.name
+        x, y, z = system_data.coords
+        gametime = journalEntry.data.get("TG_ENCOUNTERS", {}).get("TG_ENCOUNTER_TOTAL_LAST_TIMESTAMP")
+        year, remainder = gametime.split("-", 1)
+        timestamp = "{}-{}".format(str(int(year) - 1286), remainder)
+
+        debug("[HDDetector] Last encounter: timestamp {!r}, system {!r}.", timestamp, system)
+
+        url = f"{canonn_cloud_url_europe_west}/postHD"
+        params = {
+            "cmdr": journalEntry.cmdr,
+            "system": system,
+            "timestamp": timestamp,
+            "x": x, "y": y, "z": z
+        }
+        post_to_canonn(url, params)
+
 
-            debug("[HDDetector] Last encounter: timestamp {!r}, system {!r}.", timestamp, system)
 
-            url = f"{canonn_cloud_url_europe_west}/postHD"
-            params = {
-                "cmdr": journalEntry.cmdr,
-                "system": system,
-                "timestamp": timestamp,
-                "x": x, "y": y, "z": z
-            }
-            CanonnReporter(url, params).start()
+class _Batch:
+    __slots__ = ("cmdr", "gamestate", "started", "events")
 
+    def __init__(self, cmdr: str | None, gamestate: dict, started: datetime):
+        self.cmdr = cmdr
+        self.gamestate = gamestate
+        self.started = started
+        self.events: list[dict] = []
+
+
+class _EventBatcher:
+    """
+    Собирает ивенты для `postEvent` Canonn в пачки, чтобы отправлять их одним запросом.
+    gameState в запросе один на все ивенты, поэтому в пачку попадают только ивенты одного командира
+    с одинаковым gameState: ивенты с другого тела или из другой точки на планете уходят отдельной пачкой.
+
+    Пачка отправляется, когда:
+    - набрала `max_size` ивентов;
+    - ей больше `MAX_AGE` (проверяется в `tick`, на каждой записи журнала);
+    - мы покинули систему, вышли из игры или закрываем плагин (`flush`).
+    """
+    MAX_AGE = timedelta(minutes=1)
+
+    def __init__(self, url: str, max_size: int):
+        self.url = url
+        self.max_size = max_size
+        self._batches: dict[tuple[str | None, str], _Batch] = dict()   # {(командир, gameState в JSON): пачка}
+        self._system: int | None = None
+
+    def add(self, journalEntry: JournalEntry, gamestate: dict):
+        self.tick(journalEntry)
+        key = (journalEntry.cmdr, json.dumps(gamestate, sort_keys=True))
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(journalEntry.cmdr, gamestate, journalEntry.timestamp)
+        batch.events.append(journalEntry.data)
+        if len(batch.events) >= self.max_size:
+            self._send(key)
+
+    def tick(self, journalEntry: JournalEntry):
+        if journalEntry.systemAddress is not None and journalEntry.systemAddress != self._system:
+            self.flush()
+            self._system = journalEntry.systemAddress
+        if not self._batches:
+            return
+        timestamp = journalEntry.timestamp
+        for key, batch in list(self._batches.items()):
+            if timestamp - batch.started > self.MAX_AGE:
+                self._send(key)
+
+    def flush(self):
+        for key in list(self._batches):
+            self._send(key)
+
+    def _send(self, key: tuple[str | None, str]):
+        batch = self._batches.pop(key)
+        debug("[CanonnAPI] Sending a batch of {} events to Canonn.", len(batch.events))
+        post_to_canonn(self.url, {
+            "gameState": batch.gamestate,
+            "rawEvents": batch.events,
+            "cmdrName": batch.cmdr
+        })
 
 
 class CanonnRealtimeAPI(Module):
@@ -186,6 +245,9 @@ class CanonnRealtimeAPI(Module):
     _instance = None
     _hdtracker = HDDetector()
     whitelist = dict()
+    # каноны рекомендуют не больше 40 ивентов в пачке во избежание таймаута, мы перестрахуемся
+    MAX_BATCH_SIZE = 30
+    BATCH_SIZE_KEY = "CanonnAPI.MaxBatchSize"
 
     @property
     def localized_name(self) -> str:
@@ -193,15 +255,15 @@ class CanonnRealtimeAPI(Module):
 
     def __init__(self):
         super().__init__()
-        self.fss_signals_batch = list()
-        self._batch_maxlen = 30         # каноны рекомендуют 40 во избежание таймаута, мы перестрахуемся
-        self.fss_signals_timer: Timer | None = None
+        batch_size = plugin_config.get_int(self.BATCH_SIZE_KEY) or self.MAX_BATCH_SIZE
+        self._batcher = _EventBatcher(f"{canonn_cloud_url_us_central}/postEvent", batch_size)
         WhitelistUpdater().start()
 
 
     def on_journal_entry(self, entry: JournalEntry):
         if entry.data["event"] == "Statistics":
             self._hdtracker.check_last_encounter(entry)
+        self._check_batch_flush(entry)
         if not entry.system:
             return
         # проверяем:
@@ -215,47 +277,35 @@ class CanonnRealtimeAPI(Module):
 
 
     def on_close(self):
-        if len(self.fss_signals_batch) > 0:
-            self._dump_batch()
-
+        self._batcher.flush()
 
-    def _check_fss_signal(self, journalEntry: JournalEntry):
-        entry = journalEntry.data
-        event = entry["event"]
-
-        if event == "FSSSignalDiscovered":
-            isStation = entry.get("IsStation", False)
-            isCecFc = (
-                entry.get("SignalType") == "FleetCarrier"
-                and is_cec_fleetcarrier(entry.get("SignalName", ""))
-            )
-            if isStation and not isCecFc:
-                self.fss_signals_batch.append(journalEntry)
 
+    def _check_batch_flush(self, journalEntry: JournalEntry):
         """
-        Отправлять FSS сигналы в системе будем при одном из следующих условий:
-        0) Очередь заполнена
+        Накопленные ивенты отправляем, кроме заполнения пачки и смены системы (см. `_EventBatcher`), когда:
         1) Мы покинули систему
         2) Мы вышли из игры
         3) Мы закрываем плагин      <-- реализовано в on_close()
-        4) Прошло достаточно времени
         """
-        first_timestamp = datetime.fromisoformat(
-            self.fss_signals_batch[0].data["timestamp"]
-            if len(self.fss_signals_batch) > 0
-            else entry["timestamp"]
-        )
-        last_timestamp = datetime.fromisoformat(entry["timestamp"])
-        timestamp_diff: timedelta = last_timestamp - first_timestamp
+        entry = journalEntry.data
+        event = entry["event"]
         if (
-            len(self.fss_signals_batch) == self._batch_maxlen                               # 0
-            or (event == "StartJump" and entry["JumpType"] == "Hyperspace")                 # 1
+            (event == "StartJump" and entry.get("JumpType") == "Hyperspace")              # 1
             or event in ["Died", "SelfDestruct", "Resurrect"]                               # 1
             or event == "Shutdown"                                                          # 2
-            or event == "Music" and entry["MusicTrack"] == "MainMenu"                       # 2
-            or (event != "FSSSignalDiscovered" and timestamp_diff > timedelta(minutes=1))   # 4
+            or isinstance(journalEntry.record, Music) and journalEntry.record.music_track == "MainMenu"  # 2
         ):
-            self._dump_batch()
+            self._batcher.flush()
+        else:
+            self._batcher.tick(journalEntry)
+
+
+    def _check_fss_signal(self, journalEntry: JournalEntry):
+        record = journalEntry.record
+        if isinstance(record, FSSSignalDiscovered):
+            isCecFc = record.signal_type == "FleetCarrier" and is_cec_fleetcarrier(record.signal_name)
+            if record.is_station and not isCecFc:
+                self._batcher.add(journalEntry, self._get_gamestate(journalEntry))
 
 
     def _check_whitelisted_events(self, journalEntry: JournalEntry):
@@ -268,30 +318,8 @@ class CanonnRealtimeAPI(Module):
         if not valuable:
             return
         # если все пары ключей-значений совпадают, каноны в этом заинтересованы
-        debug("[CanonnAPI] Sending the {!r} event to Canonn.", entry["event"])
-        url = f"{canonn_cloud_url_us_central}/postEvent"
-        gamestate = self._get_gamestate(journalEntry)
-        params = {
-            "gameState": gamestate,
-            "rawEvents": [entry],
-            "cmdrName": journalEntry.cmdr
-        }
-        CanonnReporter(url, params).start()
-
-
-    def _dump_batch(self):
-        if len(self.fss_signals_batch) == 0:
-            return
-        debug("[CanonnAPI] Dumping the batch, len={}.", len(self.fss_signals_batch))
-        url = f"{canonn_cloud_url_us_central}/postEvent"
-        gamestate = self._get_gamestate(self.fss_signals_batch[0])
-        params = {
-            "gameState": gamestate,
-            "rawEvents": [entry.data for entry in self.fss_signals_batch],
-            "cmdrName": self.fss_signals_batch[0].cmdr
-        }
-        CanonnReporter(url, params.copy()).start()
-        self.fss_signals_batch.clear()
+        debug("[CanonnAPI] Queueing the {!r} event for Canonn.", entry["event"])
+        self._batcher.add(journalEntry, self._get_gamestate(journalEntry))
 
 
     def _get_gamestate(self, journalEntry: JournalEntry):
@@ -346,7 +374,7 @@ class WhitelistUpdater(Thread):
             PluginContext.logger.debug(f"Trying to retrieve the list of tracked events, attempt {attempts}")
             url = "https://api.github.com/gists/5b993467bf6be84b392418ddc9fcb6d3"
             try:
-                response = requests.get(url)
+                response = limited_get(url)
                 response.raise_for_status()
             except requests.RequestException as e:
                 PluginContext.logger.error("Couldnt't get the list of tracked events from GitHub, exception info:", exc_info=e)
@@ -357,7 +385,7 @@ class WhitelistUpdater(Thread):
             # вторая попытка аналогично из другого источника
             url = "https://gitlab.com/api/v4/snippets/4888707/raw"
             try:
-                response = requests.get(url)
+                response = limited_get(url)
                 response.raise_for_status()
             except requests.RequestException as e:
                 PluginContext.logger.error(
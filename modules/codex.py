@@ -12,6 +12,7 @@ import myNotebook as nb  # type: ignore
 from core.context import GameState, PluginContext
 from core.debug import debug, error
 from core.plugin_config import plugin_config
+from core.rate_limit import limited_get
 from core.settings import canonn_cloud_url_us_central, edsm_url
 
 
@@ -159,7 +160,7 @@ class CodexTypes(Frame):
             }
             url = f"{canonn_cloud_url_us_central}/query/getSystemPoi"
             debug(params)
-            r = requests.get(url, params=params)
+            r = limited_get(url, params=params)
 
             if r.status_code == 200:
                 poidata = r.json().get("codex")
@@ -183,7 +184,7 @@ class CodexTypes(Frame):
             }
             edsm = f"{edsm_url}/api-system-v1/bodies"
             debug(edsm)
-            r = requests.get(edsm, params=params)
+            r = limited_get(edsm, params=params)
             if r.status_code == requests.codes.ok:
                 bodies = r.json().get("bodies")
                 if bodies:
@@ -2,7 +2,6 @@ from core.context import GameState, PluginContext
 from core.debug import debug
 from lib.journal import JournalEntry
 from lib.module import Module
-from modules.legacy import GoogleReporter
 
 
 # isort: off
@@ -81,6 +80,7 @@ class DeliveryTracker(Module):
             f"cargo diff: {delivered}"
         )
         url = "https://docs.google.com/forms/d/e/1FAIpQLSdbG8pQUHDryAkd1ReEIEo25zOs6LUPErUElytgwI8wmfWAUA/formResponse?usp=pp_url"
+        reports = []
         for item, amount in delivered.items():
             params = {
                 "entry.1492553995": GameState.cmdr,
@@ -89,4 +89,6 @@ class DeliveryTracker(Module):
                 "entry.173800538": item,
                 "entry.883168154": amount
             }
-            GoogleReporter(url, params.copy()).start()
+            reports.append((url, params))
+        # после перезахода в игру те же поставки могут быть посчитаны ещё раз - отбрасываем такие же отчёты
+        PluginContext.outbox.post_forms(reports, dedup_key="colonisation delivery")
@@ -2,6 +2,7 @@ import requests
 
 from core.context import GameState, PluginContext
 from core.debug import debug, warning
+from core.rate_limit import limited_get
 from core.settings import canonn_cloud_url_us_central, poi_categories
 from lib.journal import JournalEntry
 from lib.module import Module
@@ -13,8 +14,20 @@ _translate = functools.partial(PluginContext._tr_template, filepath=__file__)
 # isort: on
 
 
+class _Prefetch:
+    """POI системы, выбранной целью прыжка (FSDTarget), запрошенные заранее. Действительны только до следующего прыжка."""
+    __slots__ = ("params", "data", "done", "attached")
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.data: list[dict] | None = None
+        self.done = False       # ответ получен
+        self.attached = False   # прыжок уже совершён, показать ответ сразу по получении
+
+
 class CanonnCodexPOI(Module):
     URL = f"{canonn_cloud_url_us_central}/query/getSystemPoi"
+    events = frozenset({"FSDTarget", "StartJump", "FSDJump", "Location", "CarrierJump"})
 
     @property
     def localized_name(self) -> str:
@@ -23,6 +36,7 @@ class CanonnCodexPOI(Module):
     def __init__(self):
         PluginContext.exp_visualizer.register(self)
         self.destination_system: str | None = None
+        self._prefetch: _Prefetch | None = None
 
 
     def on_journal_entry(self, entry: JournalEntry):
@@ -30,31 +44,85 @@ class CanonnCodexPOI(Module):
             return
 
         event = entry.data.get("event")
-        if event == "StartJump" and entry.data.get("JumpType") == "Hyperspace":
+        if event == "FSDTarget":
+            self.prefetch_data(entry.data["Name"])
+        elif event == "StartJump" and entry.data.get("JumpType") == "Hyperspace":
             self.destination_system = entry.data["StarSystem"]
         elif event == "FSDJump":
             if (system := entry.data["StarSystem"]) == self.destination_system:
                 # в противном случае это, скорее всего, таргоидский перехват, и мы всё ещё в старой системе
                 self.fetch_data(system)
+            else:
+                self._prefetch = None
             self.destination_system = None
         elif event in ("Location", "CarrierJump"):
             self.fetch_data(entry.data["StarSystem"])
 
 
     def fetch_data(self, system: str):
-        params = {
+        params = self._params(system)
+        # заранее запрошенное годится только для этого прыжка, дальше его не храним
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is not None and prefetch.params == params:
+            if not prefetch.done:
+                debug("[Codex] Waiting for the POI data requested before the jump.")
+                prefetch.attached = True
+                self._prefetch = prefetch
+                return
+            if prefetch.data is not None:
+                debug("[Codex] Using POI data prefetched before the jump.")
+                self._show_pois(prefetch.data)
+                return
+        PluginContext.resolver.submit(self._request_pois, params, callback=functools.partial(self._on_fetched, system))
+
+
+    def prefetch_data(self, system: str):
+        """Запрашивает POI следующей системы маршрута, пока игрок ещё заряжает FSD."""
+        params = self._params(system)
+        if self._prefetch is not None and self._prefetch.params == params:
+            return      # уже запрошено или получено
+        prefetch = self._prefetch = _Prefetch(params)
+        PluginContext.resolver.submit(self._request_pois, params, callback=functools.partial(self._on_prefetched, prefetch))
+
+
+    def _on_fetched(self, system: str, data: list[dict] | None):
+        if GameState.system != system:
+            debug("[Codex] Discarding POI data of {}: already left the system.", system)
+            return
+        self._show_pois(data)
+
+
+    def _on_prefetched(self, prefetch: _Prefetch, data: list[dict] | None):
+        if prefetch is not self._prefetch:
+            debug("[Codex] Discarding POI data prefetched for another jump.")
+            return
+        prefetch.data = data
+        prefetch.done = True
+        if prefetch.attached:
+            self._prefetch = None
+            self._show_pois(data)
+
+
+    @staticmethod
+    def _params(system: str) -> dict:
+        return {
             "cmdr": GameState.cmdr,
             "system": system,
             "odyssey": GameState.odyssey
         }
+
+
+    def _request_pois(self, params: dict) -> list[dict] | None:
         try:
-            res = requests.get(self.URL, params=params)
+            res = limited_get(self.URL, params=params)
             res.raise_for_status()
         except requests.RequestException as e:
             PluginContext.logger.error("[Codex] Couldn't fetch system POIs from Canonn. Exception info:", exc_info=e)
-            return
+            return None
+        return res.json().get("codex")
+
 
-        data: list[dict] = res.json().get("codex")
+    def _show_pois(self, data: list[dict] | None):
         if not data:
             debug("[Codex] No POIs from Canonn in this system.")
             return
@@ -14,10 +14,9 @@ from theme import theme  # type: ignore
 
 from core.debug import debug, error, warning
 from core.plugin_config import plugin_config
+from core.rate_limit import limited_get
 from lib.journal import JournalEntry
 from lib.module import Module
-from lib.thread import BasicThread
-from modules.legacy import GoogleReporter
 
 
 # isort: off
@@ -570,7 +569,7 @@ class FC_Tracker(Module):
 
 
     def send_fc_data(self):
-        BasicThread(target=self.__submit_form_in_thread, name="FC_Tracker._submit_form").start()
+        PluginContext.resolver.submit(self.__submit_form_in_thread)
 
     def __submit_form_in_thread(self):
         self.__check_fleetcarrier_space_account()
@@ -591,7 +590,7 @@ class FC_Tracker(Module):
             "entry.78144414":   self.fc_data.comment,
             "entry.1361520128": decommission_timestamp
         }
-        GoogleReporter(url, params).start()
+        PluginContext.outbox.post_form(url, params)
 
 
     def __check_fleetcarrier_space_account(self):
@@ -605,7 +604,7 @@ class FC_Tracker(Module):
         url = f"https://fleetcarrier.space/search?term={self.fc_data.callsign}"
 
         try:
-            res = requests.get(url, allow_redirects=False)
+            res = limited_get(url, allow_redirects=False)
         except requests.RequestException:
             error("[FC_Tracker] Couldn't check for account on fleetcarrier.space:\n" + traceback.format_exc())
             fc_account_link = ""
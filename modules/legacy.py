@@ -1,79 +1,19 @@
 # -*- coding: utf-8 -*-
 import csv
 import requests
-import traceback
 import webbrowser
 from contextlib import closing
 from math import pow, sqrt
 from urllib.parse import quote_plus
 
-from core.context import GameState, PluginContext
-from core.debug import debug, error
-from lib.thread import BasicThread
+from core.context import PluginContext
+from core.debug import debug
+from core.rate_limit import limited_get
 
 
 URL_GOOGLE = 'https://docs.google.com/forms/d/e'
 
 
-class GoogleReporter(BasicThread):
-    STANDARD_RETRY_DELAY = 10
-    LONG_RETRY_DELAY = 10 * 60
-    MAX_ATTEMPTS = 10
-
-    def __init__(self, url: str, params: dict | None = None):
-        super().__init__()
-        self.url = url
-        self.params = params
-
-    def run(self):
-        n_attempt = 1
-        while n_attempt != self.MAX_ATTEMPTS + 1:
-            try:
-                response = requests.post(self.url, self.params)
-            except Exception:
-                error("[GoogleReporter] Couldn't send data: url {!r}, params {!r}:", self.url, self.params)
-                error(traceback.format_exc())
-                return
-
-            if response.ok:
-                debug(
-                    "[GoogleReporter] Data sent successfully: url {!r}, params {!r} ({} attempts).",
-                    self.url, self.params, n_attempt
-                )
-                return
-
-            elif response.status_code == 408:  # таймаут, есть смысл попытаться ещё
-                error(
-                    "[GoogleReporter] Couldn't send data (418 Timeout): url {!r}, params {!r} ({} attempts).",
-                    self.url, self.params, n_attempt
-                )
-                n_attempt += 1
-                self.sleep(self.STANDARD_RETRY_DELAY)
-
-            elif response.status_code == 429:  # слишком много запросов, подождём подольше
-                error(
-                    "[GoogleReporter] Couldn't send data (429 Too many requests): url {!r}, params {!r} ({} attempts).",
-                    self.url, self.params, n_attempt
-                )
-                n_attempt += 1
-                self.sleep(self.LONG_RETRY_DELAY)
-
-            elif response.status_code < 500:  # всё остальное из 4XX пытаться повторять смысла нет
-                error(
-                    "[GoogleReporter] Coundn't send data (code {}): url {!r}, params {!r}. Aborting.",
-                    response.status_code, self.url, self.params
-                )
-                return
-
-            else:  # 5XX можно попытаться повторить
-                error(
-                    "[GoogleReporter] Coundn't send data (code {}): url {!r}, params {!r} ({} attempts).",
-                    response.status_code, self.url, self.params, n_attempt
-                )
-                n_attempt += 1
-                self.sleep(self.STANDARD_RETRY_DELAY)
-
-
 def getDistance(x1, y1, z1, x2, y2, z2):
     return round(sqrt(pow(float(x2) - float(x1), 2) + pow(float(y2) - float(y1), 2) + pow(float(z2) - float(z1), 2)), 2)
 
@@ -104,7 +44,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.1301773715": entry.get("BodyCount", ""),
             }
             url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
     # проверка АТ на биосигналы перед отправкой в базу
     if entry["event"] == "FSSBodySignals":
@@ -152,7 +92,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.1301773715": str(mass).replace('.', ','),
             }
             url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
         # рекорды: горячие юпитеры
         if "gas giant" in entry.get("PlanetClass").lower():
@@ -165,7 +105,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1301773715": str(entry.get("SurfaceTemperature")).replace('.', ','),
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
 
         # рекорды: радиус колец
         if "Rings" in entry:
@@ -182,7 +122,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                         "entry.1301773715": outerRad[:-3],
                     }
                     url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                    GoogleReporter(url, params).start()
+                    PluginContext.outbox.post_form(url, params)
 
         if entry.get("Landable") is True:
             # рекорды: температура посадочных
@@ -195,7 +135,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1301773715": entry.get("SurfaceTemperature"),
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
 
             # рекорды: радиус посадочных
             if entry.get("Radius") / 1000 > 25444:
@@ -207,7 +147,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1301773715": str(entry.get("Radius")).replace('.', ','),
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
             elif entry.get("Radius") <= 138000:
                 params = {
                     "usp": "pp_url",
@@ -217,7 +157,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1301773715": str(entry.get("Radius") / 1000).replace('.', ','),
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
 
             # рекорды: гравитация посадочных
             if entry.get("SurfaceGravity") / 10 > 7.51:
@@ -229,7 +169,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1301773715": str(entry.get("SurfaceGravity") / 10).replace('.', ','),
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
 
     # рекорды: орбитальный период
     if "OrbitalPeriod" in entry:
@@ -242,7 +182,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.1301773715": entry.get("OrbitalPeriod"),
             }
             url = f'{URL_GOOGLE}/1FAIpQLSfFr7ezqpQ4cnw99bJ-lOIW-6QtKRArhgDNtSj8eLtPoILXUg/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
     if "PlanetClass" in entry:
         # БД атмосферных и рекорды - ГГ
@@ -260,7 +200,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.549950938": entry.get("StarSystem", "")
             }
             url = f'{URL_GOOGLE}/1FAIpQLSeVvva2K9VMJZyr4mJ9yRnQPXhcDHUwO8iTxrg2z1Qi4lJk_Q/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
             # БД Boepp (экспедиционная)
             if "Boepp " in entry["BodyName"]:
@@ -271,7 +211,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                     "entry.1828517199": entry.get("StarSystem", "")
                 }
                 url = f'{URL_GOOGLE}/1FAIpQLSeCRZ9GXprtSEUFgUOMR5yBGkqYpdrKAumLkYH6KkPOUq3sIA/formResponse'
-                GoogleReporter(url, params).start()
+                PluginContext.outbox.post_form(url, params)
 
             # рекорды
             params = {
@@ -281,7 +221,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.1789316283": entry.get("StarSystem", "")
             }
             url = f'{URL_GOOGLE}/1FAIpQLSc6mPwibfkLDyVklC7bEiJsNOtcE8pE9OS2b9o3FpBDNiaN4g/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
         # Картография
         valuable = False
@@ -303,7 +243,7 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                 "entry.1992174852": entry.get("StarSystem", "")
             }
             url = f'{URL_GOOGLE}/1FAIpQLSdgwzvgxow5ATuB4Gimj6DvDRD3-ub3Yp4UD-nQK4CnZdKV9w/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
 
         # БД атмосферных - планеты
         if entry["Landable"] is True:
@@ -330,11 +270,11 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
                         }
                         # общая БД
                         url = f'{URL_GOOGLE}/1FAIpQLScWkHPhTEHcNCoAwIAbb54AQgg8A6ocX2Ulbfkr2hcubgfbRA/formResponse'
-                        GoogleReporter(url, params).start()
+                        PluginContext.outbox.post_form(url, params)
                         # БД Boepp (экспедиционная)
                         if "Boepp " in entry["BodyName"]:
                             url = f'{URL_GOOGLE}/1FAIpQLSfrZqrZHJ5T0lgpaoUOcLgM0fXmR_t5_vLKvT7J5HDA8mugeg/formResponse'
-                            GoogleReporter(url, params).start()
+                            PluginContext.outbox.post_form(url, params)
 
     # звёзды
     if "StarType" in entry:
@@ -348,11 +288,11 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
         }
         # общая БД
         url = f'{URL_GOOGLE}/1FAIpQLSdfXA2mLXTamWdz3mXC3Ta3UaJS6anqY4wvzkX-9XzGilZ6Tw/formResponse'
-        GoogleReporter(url, params).start()
+        PluginContext.outbox.post_form(url, params)
         # БД Boepp (экспедиционная)
         if "Boepp " in entry["BodyName"]:
             url = f'{URL_GOOGLE}/1FAIpQLSeapH5azc-9T0kIZ4vfDBcDlcd8ZfMUBS42DMRXL8fYcBxRtQ/formResponse'
-            GoogleReporter(url, params).start()
+            PluginContext.outbox.post_form(url, params)
         # картография
         params = {
             "entry.1407433679": entry.get("BodyName", ""),
@@ -362,19 +302,19 @@ def GusonExpeditions(cmdr, is_beta, system, entry):  # noqa: E302
             "entry.2033592775": str(entry.get("Age_MY"))
         }
         url = f'{URL_GOOGLE}/1FAIpQLSfYl0iPm-qQOCyD6iVIjK7BPIgnp6yABR2YVwfcp2GB5KWtNA/formResponse'
-        GoogleReporter(url, params).start()
+        PluginContext.outbox.post_form(url, params)
 
 
-def report_version():
+def report_version(cmdr: str):
     try:
-        resp = requests.get('https://api.ipify.org', timeout=3)
+        resp = limited_get('https://api.ipify.org', timeout=3)
         resp.raise_for_status()
         ipv4 = resp.text
     except requests.RequestException as e:
         PluginContext.logger.error("Couldn't fetch IPv4 address. Exception info:", exc_info=e)
         ipv4 = None
     try:
-        resp = requests.get('https://api6.ipify.org', timeout=3)
+        resp = limited_get('https://api6.ipify.org', timeout=3)
         resp.raise_for_status()
         ipv6 = resp.text
     except requests.RequestException as e:
@@ -386,35 +326,41 @@ def report_version():
     url = "https://docs.google.com/forms/d/1h7LG5dEi07ymJCwp9Uqf_1phbRnhk1R3np7uBEllT-Y/formResponse"
     params = {
         "usp": "pp_url",
-        "entry.1181808218": GameState.cmdr,
+        "entry.1181808218": cmdr,
         "entry.254549730":  str(PluginContext.plugin_version),
         "entry.1622540328": ipv4 or "0",
         "entry.488844173":  ipv6 or "0",
         "entry.1210213202": 1
     }
-    GoogleReporter(url, params).start()
+    PluginContext.outbox.post_form(url, params)
 
 
-def fetch_squadron() -> tuple[str | None, str | None]:
+def fetch_squadron(cmdr: str | None) -> tuple[str | None, str | None] | None:
     """
-    Возвращает название и ID сквадрона командира из имеющихся у нас данных.
+    Возвращает название и ID сквадрона командира из имеющихся у нас данных: (None, None), если командира там нет,
+    и None, если список получить не удалось. Делает сетевой запрос, поэтому вызывается в фоне (см. `core.resolver`).
     """
-    if GameState.cmdr is None:
+    if cmdr is None:
         return None, None
     debug("Community Check started")
     url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTXE8HCavThmJt1Wshy3GyF2ZJ-264SbNRVucsPUe2rbEgpm-e3tqsX-8K2mwsG4ozBj6qUyOOd4RMe/pub?gid=1832580214&single=true&output=tsv"  # noqa: E501
-    with closing(requests.get(url, stream=True)) as r:
-        reader = csv.reader(r.content.decode('utf-8').splitlines(), delimiter='\t')
-        next(reader)
-        for row in reader:
-            cmdr, squadron, sqid = row
-            if cmdr == GameState.cmdr:
-                PluginContext.patrol_module.sqid = sqid
-                return squadron.upper(), sqid
+    try:
+        with closing(limited_get(url, stream=True)) as r:
+            r.raise_for_status()
+            content = r.content.decode('utf-8')
+    except requests.RequestException as e:
+        PluginContext.logger.error("Couldn't fetch the squadron list. Exception info:", exc_info=e)
+        return None
+    reader = csv.reader(content.splitlines(), delimiter='\t')
+    next(reader)
+    for row in reader:
+        row_cmdr, squadron, sqid = row
+        if row_cmdr == cmdr:
+            return squadron.upper(), sqid
 
     debug("Community Check failed: CMDR not found, requesting to fill a form.")
     url = "https://docs.google.com/forms/d/e/1FAIpQLSeERKxF6DlrQ3bMqFdceycSlBV0kwkzziIhYD0ctDzrytm8ug/viewform?usp=pp_url"
-    url += "&entry.42820869=" + quote_plus(GameState.cmdr)
+    url += "&entry.42820869=" + quote_plus(cmdr)
     debug(f"SQID {url}")
     webbrowser.open(url)
     return None, None
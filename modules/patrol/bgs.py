@@ -52,14 +52,22 @@ class BGSTasksOverride:
         return cls(patrols, systems=systems_override)
 
 
-def new_bgs_patrol(bgs, faction, override):
+def new_bgs_patrol(bgs, faction, override, coords=None):
+    """
+    *coords* - заранее запрошенные координаты систем (см. `SystemsCache.get_many_coords`);
+    если не переданы, координаты системы запрашиваются отдельно.
+    """
     system = bgs.get("system_name")
     if system in override:
         return
+    if coords is None:
+        system_coords = PluginContext.systems_cache.get_system_coords(system)
+    else:
+        system_coords = coords.get(system)
     return build_patrol(
         type="BGS",
         system=system,
-        coords=PluginContext.systems_cache.get_system_coords(system),
+        coords=system_coords,
         instructions=get_bgs_instructions(bgs, faction),
         url="https://elitebgs.app/systems/{}".format(bgs.get("system_id")),
     )
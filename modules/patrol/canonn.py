@@ -1,8 +1,8 @@
 import csv
-import requests
 from contextlib import closing
 
 from core.debug import debug, error
+from core.rate_limit import limited_get
 from core.settings import canonn_patrols_url
 from lib.spreadsheet import Spreadsheet
 
@@ -32,7 +32,7 @@ class CanonnPatrols(list):
     @classmethod
     def from_json(cls, url):
         patrols = []
-        resp = requests.get(url).json()
+        resp = limited_get(url).json()
         for row in resp:
             patrol = build_patrol(
                 type=row.get("type"),
@@ -49,7 +49,7 @@ class CanonnPatrols(list):
     @classmethod
     def from_tsv(cls, url):
         patrols = []
-        with closing(requests.get(url, stream=True)) as resp:
+        with closing(limited_get(url, stream=True)) as resp:
             reader = csv.reader(resp.raw, delimiter="\t")
             next(reader)
             for row in reader:
@@ -1,6 +1,5 @@
-import requests
-
 from core.context import PluginContext
+from core.rate_limit import limited_get
 from core.settings import edsm_poi_url
 
 from .patrol import build_patrol
@@ -55,7 +54,7 @@ validtypes = [
 def get_edsm_patrol() -> list:
     patrol = PluginContext.patrol_module
 
-    r = requests.get(edsm_poi_url)
+    r = limited_get(edsm_poi_url)
     r.encoding = "utf-8"
     entries = r.json()
 
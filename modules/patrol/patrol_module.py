@@ -17,11 +17,10 @@ import functools
 import json
 import math
 import os
-import requests
 import threading
 import tkinter as tk
 from tkinter import Frame
-from urllib.parse import quote_plus
+from urllib.parse import parse_qsl, quote_plus, urlsplit
 
 import myNotebook as nb  # type: ignore
 from config import config as edmc_config  # type: ignore
@@ -31,9 +30,10 @@ from ttkHyperlinkLabel import HyperlinkLabel  # type: ignore
 from core import settings
 from core.context import GameState, PluginContext
 from core.plugin_config import plugin_config
+from core.rate_limit import limited_get
 from lib.journal import JournalEntry
 from lib.module import Module
-from lib.thread import Thread, ThreadExit
+from lib.thread import Thread
 
 from .bgs import BGSTasksOverride, new_bgs_patrol
 from .canonn import CanonnPatrols
@@ -359,7 +359,6 @@ class PatrolModule(Frame, Module):
             return
         self.cmdr = cmdr_name
 
-        self.ships = []
         self.system = data["lastSystem"]["name"]
 
         current_ship = cmdr["currentShipId"]
@@ -378,6 +377,11 @@ class PatrolModule(Frame, Module):
 
             shipsystems[ship_system].append(ships[ship])
 
+        # coordinates of the ship systems may have to be fetched from Spansh, so build the list in the background
+        PluginContext.resolver.submit(self.build_ship_patrols, shipsystems, callback=self.set_ship_patrols)
+
+    def build_ship_patrols(self, shipsystems: dict[str, list[dict]]) -> list[dict]:
+        ship_patrols = []
         for system, ships in shipsystems.items():
             ship_pos = PluginContext.systems_cache.get_system_coords(system)
             ship_count = len(ships)
@@ -390,8 +394,11 @@ class PatrolModule(Frame, Module):
             else:
                 ship_info = f"У вас {ship_count} кораблей в этой системе"
 
-            self.ships.append(build_patrol("SHIPS", system, ship_pos, ship_info, None))
+            ship_patrols.append(build_patrol("SHIPS", system, ship_pos, ship_info, None))
+        return ship_patrols
 
+    def set_ship_patrols(self, ship_patrols: list[dict]):
+        self.ships = ship_patrols
         self.capi_update = True
         if self.system:
             self.start_background_thread()
@@ -515,27 +522,21 @@ class PatrolModule(Frame, Module):
             We will get Canonn faction data using elitebgs api
         """
 
-        class UpdateCycle(Thread):
-            def __init__(self, j: dict, patrol: list, **kwargs):
-                super().__init__(**kwargs)
-                self.j = j
-                self.patrol = patrol
-            def do_run(self):
-                for bgs in self.j.get("docs")[0].get("faction_presence"):
-                    if self.STOP:
-                        raise ThreadExit
-                    val = new_bgs_patrol(bgs, faction, BGSOSys)
-                    if val:
-                        self.patrol.append(val)
-
         patrol = []
 
         url = "https://elitebgs.app/api/ebgs/v5/factions"
-        j = requests.get(url, params={"name": faction}).json()
+        j = limited_get(url, params={"name": faction}).json()
         if j:
-            thread = UpdateCycle(j, patrol, name="patrol.faction_data_dowloader")
-            thread.start()
-            thread.join()
+            # мы и так в фоновом потоке (UpdateThread), отдельный поток на каждую фракцию не нужен
+            presence = j.get("docs")[0].get("faction_presence")
+            # координаты всех систем - одним запросом
+            coords = PluginContext.systems_cache.get_many_coords(
+                bgs.get("system_name") for bgs in presence if bgs.get("system_name") not in BGSOSys
+            )
+            for bgs in presence:
+                val = new_bgs_patrol(bgs, faction, BGSOSys, coords)
+                if val:
+                    patrol.append(val)
 
         return patrol
 
@@ -551,12 +552,10 @@ class PatrolModule(Frame, Module):
 
         return r
 
-    def keyval(self, k):
-        x, y, z = PluginContext.systems_cache.get_system_coords(self.system)
-        return distance_between((x, y, z), k.get("coords"))
-
     def sort_patrol(self):
-        patrol_list = sorted(self.patrol_list, key=self.keyval)
+        # координаты текущей системы запрашиваем один раз, а не на каждый патруль
+        location = PluginContext.systems_cache.get_system_coords(self.system)
+        patrol_list = sorted(self.patrol_list, key=lambda patrol: distance_between(location, patrol.get("coords")))
         for num in range(len(patrol_list)):
             patrol_list[num]["index"] = num
 
@@ -668,9 +667,12 @@ class PatrolModule(Frame, Module):
         # autosubmit the form --
         # allowing for google forms
         if self.nearest.get("url"):
-            j = requests.get(
-                self.nearest.get("url").replace("viewform", "formResponse")
-            )
+            # заполненные поля формы передаются в ссылке - отправляем их в теле запроса, как форма
+            url = urlsplit(self.nearest.get("url").replace("viewform", "formResponse"))
+            params: dict[str, list[str]] = dict()
+            for key, value in parse_qsl(url.query, keep_blank_values=True):
+                params.setdefault(key, []).append(value)
+            PluginContext.outbox.post_form(url._replace(query="").geturl(), params)
         self.next_patrol(None)
 
     def get_nearest(self, location):
@@ -700,4 +702,4 @@ def copyclip(value):
 
 def distance_between(p, g):
     # gets the distance between two systems
-    return math.sqrt(sum(tuple([math.pow(p[i] - g[i], 2) for i in range(3)])))
+    return math.dist(p, g)
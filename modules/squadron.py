@@ -5,7 +5,6 @@ from core.debug import debug
 from core.plugin_config import plugin_config
 from lib.journal import JournalEntry
 from lib.module import Module
-from modules import legacy
 
 
 _translate = functools.partial(PluginContext._tr_template, filepath=__file__)
@@ -13,6 +12,11 @@ _translate = functools.partial(PluginContext._tr_template, filepath=__file__)
 
 class SquadronTracker(Module):
     SQUADRON_KEY = "SquadronTracker.SavedSquadron"
+    events = frozenset({
+        "SquadronStartup",
+        "JoinedSquadron", "SquadronCreated",
+        "KickedFromSquadron", "LeftSquadron", "DisbandedSquadron",
+    })
 
     @property
     def localized_name(self) -> str:
@@ -22,7 +26,8 @@ class SquadronTracker(Module):
         self.saved_squadron = plugin_config.get_str(self.SQUADRON_KEY) or None
         debug("Saved squadron: {}", self.saved_squadron)
         # При запуске плагина сквадрон определяется данными из нашей таблички,
-        # поэтому здесь контекст не редактируем.
+        # поэтому здесь контекст не редактируем. Ивенты сквадрона применяет к GameState
+        # обработчик журнала (см. `JournalProcessor.on_journal_entry`) ещё до передачи их сюда.
 
 
     def on_journal_entry(self, entry: JournalEntry):
@@ -34,7 +39,6 @@ class SquadronTracker(Module):
 
     def startup_squadron(self, journal_entry: JournalEntry):
         squadron = journal_entry.data["SquadronName"].upper()
-        GameState.squadron = squadron
         if squadron != self.saved_squadron:
             debug("Saved squadron doesn't match the in-game.")
             plugin_config.set(self.SQUADRON_KEY, squadron)
@@ -45,7 +49,6 @@ class SquadronTracker(Module):
 
     def joined_squadron(self, journal_entry: JournalEntry):
         squadron = journal_entry.data["SquadronName"].upper()
-        GameState.squadron = squadron
         plugin_config.set(self.SQUADRON_KEY, squadron)
         self.saved_squadron = squadron
         debug("Joined the squadron {}. Reporting.", self.saved_squadron)
@@ -53,8 +56,6 @@ class SquadronTracker(Module):
 
 
     def left_squadron(self, journal_entry: JournalEntry):
-        GameState.squadron = None
-        GameState.legacy_sqid = None
         plugin_config.set(self.SQUADRON_KEY, "")
         self.saved_squadron = None
         debug("Left the squadron. Reporting.")
@@ -73,4 +74,4 @@ class SquadronTracker(Module):
             "entry.1289608233": GameState.cmdr,
             "entry.1616589915": GameState.squadron or "[independent]"
         }
-        legacy.GoogleReporter(url, params).start()
+        PluginContext.outbox.post_form(url, params)